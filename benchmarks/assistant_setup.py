@@ -0,0 +1,86 @@
+"""
+Per-request setup cost of /chat/chat: building the purpose's assistant around the
+shared client on every request, as before the registry, against looking it up in the
+registry built at startup. Also reports the one-time cost of a response model's tool
+schema and field validators, which the registry pays at startup instead of the first
+chat of each purpose.
+
+Run from the repository root:   python -m benchmarks.assistant_setup
+"""
+
+import os
+import sys
+import time
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, ".")
+# The assistants only need a client object; no request reaches the API.
+os.environ.setdefault("LLM_BACKEND", "synthetic")
+
+from enums import ChatPurpose  # noqa: E402
+from services import openai_chat_base  # noqa: E402
+from services.assistant_registry import load_assistant_registry  # noqa: E402
+from services.llm_clients import get_async_openai_client  # noqa: E402
+from services.onboarding_assistant import OnboardingAssistant  # noqa: E402
+from services.structured_stream import StructuredStream  # noqa: E402
+from services.workout_guide_assistant import WorkoutGuideAssistant  # noqa: E402
+from services.workout_journal_assistant import WorkoutJournalAssistant  # noqa: E402
+from services.workout_log_assistant import WorkoutLogAssistant  # noqa: E402
+
+EMAIL = "benchmark@example.com"
+PURPOSE_DATA = {
+    ChatPurpose.ONBOARDING: SimpleNamespace(user_name="Sam"),
+    ChatPurpose.WORKOUT_JOURNAL: SimpleNamespace(workout_date="2024-03-04"),
+    ChatPurpose.WORKOUT_GUIDE: SimpleNamespace(workout_guide_date="2024-03-04"),
+    ChatPurpose.WORKOUT_LOG: None,
+}
+ASSISTANTS = {
+    ChatPurpose.ONBOARDING: OnboardingAssistant,
+    ChatPurpose.WORKOUT_JOURNAL: WorkoutJournalAssistant,
+    ChatPurpose.WORKOUT_GUIDE: WorkoutGuideAssistant,
+    ChatPurpose.WORKOUT_LOG: WorkoutLogAssistant,
+}
+
+
+def _clear_prepared_models() -> None:
+    openai_chat_base._tool_schema.cache_clear()
+    StructuredStream._adapters.clear()
+
+
+def _best(function, number: int = 2000) -> float:
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main():
+    client = get_async_openai_client()
+
+    _clear_prepared_models()
+    started_at = time.perf_counter()
+    registry = load_assistant_registry()
+    startup = time.perf_counter() - started_at
+    print(f"startup: {startup * 1e3:.1f} ms to register {len(registry)} assistants")
+
+    for purpose, assistant_class in ASSISTANTS.items():
+        purpose_data = PURPOSE_DATA[purpose]
+        before = _best(lambda: assistant_class(client))
+
+        def lookup():
+            registered = registry.get(purpose)
+            registered.build_purpose_data(purpose_data, EMAIL)
+
+        after = _best(lookup)
+        response_model = assistant_class.response_model
+        _clear_prepared_models()
+        started_at = time.perf_counter()
+        openai_chat_base.OpenAIBase.prepare_response_model(response_model)
+        first_request = time.perf_counter() - started_at
+        print(
+            f"{purpose.value}: build per request {before * 1e6:.1f} us "
+            f"(+{first_request * 1e3:.1f} ms schema and validators on the first request), "
+            f"registry lookup with purpose data {after * 1e6:.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
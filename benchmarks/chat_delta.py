@@ -0,0 +1,90 @@
+"""
+Bytes on the wire and CPU per reply of the /chat/chat stream, full snapshots against
+the delta=true server-sent events.
+
+Run from the repository root:   python -m benchmarks.chat_delta
+"""
+
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, ".")
+
+from routers.chat_router import ChatResponse, _ChatDeltaEncoder  # noqa: E402
+
+CHARS_PER_TOKEN = 4
+CHAT_ID = "0b9b6a7e-6f55-4a6e-8d0c-7d6c8f1f7f3e"
+QUESTION = {
+    "type": "choice",
+    "options": ["Easy", "Moderate", "Hard"],
+    "min": 1,
+    "max": 1,
+    "unit": None,
+}
+
+
+def _extractions(tokens: int) -> list:
+    """
+    The partial extractions of a reply of the given length, one per token.
+    """
+    words = "Great session today, keep the tempo runs easy and sleep well. "
+    text = (words * (tokens * CHARS_PER_TOKEN // len(words) + 1))[
+        : tokens * CHARS_PER_TOKEN
+    ]
+    question = SimpleNamespace(model_dump=lambda: QUESTION)
+    extractions = [
+        SimpleNamespace(response=text[:i], question=None, complete=None)
+        for i in range(CHARS_PER_TOKEN, len(text) + 1, CHARS_PER_TOKEN)
+    ]
+    extractions.append(SimpleNamespace(response=text, question=question, complete=None))
+    extractions.append(SimpleNamespace(response=text, question=question, complete=True))
+    return extractions
+
+
+def full(extractions: list) -> str:
+    body = []
+    for extraction in extractions:
+        chat_response = ChatResponse(
+            message=extraction.response or "",
+            chat_id=CHAT_ID,
+            question=extraction.question.model_dump() if extraction.question else None,
+            complete=extraction.complete or False,
+        )
+        body.append(f"{json.dumps(chat_response.model_dump())}\n")
+    return "".join(body)
+
+
+def delta(extractions: list) -> str:
+    encoder = _ChatDeltaEncoder(CHAT_ID)
+    body = [encoder.start()]
+    for extraction in extractions:
+        body.append(encoder.update(extraction))
+    body.append(encoder.finish(extractions[-1]))
+    return "".join(body)
+
+
+def _cpu(encode, extractions: list, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.process_time()
+        encode(extractions)
+        best = min(best, time.process_time() - started_at)
+    return best
+
+
+def main():
+    for tokens in (50, 200, 800):
+        extractions = _extractions(tokens)
+        full_bytes = len(full(extractions).encode())
+        delta_bytes = len(delta(extractions).encode())
+        print(
+            f"{tokens} tokens: full {full_bytes} B in {_cpu(full, extractions) * 1e3:.2f} ms, "
+            f"delta {delta_bytes} B in {_cpu(delta, extractions) * 1e3:.2f} ms "
+            f"({full_bytes / delta_bytes:.1f}x fewer bytes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
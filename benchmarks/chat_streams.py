@@ -0,0 +1,76 @@
+"""
+Wall-clock time of concurrent structured chat streams on the async client, against a
+synthetic backend with a fixed time to first token and token rate.
+
+Run from the repository root:   python -m benchmarks.chat_streams
+"""
+
+import asyncio
+import math
+import sys
+import threading
+import time
+import httpx
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+
+sys.path.insert(0, ".")
+
+from services.llm_backends import SyntheticTransport  # noqa: E402
+from services.llm_scheduler import llm_scheduler  # noqa: E402
+from services.openai_chat_base import OpenAIBase  # noqa: E402
+
+STREAMS = 500
+# Starlette's thread pool, which used to carry one sync stream per thread.
+THREAD_POOL_SIZE = 40
+
+
+class Reply(BaseModel):
+    response: str
+    complete: bool
+
+
+async def _stream(base: OpenAIBase, index: int) -> None:
+    async for _ in base.achat_json_output_stream(
+        [], "You are a coach.", f"stream {index}", Reply
+    ):
+        pass
+
+
+async def _measure() -> tuple[float, float, int]:
+    transport = SyntheticTransport(seed="streams", ttft_ms=200, tokens_per_second=50)
+    client = AsyncOpenAI(
+        api_key="benchmark",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+    base = OpenAIBase(async_client=client)
+
+    started_at = time.perf_counter()
+    await _stream(base, -1)
+    single = time.perf_counter() - started_at
+
+    threads = threading.active_count()
+    started_at = time.perf_counter()
+    await asyncio.gather(*[_stream(base, i) for i in range(STREAMS)])
+    elapsed = time.perf_counter() - started_at
+    new_threads = threading.active_count() - threads
+    await client.close()
+    return single, elapsed, new_threads
+
+
+def main():
+    # Admission is the scheduler's job; take its caps out of the measurement.
+    llm_scheduler.max_concurrency = STREAMS
+    llm_scheduler.max_streams = STREAMS
+    single, elapsed, new_threads = asyncio.run(_measure())
+    thread_pool = single * math.ceil(STREAMS / THREAD_POOL_SIZE)
+    print(f"one stream: {single:.2f} s")
+    print(
+        f"{STREAMS} concurrent streams: {elapsed:.2f} s, {new_threads} new threads "
+        f"(a stream per thread of a {THREAD_POOL_SIZE}-thread pool: ~{thread_pool:.1f} s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-request latency and connections opened for chat completions made with a new
+AsyncOpenAI client per request against the shared, pooled one.
+The endpoint is a local keep-alive server, so the numbers leave out TLS and network
+round trips, which the pool saves as well.
+
+Run from the repository root:   python -m benchmarks.llm_connections
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from openai import AsyncOpenAI
+
+sys.path.insert(0, ".")
+
+from services import llm_backends, llm_clients  # noqa: E402
+from services.openai_chat_base import OpenAIBase  # noqa: E402
+
+REQUESTS = 200
+COMPLETION = json.dumps(
+    {
+        "id": "completion",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "ok"},
+            }
+        ],
+    }
+).encode()
+
+
+async def _serve(connections: list):
+    async def handle(reader, writer):
+        connections.append(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                await reader.readexactly(length)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n" % len(COMPLETION) + COMPLETION
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _per_request_clients(base_url: str) -> None:
+    for i in range(REQUESTS):
+        client = AsyncOpenAI(base_url=base_url, max_retries=0)
+        base = OpenAIBase(async_client=client)
+        await base.achat_str_output([], "You are a coach.", f"hi {i}")
+        await client.close()
+
+
+async def _shared_client(base_url: str) -> None:
+    for i in range(REQUESTS):
+        await OpenAIBase().achat_str_output([], "You are a coach.", f"hi {i}")
+    await llm_clients.close_llm_clients()
+
+
+async def _measure(run) -> tuple[float, int]:
+    connections = []
+    server = await _serve(connections)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    started_at = time.perf_counter()
+    await run(base_url)
+    elapsed = time.perf_counter() - started_at
+    server.close()
+    return elapsed / REQUESTS, len(connections)
+
+
+def main():
+    llm_backends.LLM_BACKEND = "live"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    for name, run in (
+        ("client per request", _per_request_clients),
+        ("shared client", _shared_client),
+    ):
+        per_request, connections = asyncio.run(_measure(run))
+        print(
+            f"{name}: {per_request * 1e3:.2f} ms per request, "
+            f"{connections} connection(s) for {REQUESTS} requests"
+        )
+
+
+if __name__ == "__main__":
+    main()
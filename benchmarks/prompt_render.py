@@ -0,0 +1,68 @@
+"""
+Time to build the plan generation prompt from the template registry against reading
+the file and chaining one str.replace per slot, for growing plan histories.
+
+Run from the repository root:   python -m benchmarks.prompt_render
+"""
+
+import json
+import sys
+import timeit
+
+sys.path.insert(0, ".")
+
+from services.prompt_templates import get_prompt_template, render_prompt  # noqa: E402
+
+NAME = "generate_fitness_plan_user_message"
+
+
+def _values(history_bytes: int) -> dict:
+    week = {
+        "week_id": "week",
+        "start_date": "2026-01-05",
+        "workouts": [
+            {
+                "date": "2026-01-05",
+                "exercises": [{"name": "Squat", "description": "4x8, 2 min rest"}] * 8,
+            }
+        ],
+    }
+    history = []
+    while len(json.dumps(history)) < history_bytes:
+        history.append(week)
+    return {
+        "instructions": json.dumps(["Prefers morning runs"] * 20, indent=2),
+        "user_data": json.dumps({"name": "Sam", "goal": "10k"}, indent=2),
+        "start_of_the_week": json.dumps("2026-03-02"),
+        "current_day": "Monday",
+        "old_training_plans": json.dumps(history, indent=2),
+        "comment": "More core work, please.",
+    }
+
+
+def replace_chain(path: str, values: dict) -> str:
+    with open(path, "r") as file:
+        prompt = file.read()
+    for slot, value in values.items():
+        prompt = prompt.replace("{" + slot + "}", value)
+    return prompt
+
+
+def _best(function, number: int = 20) -> float:
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main():
+    path = get_prompt_template(NAME).path
+    for history_kib in (1, 30, 300, 3000):
+        values = _values(history_kib * 1024)
+        chain = _best(lambda: replace_chain(path, values))
+        render = _best(lambda: render_prompt(NAME, **values))
+        print(
+            f"{history_kib} KiB history: replace chain {chain * 1e6:.0f} us, "
+            f"render {render * 1e6:.0f} us ({chain / render:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+CPU per streamed token of the structured chat stream, against re-parsing the whole
+buffer on every chunk as instructor's partial streaming does.
+
+Run from the repository root:   python -m benchmarks.structured_stream
+"""
+
+import json
+import sys
+import time
+from typing import Optional
+from instructor.dsl.partial import Partial
+from pydantic import BaseModel
+
+sys.path.insert(0, ".")
+
+from services.structured_stream import StructuredStream  # noqa: E402
+
+CHARS_PER_TOKEN = 4
+
+
+class Question(BaseModel):
+    text: str
+    options: list[str]
+
+
+class Reply(BaseModel):
+    response: str
+    complete: bool = False
+    question: Optional[Question] = None
+
+
+PARTIAL_REPLY = Partial[Reply]
+
+
+def _payload(tokens: int) -> str:
+    words = "Great session today, keep the tempo runs easy and sleep well. "
+    response = (words * (tokens * CHARS_PER_TOKEN // len(words) + 1))[
+        : tokens * CHARS_PER_TOKEN
+    ]
+    return json.dumps(
+        {
+            "response": response,
+            "question": {"text": "How did the run feel?", "options": ["Easy", "Hard"]},
+            "complete": False,
+        }
+    )
+
+
+def _chunks(payload: str) -> list[str]:
+    return [
+        payload[i : i + CHARS_PER_TOKEN]
+        for i in range(0, len(payload), CHARS_PER_TOKEN)
+    ]
+
+
+def reparse(chunks: list[str]) -> None:
+    # What create_partial does for every stream: build the Partial model, then
+    # re-parse and validate the whole buffer on every chunk.
+    for _ in Partial[Reply].model_from_chunks(chunks):
+        pass
+
+
+def reparse_prebuilt(chunks: list[str]) -> None:
+    # The same without the per-stream cost of building the Partial model.
+    for _ in PARTIAL_REPLY.model_from_chunks(chunks):
+        pass
+
+
+def incremental(chunks: list[str]) -> None:
+    stream = StructuredStream(Reply)
+    for chunk in chunks:
+        if stream.feed(chunk):
+            stream.snapshot()
+
+
+def _cpu_per_token(run, chunks: list[str], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.process_time()
+        run(chunks)
+        best = min(best, time.process_time() - started_at)
+    return best / len(chunks)
+
+
+def main():
+    StructuredStream.prepare(Reply)
+    PARTIAL_REPLY.get_partial_model()
+    for tokens in (100, 400, 1600, 6400):
+        chunks = _chunks(_payload(tokens))
+        per_stream = _cpu_per_token(reparse, chunks)
+        prebuilt = _cpu_per_token(reparse_prebuilt, chunks)
+        after = _cpu_per_token(incremental, chunks)
+        print(
+            f"{len(chunks)} chunks: re-parse {per_stream * 1e6:.1f} us/token, "
+            f"re-parse with a prebuilt model {prebuilt * 1e6:.1f} us/token, "
+            f"incremental {after * 1e6:.1f} us/token"
+        )
+
+
+if __name__ == "__main__":
+    main()
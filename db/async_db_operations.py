@@ -0,0 +1,132 @@
+from db.identity_map import invalidate
+from db.mongo_client import get_async_database
+
+
+class AsyncDbOperations:
+    """
+    Async counterpart of DbOperations for use inside the async route handlers.
+    Every write drops the collection's documents from the request's identity map.
+    """
+
+    def __init__(self, collection_name: str):
+        self.collection = get_async_database()[collection_name]
+
+    async def write_to_mongodb(self, document: dict, session=None):
+        """
+        Write something to a MongoDB database.
+        """
+        await self.collection.insert_one(document, session=session)
+        invalidate(self.collection.name)
+        return {"status": "success", "message": "Uploaded to database"}
+
+    async def write_many_to_mongodb(
+        self, documents: list[dict], ordered: bool = True, session=None
+    ):
+        """
+        Write several documents in a single round trip.
+        With ordered=False the server keeps going past a failed document.
+        """
+        result = await self.collection.insert_many(
+            documents, ordered=ordered, session=session
+        )
+        invalidate(self.collection.name)
+        return {
+            "status": "success",
+            "message": f"Uploaded {len(result.inserted_ids)} documents to database",
+        }
+
+    async def bulk_write_to_mongodb(
+        self, requests: list, ordered: bool = True, session=None
+    ):
+        """
+        Send a batch of InsertOne/UpdateOne/DeleteOne/... requests in a single round trip.
+        """
+        result = await self.collection.bulk_write(
+            requests, ordered=ordered, session=session
+        )
+        invalidate(self.collection.name)
+        return result
+
+    async def read_from_mongodb(self, query_param: str = None, projection: dict = None):
+        """
+        Read from a MongoDB database.
+        """
+        query = {"user_id": query_param}
+        response = self.collection.find(query, projection)
+        return await response.to_list(length=None)
+
+    def read_many_from_mongodb(
+        self,
+        query: dict = None,
+        projection: dict = None,
+        sort: list = None,
+        limit: int = 0,
+    ):
+        """
+        Return a cursor over the matching documents so large results can be streamed.
+        """
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    async def read_one_from_mongodb(self, query: dict = None):
+        response = await self.collection.find_one(query)
+        return response
+
+    async def read_one_from_mongodb_with_projection(
+        self, query: dict = None, projection: dict = None
+    ):
+        response = await self.collection.find_one(query, projection)
+        return response
+
+    async def read_one_from_mongodb_with_slice(
+        self, query: dict, field: str, count: int, projection: dict = None
+    ):
+        """
+        Read one document with only count elements of the array field.
+        A negative count keeps the last elements.
+        """
+        projection = {**(projection or {}), field: {"$slice": count}}
+        return await self.collection.find_one(query, projection)
+
+    async def read_one_from_mongodb_with_elem_match(
+        self, query: dict, field: str, condition: dict, projection: dict = None
+    ):
+        """
+        Read one document with only the first element of the array field matching condition.
+        """
+        projection = {**(projection or {"_id": 0}), field: {"$elemMatch": condition}}
+        return await self.collection.find_one(query, projection)
+
+    async def exists_in_mongodb(self, query: dict) -> bool:
+        """
+        Check whether a matching document exists without reading it.
+        """
+        return await self.collection.find_one(query, {"_id": 1}) is not None
+
+    async def delete_one_from_mongodb(self, query: dict = None, session=None):
+        await self.collection.delete_one(query, session=session)
+        invalidate(self.collection.name)
+        return {"status": "success", "message": "Deleted from database"}
+
+    async def delete_many_from_mongodb(self, filter: dict = None, session=None):
+        result = await self.collection.delete_many(filter, session=session)
+        invalidate(self.collection.name)
+        return {
+            "status": "success",
+            "message": f"Deleted {result.deleted_count} documents from database",
+        }
+
+    async def aggregate_from_mongodb(self, pipeline):
+        response = self.collection.aggregate(pipeline=pipeline)
+        return await response.to_list(length=None)
+
+    async def update_from_mongodb(self, query_param, new_value, session=None):
+        result = await self.collection.update_one(
+            query_param, new_value, session=session
+        )
+        invalidate(self.collection.name)
+        return result
@@ -0,0 +1,202 @@
+"""
+Chat transcript storage.
+
+The chat-history document of a chat holds its metadata and message_count. The messages
+live in chat-message-buckets, CHAT_BUCKET_SIZE per document: bucket n holds the messages
+with index n * CHAT_BUCKET_SIZE up to the next bucket. Reading a range of messages only
+loads the buckets that cover it, so the cost of reading the tail doesn't grow with the chat.
+
+Chats saved before the buckets keep their messages array on the chat-history document.
+They are read from there and moved into buckets on their next write.
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+from pymongo import ReturnDocument
+from db.async_db_operations import AsyncDbOperations
+from db.mongo_client import async_transaction
+
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_COLLECTION = "chat-history"
+CHAT_BUCKETS_COLLECTION = "chat-message-buckets"
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", 100))
+
+_CHAT_DOCUMENT_PROJECTION = {
+    "_id": 0,
+    "chat_id": 1,
+    "user_id": 1,
+    "time": 1,
+    "purpose": 1,
+    "purpose_data": 1,
+    "message_count": 1,
+    "memory_summary": 1,
+    "summarized_until": 1,
+}
+
+
+async def read_chat_document(chat_id: str) -> Optional[dict]:
+    """
+    Read the chat-history document of chat_id without its messages.
+    A legacy document keeps an empty messages list to mark it as such.
+    """
+    db_operations = AsyncDbOperations(CHAT_HISTORY_COLLECTION)
+    return await db_operations.read_one_from_mongodb_with_slice(
+        {"chat_id": chat_id}, "messages", 0, _CHAT_DOCUMENT_PROJECTION
+    )
+
+
+async def count_chat_messages(chat_document: Optional[dict]) -> int:
+    if not chat_document:
+        return 0
+    if "messages" not in chat_document:
+        return chat_document.get("message_count", 0)
+    db_operations = AsyncDbOperations(CHAT_HISTORY_COLLECTION)
+    result = await db_operations.aggregate_from_mongodb(
+        [
+            {"$match": {"chat_id": chat_document["chat_id"]}},
+            {"$project": {"count": {"$size": "$messages"}}},
+        ]
+    )
+    return result[0]["count"] if result else 0
+
+
+async def read_chat_messages(
+    chat_document: Optional[dict], start: int = 0, end: Optional[int] = None
+) -> list[dict]:
+    """
+    Return the messages of the chat with index start up to end, end defaulting to the last one.
+    Each message is a dict with role, content and its index.
+    """
+    if not chat_document:
+        return []
+    chat_id = chat_document["chat_id"]
+    if end is None:
+        end = await count_chat_messages(chat_document)
+    if "messages" in chat_document:
+        if end <= start:
+            return []
+        db_operations = AsyncDbOperations(CHAT_HISTORY_COLLECTION)
+        document = await db_operations.read_one_from_mongodb_with_slice(
+            {"chat_id": chat_id}, "messages", [start, end - start], {"_id": 0}
+        )
+        return [
+            {"role": m["role"], "content": m["content"], "index": start + i}
+            for i, m in enumerate((document or {}).get("messages", []))
+        ]
+
+    if end <= start:
+        return []
+    db_operations = AsyncDbOperations(CHAT_BUCKETS_COLLECTION)
+    buckets = db_operations.read_many_from_mongodb(
+        {
+            "chat_id": chat_id,
+            "bucket": {
+                "$gte": start // CHAT_BUCKET_SIZE,
+                "$lte": (end - 1) // CHAT_BUCKET_SIZE,
+            },
+        },
+        projection={"_id": 0, "messages": 1},
+        sort=[("bucket", 1)],
+    )
+    messages = []
+    async for bucket in buckets:
+        messages.extend(m for m in bucket["messages"] if start <= m["index"] < end)
+    return messages
+
+
+async def _write_to_buckets(
+    chat_id: str, user_id: str, messages: list[dict], start: int, session=None
+) -> None:
+    """
+    Append messages, numbered from start, to the buckets they belong to.
+    Buckets keep their messages sorted by index, so concurrent turns can't interleave them.
+    """
+    db_operations = AsyncDbOperations(CHAT_BUCKETS_COLLECTION)
+    by_bucket = {}
+    for index, message in enumerate(messages, start):
+        by_bucket.setdefault(index // CHAT_BUCKET_SIZE, []).append(
+            {"role": message["role"], "content": message["content"], "index": index}
+        )
+    for bucket, bucket_messages in by_bucket.items():
+        await db_operations.collection.update_one(
+            {"chat_id": chat_id, "bucket": bucket},
+            {
+                "$setOnInsert": {"user_id": user_id},
+                "$push": {
+                    "messages": {"$each": bucket_messages, "$sort": {"index": 1}}
+                },
+            },
+            upsert=True,
+            session=session,
+        )
+
+
+async def _move_legacy_messages(chat_id: str, user_id: str) -> None:
+    """
+    Move the messages array of a legacy chat-history document into buckets.
+    The array is only unset if it still has the length that was read, so of two
+    concurrent turns exactly one moves it and the other finds nothing left to move.
+    """
+    db_operations = AsyncDbOperations(CHAT_HISTORY_COLLECTION)
+    while True:
+        document = await db_operations.read_one_from_mongodb_with_projection(
+            {"chat_id": chat_id, "messages": {"$exists": True}},
+            {"_id": 0, "messages": 1},
+        )
+        if not document:
+            return
+        messages = document["messages"]
+        async with async_transaction() as session:
+            result = await db_operations.collection.update_one(
+                {"chat_id": chat_id, "messages": {"$size": len(messages)}},
+                {
+                    "$unset": {"messages": ""},
+                    "$set": {"message_count": len(messages)},
+                },
+                session=session,
+            )
+            if result.modified_count:
+                await _write_to_buckets(chat_id, user_id, messages, 0, session)
+                logger.info(
+                    f"Moved {len(messages)} messages of chat_id: {chat_id} into buckets."
+                )
+                return
+
+
+async def append_chat_messages(
+    chat_id: str, user_id: str, new_messages: list[dict], metadata: dict
+) -> int:
+    """
+    Append new_messages to the chat, creating it with user_id and metadata if it doesn't exist.
+    Return the number of messages in the chat afterwards.
+    The count and the messages are written in one transaction where the server supports it;
+    readers still have to allow for a count that is ahead of the buckets on a standalone server.
+    """
+    await _move_legacy_messages(chat_id, user_id)
+    db_operations = AsyncDbOperations(CHAT_HISTORY_COLLECTION)
+    async with async_transaction() as session:
+        chat_document = await db_operations.collection.find_one_and_update(
+            {"chat_id": chat_id},
+            {
+                "$setOnInsert": {"user_id": user_id, **metadata},
+                # time is the last activity, which the date range listings are based on.
+                "$set": {"time": datetime.now()},
+                "$inc": {"message_count": len(new_messages)},
+            },
+            projection={"message_count": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        message_count = chat_document["message_count"]
+        await _write_to_buckets(
+            chat_id,
+            user_id,
+            new_messages,
+            message_count - len(new_messages),
+            session,
+        )
+    return message_count
@@ -1,18 +1,10 @@
-from dotenv import load_dotenv
-import os
-import uuid
-from pymongo import MongoClient
-
-# Load .env file
-load_dotenv(override=True)
+from db.mongo_client import get_database
 
 
 class DbOperations:
     def __init__(self, collection_name: str):
-        CONNECTION_STRING = os.getenv("MONGODB_CONNECTION_STRING")
-        client = MongoClient(CONNECTION_STRING)    
-        db = client["fitness-plans"]
-        self.collection = db[collection_name]
+        # Cheap handle onto the process-wide client; no connection is opened here.
+        self.collection = get_database()[collection_name]
 
     def write_to_mongodb(self, document: dict):
         """
@@ -21,12 +13,29 @@ class DbOperations:
         self.collection.insert_one(document)
         return {"status": "success", "message": "Uploaded to database"}
 
-    def read_from_mongodb(self, query_param: str = None):
+    def write_many_to_mongodb(self, documents: list[dict], ordered: bool = True):
+        """
+        Write several documents in a single round trip.
+        With ordered=False the server keeps going past a failed document.
+        """
+        result = self.collection.insert_many(documents, ordered=ordered)
+        return {
+            "status": "success",
+            "message": f"Uploaded {len(result.inserted_ids)} documents to database",
+        }
+
+    def bulk_write_to_mongodb(self, requests: list, ordered: bool = True):
+        """
+        Send a batch of InsertOne/UpdateOne/DeleteOne/... requests in a single round trip.
+        """
+        return self.collection.bulk_write(requests, ordered=ordered)
+
+    def read_from_mongodb(self, query_param: str = None, projection: dict = None):
         """
         Read from a MongoDB database.
         """
         query = {"user_id": query_param}
-        response = self.collection.find(query)
+        response = self.collection.find(query, projection)
         return list(response)
 
     def read_one_from_mongodb(self, query: dict = None):
@@ -37,6 +46,31 @@ class DbOperations:
         response = self.collection.find_one(query, projection)
         return response
 
+    def read_one_from_mongodb_with_slice(
+        self, query: dict, field: str, count: int, projection: dict = None
+    ):
+        """
+        Read one document with only count elements of the array field.
+        A negative count keeps the last elements.
+        """
+        projection = {**(projection or {}), field: {"$slice": count}}
+        return self.collection.find_one(query, projection)
+
+    def read_one_from_mongodb_with_elem_match(
+        self, query: dict, field: str, condition: dict, projection: dict = None
+    ):
+        """
+        Read one document with only the first element of the array field matching condition.
+        """
+        projection = {**(projection or {"_id": 0}), field: {"$elemMatch": condition}}
+        return self.collection.find_one(query, projection)
+
+    def exists_in_mongodb(self, query: dict) -> bool:
+        """
+        Check whether a matching document exists without reading it.
+        """
+        return self.collection.find_one(query, {"_id": 1}) is not None
+
     def delete_one_from_mongodb(self, query: dict = None):
         self.collection.delete_one(query)
         return {"status": "success", "message": "Deleted from database"}
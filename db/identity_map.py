@@ -0,0 +1,115 @@
+import copy
+import functools
+import json
+import logging
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class IdentityMap:
+    """
+    Documents read during one request, keyed by collection and lookup key.
+    Values are copied in and out so callers can't mutate each other's documents.
+    """
+
+    def __init__(self):
+        self._documents = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, collection: str, key: str) -> Any:
+        document = self._documents.get((collection, key), _MISSING)
+        if document is _MISSING:
+            self.misses += 1
+            return _MISSING
+        self.hits += 1
+        return copy.deepcopy(document)
+
+    def put(self, collection: str, key: str, document: Any) -> None:
+        self._documents[(collection, key)] = copy.deepcopy(document)
+
+    def invalidate(self, collection: str) -> None:
+        self._documents = {
+            entry_key: document
+            for entry_key, document in self._documents.items()
+            if entry_key[0] != collection
+        }
+
+
+_current_identity_map: ContextVar[Optional[IdentityMap]] = ContextVar(
+    "identity_map", default=None
+)
+
+
+async def identity_map_scope():
+    """
+    FastAPI dependency that gives every request its own identity map.
+    Each request runs in its own task, so the map is dropped along with the task's context.
+    """
+    identity_map = IdentityMap()
+    _current_identity_map.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        logger.info(
+            f"Identity map for the request: {identity_map.hits} hits, {identity_map.misses} misses"
+        )
+
+
+def without_identity_map(
+    func: Callable[..., Awaitable[Any]],
+) -> Callable[..., Awaitable[Any]]:
+    """
+    Wrap func so it reads straight from the database even when called inside a request scope.
+    For work that runs after the response, e.g. a BackgroundTask, which shares the request's context.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _current_identity_map.set(None)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _current_identity_map.reset(token)
+
+    return wrapper
+
+
+def make_key(*parts) -> str:
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+async def cached_read(
+    collection: str, key: str, read: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Return the document read earlier in this request for the same key, or read and remember it.
+    Reads go straight to the database outside of a request scope.
+    """
+    identity_map = _current_identity_map.get()
+    if identity_map is None:
+        return await read()
+    document = identity_map.get(collection, key)
+    if document is _MISSING:
+        document = await read()
+        identity_map.put(collection, key, document)
+    return document
+
+
+def remember(collection: str, key: str, document: Any) -> None:
+    identity_map = _current_identity_map.get()
+    if identity_map is not None:
+        identity_map.put(collection, key, document)
+
+
+def invalidate(collection: str) -> None:
+    """
+    Forget every document of collection read in this request, after a write to it.
+    """
+    identity_map = _current_identity_map.get()
+    if identity_map is not None:
+        identity_map.invalidate(collection)
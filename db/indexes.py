@@ -0,0 +1,272 @@
+"""
+Index manifest for the fitness-plans database.
+
+Apply the manifest:   python -m db.indexes
+Rebuild changed ones: python -m db.indexes --rebuild
+Verify query plans:   python -m db.indexes --verify
+"""
+
+import argparse
+import logging
+import sys
+import traceback
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from db.mongo_client import get_database
+
+logger = logging.getLogger(__name__)
+
+INDEX_MANIFEST = {
+    "user-profiles": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "user-details": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "training-plans": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "weekly-training-plans": [
+        # Positional updates filter on week_id and workouts.date; the unique
+        # week_id index narrows those to a single document on its own.
+        IndexModel([("week_id", ASCENDING)], name="week_id_unique", unique=True),
+        # Answers "which plan covers date D" for a user with one range scan.
+        IndexModel(
+            [("user_id", ASCENDING), ("start_date", ASCENDING)],
+            name="user_id_start_date",
+        ),
+    ],
+    "chat-history": [
+        IndexModel([("chat_id", ASCENDING)], name="chat_id_unique", unique=True),
+        # Serves the (time, _id) keyset pagination of the chat history listing.
+        IndexModel(
+            [("user_id", ASCENDING), ("time", DESCENDING), ("_id", DESCENDING)],
+            name="user_id_time_id",
+        ),
+    ],
+    "chat-message-buckets": [
+        IndexModel(
+            [("chat_id", ASCENDING), ("bucket", ASCENDING)],
+            name="chat_id_bucket_unique",
+            unique=True,
+        ),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "password-reset-tokens": [
+        IndexModel([("token", ASCENDING)], name="token_unique", unique=True),
+        # Expired reset tokens are removed by the server once expiration has passed.
+        IndexModel(
+            [("expiration", ASCENDING)], name="expiration_ttl", expireAfterSeconds=0
+        ),
+    ],
+    "llm-response-cache": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        # Cached responses are removed by the server once expires_at has passed.
+        IndexModel(
+            [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+        ),
+    ],
+}
+
+# (collection, filter, sort) for every query shape the application issues.
+VERIFIED_QUERIES = [
+    ("user-profiles", {"email": "verify@example.com"}, None),
+    ("user-profiles", {"user_id": "verify"}, None),
+    ("user-details", {"user_id": "verify"}, None),
+    ("training-plans", {"user_id": "verify"}, None),
+    ("weekly-training-plans", {"week_id": "verify"}, None),
+    (
+        "weekly-training-plans",
+        {"week_id": "verify", "workouts.date": "2024-01-01"},
+        None,
+    ),
+    (
+        "weekly-training-plans",
+        {"week_id": {"$in": ["verify-1", "verify-2"]}},
+        [("start_date", ASCENDING)],
+    ),
+    ("weekly-training-plans", {"user_id": "verify"}, None),
+    (
+        "weekly-training-plans",
+        {"user_id": "verify", "start_date": "2024-01-01"},
+        None,
+    ),
+    (
+        "weekly-training-plans",
+        {
+            "user_id": "verify",
+            "start_date": {"$gte": "2024-01-01", "$lte": "2024-01-07"},
+        },
+        [("start_date", DESCENDING)],
+    ),
+    ("chat-history", {"chat_id": "verify"}, None),
+    ("chat-history", {"user_id": "verify"}, None),
+    (
+        "chat-history",
+        {
+            "user_id": "verify",
+            "time": {"$gte": datetime(2024, 1, 1), "$lte": datetime(2024, 1, 31)},
+        },
+        [("time", DESCENDING), ("_id", DESCENDING)],
+    ),
+    (
+        "chat-message-buckets",
+        {"chat_id": "verify", "bucket": {"$gte": 0, "$lte": 1}},
+        [("bucket", ASCENDING)],
+    ),
+    ("chat-message-buckets", {"user_id": "verify"}, None),
+    ("password-reset-tokens", {"token": "verify"}, None),
+    ("llm-response-cache", {"key": "verify"}, None),
+]
+
+
+# Index options that change what an index enforces; a difference in any of them
+# means the index has to be rebuilt.
+_COMPARED_OPTIONS = (
+    "unique",
+    "sparse",
+    "expireAfterSeconds",
+    "partialFilterExpression",
+)
+
+
+def _index_spec(index: dict) -> tuple:
+    """
+    Key pattern and compared options of an IndexModel document or an index_information() entry.
+    """
+    key = dict(index["key"])
+    key = tuple(
+        (field, int(direction) if isinstance(direction, float) else direction)
+        for field, direction in key.items()
+    )
+    options = tuple(
+        (option, index.get(option, False if option in ("unique", "sparse") else None))
+        for option in _COMPARED_OPTIONS
+    )
+    return key, options
+
+
+def _changed_indexes(collection, indexes: list[IndexModel]) -> list[str]:
+    """
+    Names of the manifest indexes whose existing version has a different key or options.
+    """
+    existing = collection.index_information()
+    changed = []
+    for model in indexes:
+        spec = model.document
+        current = existing.get(spec["name"])
+        if current is not None and _index_spec(current) != _index_spec(spec):
+            logger.warning(
+                f"Index {spec['name']} on {collection.name} differs from the manifest: "
+                f"{_index_spec(current)} -> {_index_spec(spec)}"
+            )
+            changed.append(spec["name"])
+    return changed
+
+
+def ensure_indexes(db=None, rebuild: bool = False) -> list[str]:
+    """
+    Create every index in INDEX_MANIFEST. Indexes whose key or options changed are only
+    logged, unless rebuild is set, in which case they are dropped and created again.
+    Dropping leaves the collection without the index until it is rebuilt, so rebuild is
+    meant for `python -m db.indexes --rebuild`, not for every worker's startup.
+    A failing collection is logged and skipped; the names of the failed collections are returned.
+    """
+    db = db if db is not None else get_database()
+    failures = []
+    for collection_name, indexes in INDEX_MANIFEST.items():
+        try:
+            collection = db[collection_name]
+            changed = _changed_indexes(collection, indexes)
+            if rebuild:
+                for name in changed:
+                    logger.warning(f"Rebuilding index {name} on {collection_name}")
+                    collection.drop_index(name)
+            else:
+                if changed:
+                    logger.warning(
+                        f"Not rebuilding {', '.join(changed)} on {collection_name}; "
+                        "run `python -m db.indexes --rebuild` to apply the manifest."
+                    )
+                indexes = [
+                    model for model in indexes if model.document["name"] not in changed
+                ]
+            created = collection.create_indexes(indexes) if indexes else []
+            logger.info(f"Ensured indexes on {collection_name}: {', '.join(created)}")
+        except Exception as e:
+            error_message = f"Error ensuring indexes on {collection_name}: {str(e)}"
+            logger.error(error_message)
+            logger.error(traceback.format_exc())
+            failures.append(collection_name)
+    return failures
+
+
+def verify_indexes(db=None) -> list[str]:
+    """
+    Explain every query in VERIFIED_QUERIES and return the ones that fall back to a COLLSCAN.
+    """
+    db = db if db is not None else get_database()
+    failures = []
+    for collection_name, query, sort in VERIFIED_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            failures.append(f"{collection_name}: {query}")
+    return failures
+
+
+def _plan_stages(plan) -> set[str]:
+    """
+    Collect stage names from a (possibly nested) explain plan.
+    """
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= _plan_stages(item)
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or verify MongoDB indexes.")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Explain every application query and fail if any of them uses a COLLSCAN.",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop and recreate manifest indexes whose key or options changed.",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        if args.verify:
+            failures = verify_indexes()
+            if failures:
+                for failure in failures:
+                    logger.error(f"COLLSCAN for query on {failure}")
+                sys.exit(1)
+            logger.info("All application queries are served by an index.")
+        else:
+            failures = ensure_indexes(rebuild=args.rebuild)
+            if failures:
+                logger.error(f"Indexes not applied on: {', '.join(failures)}")
+                sys.exit(1)
+    except Exception as e:
+        logger.error(f"Error applying indexes: {str(e)}")
+        logger.error(traceback.format_exc())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
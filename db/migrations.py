@@ -0,0 +1,114 @@
+"""
+Online data migrations. Each migration is idempotent and safe to run while the app is serving.
+
+Run a migration:   python -m db.migrations <name>
+"""
+
+import argparse
+import logging
+import sys
+import traceback
+from datetime import datetime
+from pymongo import UpdateOne
+from db.db_operations import DbOperations
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def migrate_chat_history_time(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Convert chat-history time values stored as ISO strings into BSON datetimes.
+    Each update is conditioned on the old string value, so a concurrent chat save
+    that already wrote a datetime is never overwritten.
+    """
+    db_operations = DbOperations("chat-history")
+    migrated = 0
+    while True:
+        chats = list(
+            db_operations.collection.find(
+                {"time": {"$type": "string"}}, {"time": 1}
+            ).limit(batch_size)
+        )
+        if not chats:
+            break
+        requests = [
+            UpdateOne(
+                {"_id": chat["_id"], "time": chat["time"]},
+                {"$set": {"time": datetime.fromisoformat(chat["time"])}},
+            )
+            for chat in chats
+        ]
+        result = db_operations.bulk_write_to_mongodb(requests, ordered=False)
+        migrated += result.modified_count
+        logger.info(f"Migrated {migrated} chat-history time values so far.")
+    return migrated
+
+
+def backfill_weekly_plan_owner() -> int:
+    """
+    Copy user_id and start_date from each training-plans week entry onto its
+    weekly-training-plans document, so the week covering a date can be looked up
+    directly on the (user_id, start_date) index.
+    """
+    training_plan_dboperations = DbOperations("training-plans")
+    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    backfilled = 0
+    for training_plan in training_plan_dboperations.collection.find(
+        {}, {"user_id": 1, "training_plan": 1}
+    ):
+        requests = []
+        for weeks in training_plan.get("training_plan", {}).values():
+            # the overall summary sits next to the years
+            if not isinstance(weeks, dict):
+                continue
+            for week in weeks.values():
+                requests.append(
+                    UpdateOne(
+                        {
+                            "week_id": week["week_id"],
+                            "$or": [
+                                {"user_id": {"$exists": False}},
+                                {"start_date": {"$exists": False}},
+                            ],
+                        },
+                        {
+                            "$set": {
+                                "user_id": training_plan["user_id"],
+                                "start_date": week["start_date"],
+                            }
+                        },
+                    )
+                )
+        if requests:
+            result = weekly_plan_dboperations.bulk_write_to_mongodb(
+                requests, ordered=False
+            )
+            backfilled += result.modified_count
+    return backfilled
+
+
+MIGRATIONS = {
+    "chat-history-time": migrate_chat_history_time,
+    "weekly-plan-owner": backfill_weekly_plan_owner,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an online data migration.")
+    parser.add_argument("name", choices=sorted(MIGRATIONS.keys()))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        count = MIGRATIONS[args.name]()
+        logger.info(f"Migration {args.name} finished. {count} documents updated.")
+    except Exception as e:
+        logger.error(f"Error running migration {args.name}: {str(e)}")
+        logger.error(traceback.format_exc())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
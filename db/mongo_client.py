@@ -0,0 +1,126 @@
+from dotenv import load_dotenv
+import os
+import threading
+import logging
+from contextlib import asynccontextmanager
+from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Load .env file
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "fitness-plans"
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+# Whether the server accepts multi-document transactions, learned from its hello reply.
+_transactions_supported = None
+
+
+def _client_options() -> dict:
+    """
+    Pool size and timeouts for the shared client, configurable through the environment.
+    """
+    return {
+        "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", 5)),
+        "maxIdleTimeMS": int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", 300000)),
+        "connectTimeoutMS": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 10000)),
+        "serverSelectionTimeoutMS": int(
+            os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 10000)
+        ),
+        "socketTimeoutMS": int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 30000)),
+    }
+
+
+def get_mongo_client() -> MongoClient:
+    """
+    Return the process-wide MongoClient, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    os.getenv("MONGODB_CONNECTION_STRING"), **_client_options()
+                )
+    return _client
+
+
+def get_database():
+    return get_mongo_client()[DATABASE_NAME]
+
+
+def get_async_mongo_client() -> AsyncIOMotorClient:
+    """
+    Return the process-wide Motor client used by the async route handlers.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncIOMotorClient(
+                    os.getenv("MONGODB_CONNECTION_STRING"), **_client_options()
+                )
+    return _async_client
+
+
+def get_async_database():
+    return get_async_mongo_client()[DATABASE_NAME]
+
+
+async def _detect_transaction_support() -> bool:
+    """
+    Transactions need a replica set member or a mongos; a standalone mongod rejects them.
+    """
+    global _transactions_supported
+    hello = await get_async_mongo_client().admin.command("hello")
+    _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    logger.info(f"MongoDB transactions supported: {_transactions_supported}")
+    return _transactions_supported
+
+
+async def _use_transactions() -> bool:
+    """
+    MONGODB_TRANSACTIONS=true or false forces the choice; auto (the default) asks the server.
+    """
+    setting = os.getenv("MONGODB_TRANSACTIONS", "auto").lower()
+    if setting != "auto":
+        return setting == "true"
+    if _transactions_supported is None:
+        return await _detect_transaction_support()
+    return _transactions_supported
+
+
+@asynccontextmanager
+async def async_transaction():
+    """
+    Yield a session whose writes commit or abort together.
+    Against a standalone server, which can't run transactions, the session is only shared.
+    """
+    use_transactions = await _use_transactions()
+    async with await get_async_mongo_client().start_session() as session:
+        if use_transactions:
+            async with session.start_transaction():
+                yield session
+        else:
+            yield session
+
+
+async def warm_up_async_mongo_client() -> None:
+    await _detect_transaction_support()
+    logger.info("Async MongoDB client pool is warmed up.")
+
+
+def close_mongo_client() -> None:
+    global _client, _async_client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        if _async_client is not None:
+            _async_client.close()
+            _async_client = None
@@ -1,7 +1,18 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import traceback
 import logging
+import os
+
+from db.identity_map import identity_map_scope
+from db.indexes import ensure_indexes
+from db.mongo_client import warm_up_async_mongo_client, close_mongo_client
+from routers.helpers.daily_summary_scheduler import daily_summary_scheduler
+from services.assistant_registry import load_assistant_registry
+from services.llm_clients import close_llm_clients
+from services.prompt_templates import load_prompt_templates
 
 from routers.generate_plan import router as generate_plan_router
 from routers.chat_router import router as chat_router
@@ -12,7 +23,33 @@ from routers.modify_workout_plan import router as modify_workout_plan_router
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared MongoDB pool up front so the first request doesn't pay for it.
+    try:
+        await warm_up_async_mongo_client()
+    except Exception as e:
+        logging.error(f"Error warming up MongoDB client: {str(e)}")
+    if os.getenv("MONGODB_ENSURE_INDEXES", "true").lower() == "true":
+        # Create-only: indexes whose options changed are rebuilt with `python -m db.indexes --rebuild`.
+        try:
+            await run_in_threadpool(ensure_indexes)
+        except Exception as e:
+            logging.error(f"Error ensuring MongoDB indexes: {str(e)}")
+    # Parse every prompt once; a missing or unreadable prompt file fails startup.
+    load_prompt_templates()
+    # Chat assistants are shared by every request, so their schemas are built once here.
+    load_assistant_registry()
+    yield
+    # Finish queued daily summaries while the clients are still open.
+    await daily_summary_scheduler.drain()
+    close_mongo_client()
+    await close_llm_clients()
+
+
+# Every request gets its own identity map so repeated document reads hit Mongo once.
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(identity_map_scope)])
 
 # if other ports for frontend will be used, add them here
 origins = [
@@ -31,6 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor"],  # Chat history pagination token
 )
 
 # Register routers
@@ -2,7 +2,7 @@ from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from db.db_operations import DbOperations
+from db.async_db_operations import AsyncDbOperations
 from passlib.context import CryptContext 
 from notifications.smtp_notifications import SMTPNotifications
 from notifications.sendGrid_notifications import SendGridNotifications
@@ -62,9 +62,9 @@ async def register(userProfile: CreateUserRequest):
             status_code=status.HTTP_400_BAD_REQUEST, detail=error_message
         )
 
-    db_ops = DbOperations("user-profiles")
+    db_ops = AsyncDbOperations("user-profiles")
     try: 
-        existing_user = db_ops.read_one_from_mongodb({"email": userProfile.email})
+        existing_user = await db_ops.exists_in_mongodb({"email": userProfile.email})
     except Exception as e:
         error_message = f"Error reading given email from database: {str(e)}"
         logger.error(error_message)
@@ -90,7 +90,7 @@ async def register(userProfile: CreateUserRequest):
         "role": userProfile.role
     }
     try:
-        db_ops.write_to_mongodb(new_user)
+        await db_ops.write_to_mongodb(new_user)
     except Exception as e:
         error_message = f"Error saving user login profile while registering in MongoDB: {str(e)}"
         logger.error(error_message)
@@ -98,12 +98,16 @@ async def register(userProfile: CreateUserRequest):
         raise HTTPException(
             status_code=500, detail=error_message
         )
+    # A user_id cached for a deleted account with this email must not outlive it.
+    # Imported here since user_profile depends on this module through authorization.
+    from routers.user_profile import invalidate_user_id
+    invalidate_user_id(userProfile.email)
     
     return {"status": "success", "message": "User registered successfully"}
 
 @router.post("/token", response_model=Token)
 async def login_access_for_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = _authenticate_user(form_data.username, form_data.password)
+    user = await _authenticate_user(form_data.username, form_data.password)
     if not user:
         error_message = "Incorrect email or password."
         logger.error(error_message)
@@ -143,14 +147,14 @@ async def reset_password_request(email: str):
             detail="Invalid email address"
         )
     
-    db_ops = DbOperations("user-profiles")
-    user = db_ops.read_one_from_mongodb({"email": email})
-    if not user:
+    db_ops = AsyncDbOperations("user-profiles")
+    user_exists = await db_ops.exists_in_mongodb({"email": email})
+    if not user_exists:
         # To prevent email enumeration, we'll return a success message even if the user doesn't exist
         return {"message": "There is no existing account associated with the email."}, 200
     
     reset_token = secrets.token_urlsafe(32)
-    _store_reset_token(email, reset_token)
+    await _store_reset_token(email, reset_token)
     
     # TODO: reset_link needs to be updated later
     reset_link = f"https://yourapp.com/reset-password?token={reset_token}"
@@ -160,22 +164,22 @@ async def reset_password_request(email: str):
 
 @router.post("/reset_password")
 async def reset_password(request: ResetPasswordRequest):
-    token_data = _validate_reset_token(request.token)
+    token_data = await _validate_reset_token(request.token)
     if not token_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired token."
         )
     
-    _update_user_password(token_data["email"], request.new_password)
-    _delete_reset_token(request.token)
+    await _update_user_password(token_data["email"], request.new_password)
+    await _delete_reset_token(request.token)
     
     return {"message": "Password has been reset successfully"}, 200
 
-def _store_reset_token(email: str, token: str):
+async def _store_reset_token(email: str, token: str):
     expiration = datetime.utcnow() + timedelta(minutes=10)
-    db_ops = DbOperations("password-reset-tokens")
-    db_ops.write_to_mongodb({
+    db_ops = AsyncDbOperations("password-reset-tokens")
+    await db_ops.write_to_mongodb({
         "email": email,
         "token": token,
         "expiration": expiration,
@@ -225,24 +229,26 @@ def _send_reset_email(email: str, reset_link: str):
     sendGrid_email_notifications = SendGridNotifications(email, sendGrid_html_content, subject)
     sendGrid_email_notifications.send_email()
 
-def _validate_reset_token(token: str):
-    db_ops = DbOperations("password-reset-tokens")
-    token_data = db_ops.read_one_from_mongodb({"token": token})
+async def _validate_reset_token(token: str):
+    db_ops = AsyncDbOperations("password-reset-tokens")
+    token_data = await db_ops.read_one_from_mongodb_with_projection(
+        {"token": token}, {"_id": 0, "email": 1, "expiration": 1}
+    )
     if not token_data or token_data["expiration"] < datetime.utcnow():
         return None
     return token_data
 
-def _update_user_password(email: str, new_password: str):
-    db_ops = DbOperations("user-profiles")
+async def _update_user_password(email: str, new_password: str):
+    db_ops = AsyncDbOperations("user-profiles")
     hashed_password = pwd_context.hash(new_password)
-    db_ops.update_from_mongodb(
+    await db_ops.update_from_mongodb(
         {"email": email},
         {"$set": {"hashed_password": hashed_password}}
     )
 
-def _delete_reset_token(token: str):
-    db_ops = DbOperations("password-reset-tokens")
-    result = db_ops.delete_one_from_mongodb({"token": token})
+async def _delete_reset_token(token: str):
+    db_ops = AsyncDbOperations("password-reset-tokens")
+    result = await db_ops.delete_one_from_mongodb({"token": token})
     # Check if a document was actually deleted
     if result.get("deleted_count", 0) == 0:
         logger.info(f"Token {token} was not found or already deleted.")
@@ -258,10 +264,12 @@ def _create_access_token(email: str, role: str, expires_delta: timedelta):
     encode.update({'exp': expire})
     return jwt.encode(encode, os.getenv("SECRET_KEY"), algorithm=ALGORITHM)
 
-def _authenticate_user(email: str, password: str):
+async def _authenticate_user(email: str, password: str):
 
-    db_ops = DbOperations("user-profiles")
-    user = db_ops.read_one_from_mongodb({"email": email})
+    db_ops = AsyncDbOperations("user-profiles")
+    user = await db_ops.read_one_from_mongodb_with_projection(
+        {"email": email}, {"_id": 0, "email": 1, "role": 1, "hashed_password": 1}
+    )
     if not user:
         return False
     if not pwd_context.verify(password, user['hashed_password']):
@@ -1,22 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, File, UploadFile
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Depends,
+    Query,
+    File,
+    UploadFile,
+    Response,
+)
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Union
-from db.db_operations import DbOperations
+from db.async_db_operations import AsyncDbOperations
+from db.chat_messages import append_chat_messages
+from db.identity_map import without_identity_map
 from authorization import user_or_admin_required
 from datetime import datetime, time, timedelta
 import uuid
-from services.onboarding_assistant import OnboardingAssistant, OnboardingPurposeData
-from services.workout_journal_assistant import (
-    WorkoutJournalAssistant,
-    WorkoutJournalPurposeData,
-)
-from services.workout_guide_assistant import (
-    WorkoutGuideAssistant,
-    WorkoutGuidePurposeData,
-)
-from services.workout_log_assistant import WorkoutLogAssistant
-from openai import OpenAI
+import base64
+import bson
+from bson import ObjectId
+from services.conversation_memory import ConversationMemory
+from services.assistant_registry import get_assistant_registry
 import logging
 import traceback
 import json
@@ -29,6 +34,10 @@ router = APIRouter(prefix="/chat", tags=["chat"])
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+CURSOR_DESCRIPTION = (
+    "Continuation token from the X-Next-Cursor header of the previous page"
+)
+
 
 class ChatMessage(BaseModel):
     content: str
@@ -76,11 +85,62 @@ class ChatResponse(BaseModel):
     complete: bool
 
 
+class _ChatDeltaEncoder:
+    """
+    Encodes the partial extractions of a reply as server-sent events carrying only what changed:
+    start (chat_id), delta (text appended to the message), replace (the whole message, if it
+    was rewritten rather than extended), question (once it is complete) and complete (last).
+    """
+
+    def __init__(self, chat_id: str):
+        self.chat_id = chat_id
+        self.event_id = 0
+        self.text = ""
+        self.question_sent = False
+
+    def _event(self, event: str, data: dict) -> str:
+        self.event_id += 1
+        return f"id: {self.event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def _question(self, extraction) -> str:
+        self.question_sent = True
+        return self._event("question", {"question": extraction.question.model_dump()})
+
+    def start(self) -> str:
+        return self._event("start", {"chat_id": self.chat_id})
+
+    def update(self, extraction) -> str:
+        frames = []
+        text = extraction.response or ""
+        if text != self.text:
+            if text.startswith(self.text):
+                frames.append(self._event("delta", {"text": text[len(self.text) :]}))
+            else:
+                frames.append(self._event("replace", {"text": text}))
+            self.text = text
+        # Fields stream in order, so the question is complete once complete has started.
+        if (
+            extraction.question
+            and extraction.complete is not None
+            and not self.question_sent
+        ):
+            frames.append(self._question(extraction))
+        return "".join(frames)
+
+    def finish(self, extraction) -> str:
+        frames = []
+        if extraction and extraction.question and not self.question_sent:
+            frames.append(self._question(extraction))
+        complete = bool(extraction and extraction.complete)
+        frames.append(self._event("complete", {"complete": complete}))
+        return "".join(frames)
+
+
 # For testing purpose. Can be removed later if not used.
 @router.post("/translate")
 async def translate_audio(audio: UploadFile = File(...)):
     translator = Translator(audio)
-    translated_text = translator.translate()
+    translated_text = await translator.translate()
     return {"translated_text": translated_text}
 
 
@@ -88,65 +148,63 @@ async def translate_audio(audio: UploadFile = File(...)):
 @router.post("/transcribe")
 async def transcribe_audio(audio: UploadFile = File(...)):
     translator = Translator(audio)
-    transcribed_text = translator.transcribe()
+    transcribed_text = await translator.transcribe()
     return {"transcribed_text": transcribed_text}
 
 
 @router.post("/chat", response_class=StreamingResponse)
 async def chat(
-    request: ChatRequest, current_user: dict = Depends(user_or_admin_required)
+    request: ChatRequest,
+    delta: bool = Query(
+        False,
+        description="Stream server-sent events with only the new text instead of full responses",
+    ),
+    current_user: dict = Depends(user_or_admin_required),
 ):
     """
     Process a chat message and return a response.
+    By default every partial response is sent in full as a JSON line.
+    With delta=true the response is streamed as server-sent events, see _ChatDeltaEncoder.
     """
     try:
         chat_id = request.chat_id or str(uuid.uuid4())
         user_id = await get_user_id_internal(current_user["email"])
-        chat_history, _, _ = gph._get_chat_history(chat_id, False)
-        user_memories = gph._extract_user_memories(user_id=user_id)
+        user_memories = await gph._extract_user_memories(user_id=user_id)
         # user_message isn't needed for the initial message, marked by empty content.
         user_message = (
             {"role": "user", "content": request.message} if request.message else None
         )
 
-        client = OpenAI()
-        if request.purpose == ChatPurpose.ONBOARDING:
-            assistant = OnboardingAssistant(client)
-            purpose_data: OnboardingPurposeData = {
-                "user_name": request.purpose_data.user_name
-            }
-        elif request.purpose == ChatPurpose.WORKOUT_JOURNAL:
-            assistant = WorkoutJournalAssistant(client)
-            purpose_data: WorkoutJournalPurposeData = {
-                "workout_date": request.purpose_data.workout_date,
-                "user_email": current_user["email"],
-            }
-        elif request.purpose == ChatPurpose.WORKOUT_GUIDE:
-            assistant = WorkoutGuideAssistant(client)
-            purpose_data: WorkoutGuidePurposeData = {
-                "workout_date": datetime.strptime(
-                    request.purpose_data.workout_guide_date, "%Y-%m-%d"
-                ),
-                "user_email": current_user["email"],
-            }
-        elif request.purpose == ChatPurpose.WORKOUT_LOG:
-            assistant = WorkoutLogAssistant(client)
-            purpose_data = None
-        else:
+        registered = get_assistant_registry().get(request.purpose)
+        if registered is None:
             raise HTTPException(status_code=400, detail="Invalid chat purpose")
+        assistant = registered.assistant
+        purpose_data = registered.build_purpose_data(
+            request.purpose_data, current_user["email"]
+        )
 
+        # Older turns reach the model through the rolling summary, so only the tail is read.
+        memory = ConversationMemory(chat_id)
+        prompt_history = await memory.window()
         ai_response_stream, system_message = await assistant.chat(
-            chat_history,
+            prompt_history,
             request.message,
             purpose_data,
             json.dumps(user_memories, indent=2),
         )
 
-        def generate():
-            nonlocal chat_history
+        async def generate():
             full_response = None
-            for extraction in ai_response_stream:
+            encoder = _ChatDeltaEncoder(chat_id) if delta else None
+            if encoder:
+                yield encoder.start()
+            async for extraction in ai_response_stream:
                 full_response = extraction
+                if encoder:
+                    frames = encoder.update(extraction)
+                    if frames:
+                        yield frames
+                    continue
                 chat_response = ChatResponse(
                     message=extraction.response if extraction.response else "",
                     chat_id=chat_id,
@@ -158,23 +216,34 @@ async def chat(
                     complete=extraction.complete if extraction.complete else False,
                 )
                 yield f"{json.dumps(chat_response.model_dump())}\n"
+            if encoder:
+                yield encoder.finish(full_response)
 
             if full_response:
-                ai_message = {"role": "assistant", "content": full_response.response}
+                # Only this turn is written; earlier messages are already stored.
+                new_messages = []
                 if system_message:
-                    chat_history = [{"role": "system", "content": system_message}]
+                    new_messages.append({"role": "system", "content": system_message})
                 if user_message:
-                    chat_history.append(user_message)
-                chat_history.append(ai_message)
-                _save_chat_messages(
+                    new_messages.append(user_message)
+                new_messages.append(
+                    {"role": "assistant", "content": full_response.response}
+                )
+                await _save_chat_messages(
                     user_id,
                     chat_id,
-                    chat_history,
+                    new_messages,
                     request.purpose,
                     request.purpose_data,
                 )
 
-        return StreamingResponse(generate(), media_type="text/event-stream")
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            background=BackgroundTask(without_identity_map(memory.update_summary)),
+        )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         error_location = traceback.extract_tb(e.__traceback__)[-1]
         error_file = error_location.filename
@@ -194,12 +263,34 @@ class ChatHistoryResponse(BaseModel):
 
 
 @router.get("/chat/{chat_id}", response_model=ChatHistoryResponse)
-async def get_chat_history(chat_id: str):
+async def get_chat_history(
+    chat_id: str,
+    response: Response,
+    limit: Optional[int] = Query(
+        None, ge=1, le=500, description="Return only the last limit messages"
+    ),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+):
     """
     Retrieve chat history, purpose, and purpose data for a given chat ID.
+    With limit, only the last limit messages are returned, and the cursor for the
+    messages before them is returned in the X-Next-Cursor header.
     """
+    before = None
+    if cursor:
+        try:
+            before = int(cursor)
+        except ValueError:
+            error_message = "Invalid pagination cursor."
+            logger.error(error_message)
+            logger.error(traceback.format_exc())
+            raise HTTPException(status_code=400, detail=error_message)
     try:
-        chat_history, purpose, purpose_data = gph._get_chat_history(chat_id, True)
+        chat_history, purpose, purpose_data, next_before = (
+            await gph._get_chat_history_page(chat_id, True, limit, before)
+        )
+        if limit is not None and next_before is not None:
+            _set_next_cursor_header(response, str(next_before))
 
         # Convert purpose to ChatPurpose enum
         purpose_enum = ChatPurpose(purpose) if purpose else None
@@ -225,13 +316,16 @@ async def get_chat_history(chat_id: str):
 
 @router.get("/getChatHistoryByDate", response_model=dict)
 async def get_today_chat_history(
+    response: Response,
     date: str = Query(..., description="Start date in ISO format (YYYY-MM-DD)"),
     offset: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     current_user: dict = Depends(user_or_admin_required),
 ):
     """
     Returns a JSON response with date as key and lists of chat ids as values, sorted by time (most recent first)
+    The continuation token for the next page is returned in the X-Next-Cursor header.
     """
     user_id = await get_user_id_internal(current_user["email"])
     try:
@@ -244,22 +338,27 @@ async def get_today_chat_history(
     date_start = datetime.combine(date_datetime.date(), time.min)
     date_end = datetime.combine(date_datetime.date(), time.max)
 
-    return _get_chat_ids_from_date_range_with_pagination(
-        user_id, date_start, date_end, offset, limit
+    chat_history, next_cursor = await _get_chat_ids_from_date_range_with_pagination(
+        user_id, date_start, date_end, offset, limit, cursor
     )
+    _set_next_cursor_header(response, next_cursor)
+    return chat_history
 
 
 @router.get("/getChatHistoryByDateRange", response_model=dict)
 async def get_chat_history_by_date_range(
+    response: Response,
     start_date: str = Query(..., description="Start date in ISO format (YYYY-MM-DD)"),
     end_date: str = Query(..., description="End date in ISO format (YYYY-MM-DD)"),
     offset: int = Query(0, ge=0, description="Offset for pagination"),
     limit: int = Query(10, ge=1, le=100, description="Limit for pagination"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     current_user: dict = Depends(user_or_admin_required),
 ):
     """
     Returns a JSON response with dates as keys and lists of chat ids as values
     for the given user within the specified date range, sorted by time (most recent first)
+    The continuation token for the next page is returned in the X-Next-Cursor header.
     """
     user_id = await get_user_id_internal(current_user["email"])
 
@@ -274,23 +373,28 @@ async def get_chat_history_by_date_range(
 
     start_datetime = datetime.combine(start_datetime.date(), time.min)
     end_datetime = datetime.combine(end_datetime.date(), time.max)
-    return _get_chat_ids_from_date_range_with_pagination(
-        user_id, start_datetime, end_datetime, offset, limit
+    chat_history, next_cursor = await _get_chat_ids_from_date_range_with_pagination(
+        user_id, start_datetime, end_datetime, offset, limit, cursor
     )
+    _set_next_cursor_header(response, next_cursor)
+    return chat_history
 
 
 @router.get("/getChatHistoryByYearMonth", response_model=List[str])
 async def get_chat_history_by_year_month(
+    response: Response,
     year: int = Query(..., description="Year for chat history"),
     month: Optional[int] = Query(None, description="Month for chat history (optional)"),
     offset: int = Query(0, ge=0, description="Offset for pagination"),
     limit: int = Query(10, ge=1, le=100, description="Limit for pagination"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     current_user: dict = Depends(user_or_admin_required),
 ):
     """
     Returns a list of chat ids for the given user based on the specified year and month,
-    with pagination support using offset and limit.
+    with pagination support using a cursor (or offset) and limit.
     If month is not provided, it returns chat ids for the entire year.
+    The continuation token for the next page is returned in the X-Next-Cursor header.
     """
     user_id = await get_user_id_internal(current_user["email"])
 
@@ -306,9 +410,10 @@ async def get_chat_history_by_year_month(
             start_date = datetime(year, 1, 1)
             end_date = datetime(year, 12, 31, 23, 59, 59)
 
-        chat_history = _get_chat_ids_from_date_range_with_pagination(
-            user_id, start_date, end_date, offset, limit
+        chat_history, next_cursor = await _get_chat_ids_from_date_range_with_pagination(
+            user_id, start_date, end_date, offset, limit, cursor
         )
+        _set_next_cursor_header(response, next_cursor)
 
         # Flatten the dictionary into a list of chat IDs
         chat_ids = [
@@ -316,6 +421,8 @@ async def get_chat_history_by_year_month(
         ]
 
         return chat_ids
+    except HTTPException as he:
+        raise he
     except ValueError as ve:
         error_message = f"Invalid date: {str(ve)}"
         logger.error(error_message)
@@ -327,39 +434,63 @@ async def get_chat_history_by_year_month(
         raise HTTPException(status_code=500, detail=error_message)
 
 
-def _get_chat_ids_from_date_range_with_pagination(
-    user_id: str, start_time: datetime, end_time: datetime, offset: int, limit: int
-) -> Dict[str, List[str]]:
+async def _get_chat_ids_from_date_range_with_pagination(
+    user_id: str,
+    start_time: datetime,
+    end_time: datetime,
+    offset: int,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> tuple[Dict[str, List[str]], Optional[str]]:
     """
     Retrieve a dictionary of dates and their corresponding chat_ids based on start date and end date
     from chat-history collection, with pagination support.
+    Pages after the first one are read from the position encoded in cursor, so deep pages
+    cost the same as the first one. offset is only applied when no cursor is given.
+    Also return the cursor of the next page, or None if this is the last page.
     """
-    db_operations = DbOperations("chat-history")
+    position = _decode_chat_history_cursor(cursor) if cursor else None
+    # Fetch enough rows from each time type to fill the page after the merge.
+    fetch = limit if cursor else offset + limit
+
+    db_operations = AsyncDbOperations("chat-history")
     try:
-        chats = (
-            db_operations.collection.find(
-                {
-                    "user_id": user_id,
-                    "time": {
-                        "$gte": start_time.isoformat(),
-                        "$lte": end_time.isoformat(),
-                    },
-                },
-                {"chat_id": 1, "time": 1},
+        chats = []
+        # Chats not reached by `python -m db.migrations chat-history-time` yet still store
+        # time as an ISO string. MongoDB compares values of one type at a time, so both
+        # types are read and merged until the migration has finished.
+        for to_stored in (_as_datetime, datetime.isoformat):
+            query = _chat_history_range_query(
+                user_id, start_time, end_time, position, to_stored
             )
-            .sort("time", -1)
-            .skip(offset)
-            .limit(limit)
-        )
+            async for chat in db_operations.read_many_from_mongodb(
+                query,
+                projection={"chat_id": 1, "time": 1},
+                sort=[("time", -1), ("_id", -1)],
+                limit=fetch,
+            ):
+                chat["time"] = _as_datetime(chat["time"])
+                chats.append(chat)
+        chats.sort(key=lambda chat: (chat["time"], chat["_id"]), reverse=True)
+        chats = chats[fetch - limit : fetch]
 
         chat_history = {}
+        last_chat = None
+        count = 0
         for chat in chats:
-            date = chat["time"].split("T")[0]  # Extract date from ISO format
+            date = chat["time"].date().isoformat()
             if date not in chat_history:
                 chat_history[date] = []
             chat_history[date].append(chat["chat_id"])
+            last_chat = chat
+            count += 1
 
-        return chat_history
+        next_cursor = None
+        if count == limit and last_chat:
+            next_cursor = _encode_chat_history_cursor(
+                last_chat["time"], last_chat["_id"]
+            )
+        return chat_history, next_cursor
     except Exception as e:
         error_message = (
             f"Error retrieving chat history for user_id: {user_id} with error: {str(e)}"
@@ -369,30 +500,80 @@ def _get_chat_ids_from_date_range_with_pagination(
         raise HTTPException(status_code=500, detail=error_message)
 
 
-def _save_chat_messages(
+def _as_datetime(value: Union[datetime, str]) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _chat_history_range_query(
+    user_id: str,
+    start_time: datetime,
+    end_time: datetime,
+    position: Optional[tuple[datetime, ObjectId]],
+    to_stored,
+) -> dict:
+    """
+    Query for the chats of user_id in [start_time, end_time] that sort after position,
+    with the times converted by to_stored to the type they are stored as.
+    """
+    query = {
+        "user_id": user_id,
+        "time": {"$gte": to_stored(start_time), "$lte": to_stored(end_time)},
+    }
+    if position:
+        last_time, last_id = position
+        query["$or"] = [
+            {"time": {"$lt": to_stored(last_time)}},
+            {"time": to_stored(last_time), "_id": {"$lt": last_id}},
+        ]
+    return query
+
+
+def _encode_chat_history_cursor(last_time: datetime, last_id: ObjectId) -> str:
+    """
+    Encode the sort position of the last chat of a page into an opaque token.
+    """
+    position = json.dumps({"time": last_time.isoformat(), "id": str(last_id)})
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def _decode_chat_history_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(position["time"]), ObjectId(position["id"])
+    except Exception:
+        error_message = "Invalid pagination cursor."
+        logger.error(error_message)
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=400, detail=error_message)
+
+
+def _set_next_cursor_header(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
+async def _save_chat_messages(
     user_id: str,
     chat_id: str,
-    messages: List[Dict[str, str]],
+    new_messages: List[Dict[str, str]],
     purpose: ChatPurpose,
     purpose_data: Optional[
         Union[OnboardingChatRequest, WorkoutJournalChatRequest, WorkoutGuideChatRequest]
     ],
 ):
     """
-    Save chat messages to the database.
+    Append the messages of one turn to the chat in the database.
+    user_id, purpose and purpose_data are only written when the chat is created,
+    so the cost of a turn doesn't grow with the length of the conversation.
     """
-    db_operations = DbOperations("chat-history")
     purpose_data_dict = purpose_data.model_dump() if purpose_data else None
-    db_operations.collection.update_one(
-        {"chat_id": chat_id},
-        {
-            "$set": {
-                "user_id": user_id,
-                "time": datetime.now().isoformat(),
-                "purpose": purpose.value,
-                "purpose_data": purpose_data_dict,
-                "messages": messages,
-            }
-        },
-        upsert=True,
+    message_count = await append_chat_messages(
+        chat_id,
+        user_id,
+        new_messages,
+        {"purpose": purpose.value, "purpose_data": purpose_data_dict},
+    )
+    logger.info(
+        f"Saved {len(new_messages)} messages of chat_id: {chat_id} "
+        f"({len(bson.encode({'messages': new_messages}))} bytes), {message_count} in total."
     )
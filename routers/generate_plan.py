@@ -1,20 +1,34 @@
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from db.db_operations import DbOperations
+from db.async_db_operations import AsyncDbOperations
+from db.mongo_client import async_transaction
 from authorization import admin_required, user_or_admin_required
-from openai import OpenAI
+from services.llm_clients import (
+    get_async_instructor_client,
+    get_async_openai_client,
+)
+from services.llm_scheduler import (
+    Priority,
+    create_chat_completion,
+    estimate_tokens,
+    llm_scheduler,
+)
+from services.prompt_templates import render_prompt
 from datetime import datetime, timedelta
 from typing import List
-import os
 import json
+import time
 import uuid
 import logging
 import traceback
 from routers.user_profile import get_user_id_internal
 from services.onboarding_assistant import OnboardingAssistant
-from services.workout_journal_assistant import WorkoutJournalAssistant
+from services.assistant_registry import get_assistant_registry
+from enums import ChatPurpose
 from .helpers import generate_plan_helpers as gph
+from .helpers.daily_summary_scheduler import daily_summary_scheduler
 
 # Load .env file
 load_dotenv()
@@ -34,21 +48,43 @@ class GenerateWeeklyPlanRequest(BaseModel):
     chat_id: str | None = None
 
 
+class Exercise(BaseModel):
+    name: str
+    description: str
+    coach_note: str = ""
+    status: str = ""
+
+
+class Workout(BaseModel):
+    date: str
+    exercises: List[Exercise]
+    reasoning: str = ""
+    summary: str = ""
+
+
+class WeeklyPlan(BaseModel):
+    workouts: List[Workout]
+    comments: str = ""
+
+
 @router.post("/generateWeeklyPlan")
 async def generateWeeklyPlan(
     request: GenerateWeeklyPlanRequest,
+    stream: bool = False,
     current_user: dict = Depends(user_or_admin_required),
 ):
     """
     Generate weekly training plan for given user.
+    With stream=true, each workout is sent as an NDJSON line as soon as it is generated.
     """
+    request_started_at = time.perf_counter()
     user_id = await get_user_id_internal(current_user["email"])
     start_of_week = (
         datetime.now() - timedelta(days=datetime.now().weekday())
     ).strftime("%Y-%m-%d")
     year = str(datetime.now().year)
     # validate if weekly training plan is not already generated for the same week
-    if not gph._validate_generate_weekly_plan(user_id, start_of_week, year):
+    if not await gph._validate_generate_weekly_plan(user_id, start_of_week):
         error_message = f"The plan is already generated for the week: {start_of_week}"
         logger.error(error_message)
         logger.error(traceback.format_exc())
@@ -58,74 +94,128 @@ async def generateWeeklyPlan(
         }, 400
 
     # retrieve user details from chat or db
-    user_data = gph._extract_user_data(user_id=user_id, chat_id=request.chat_id)
-    user_memories = gph._extract_user_memories(user_id=user_id)
+    user_data = await gph._extract_user_data(user_id=user_id, chat_id=request.chat_id)
+    user_memories = await gph._extract_user_memories(user_id=user_id)
     # update the last week summary if exists
-    gph.update_weekly_summary(user_id=user_id)
+    await gph.update_weekly_summary(user_id=user_id)
 
-    # retrieve all previous weeks of user fitness plans
-    old_weekly_training_plans = gph._get_all_old_weekly_training_plans(
+    # recent weeks in full and older weeks by summary, within the prompt token budget
+    old_training_plans, past_week_count = await gph._get_compacted_training_history(
         user_id=user_id, year=year
     )
-    week_number = (
-        1 if len(old_weekly_training_plans) == 0 else len(old_weekly_training_plans) + 1
-    )
+    week_number = past_week_count + 1
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     current_day = datetime.now().strftime("%Y-%m-%d")
-    with open("prompts/generate_fitness_plan_system_message.txt", "r") as file:
-        system_message = file.read()
-    with open("prompts/generate_fitness_plan_user_message.txt", "r") as file:
-        user_message = file.read()
-        user_message = user_message.replace(
-            "{instructions}", json.dumps(user_memories, indent=2)
-        )
-        user_message = user_message.replace(
-            "{user_data}", json.dumps(user_data, indent=2)
-        )
-        user_message = user_message.replace(
-            "{start_of_week}", json.dumps(start_of_week)
-        )
-        user_message = user_message.replace("{current_day}", current_day)
-        user_message = user_message.replace(
-            "{old_training_plans}", json.dumps(old_weekly_training_plans, indent=2)
-        )
-        user_message = user_message.replace("{comment}", request.comment)
-
-    response = client.chat.completions.create(
+    system_message = render_prompt("generate_fitness_plan_system_message")
+    user_message = render_prompt(
+        "generate_fitness_plan_user_message",
+        instructions=json.dumps(user_memories, indent=2),
+        user_data=json.dumps(user_data, indent=2),
+        start_of_the_week=json.dumps(start_of_week),
+        current_day=current_day,
+        old_training_plans=old_training_plans,
+        comment=request.comment or "",
+    )
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+
+    async def save_plan(fitness_plan: dict) -> None:
+        # save the new weekly training plan in weekly-training-plans collection
+        # both writes share one transaction so a plan is never saved without its training-plans entry.
+        async with async_transaction() as session:
+            week_id = await gph._save_new_weekly_training_plan(
+                user_id=user_id,
+                fitness_plan=fitness_plan,
+                start_of_week=start_of_week,
+                session=session,
+            )
+            # update the user overall training plan with the new week training plan in training-plans collection.
+            await gph._update_overall_training_plan(
+                user_id=user_id,
+                week_id=week_id,
+                week_number=week_number,
+                start_of_week=start_of_week,
+                year=year,
+                session=session,
+            )
+        logger.info("Plan is successfully stored in db.")
+
+    if stream:
+
+        async def generate():
+            partial_stream = llm_scheduler.stream(
+                "gpt-4o",
+                Priority.STANDARD,
+                lambda: get_async_instructor_client().chat.completions.create_partial(
+                    model="gpt-4o",
+                    response_model=WeeklyPlan,
+                    messages=messages,
+                    stream=True,
+                ),
+                tokens=estimate_tokens(messages),
+            )
+            workouts_sent = 0
+            try:
+                async for kind, value in gph._iter_completed_items(
+                    partial_stream, "workouts"
+                ):
+                    if kind == "item":
+                        if workouts_sent == 0:
+                            _log_time_to_first_workout(
+                                "generateWeeklyPlan", request_started_at, True
+                            )
+                        workouts_sent += 1
+                        workout = Workout.model_validate(value).model_dump()
+                        yield _ndjson_line({"type": "workout", "workout": workout})
+                    else:
+                        fitness_plan = WeeklyPlan.model_validate(
+                            value.model_dump()
+                        ).model_dump()
+                        await save_plan(fitness_plan)
+                        fitness_plan.pop("_id", None)
+                        yield _ndjson_line({"type": "plan", "plan": fitness_plan})
+            except Exception as e:
+                error_message = f"Error generating weekly plan for user: {user_id} with error: {str(e)}"
+                logger.error(error_message)
+                logger.error(traceback.format_exc())
+                yield _ndjson_line({"type": "error", "detail": error_message})
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    client = get_async_openai_client()
+    started_at = time.perf_counter()
+    response = await create_chat_completion(
+        client,
+        Priority.STANDARD,
         model="gpt-4o",
         response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message},
-        ],
-    )
-    response = response.choices[0].message.content
-    logger.info("Plan is successfully generated.")
-    # save the new weekly training plan in weekly-training-plans collection
-    week_id = gph._save_new_weekly_training_plan(
-        user_id=user_id, fitness_plan=json.loads(response), start_of_week=start_of_week
+        messages=messages,
     )
-    # update the user overall training plan with the new week training plan in training-plans collection.
-    gph._update_overall_training_plan(
-        user_id=user_id,
-        week_id=week_id,
-        week_number=week_number,
-        start_of_week=start_of_week,
-        year=year,
+    logger.info(
+        f"Plan is successfully generated from {past_week_count} weeks of history: "
+        f"{response.usage.prompt_tokens if response.usage else 'unknown'} prompt tokens "
+        f"in {time.perf_counter() - started_at:.2f}s."
     )
-    logger.info("Plan is successfully stored in db.")
+    _log_time_to_first_workout("generateWeeklyPlan", request_started_at, False)
+    response = response.choices[0].message.content
+    await save_plan(json.loads(response))
     return json.loads(response)
 
 
 @router.get("/generateQuickWorkout")
 async def generate_quick_workout_plan(
-    date: str, current_user: dict = Depends(user_or_admin_required)
+    date: str,
+    stream: bool = False,
+    current_user: dict = Depends(user_or_admin_required),
 ):
     """
     Create a new quick workout plan for 45 minutes based on previous week workouts
     and the current week workout.
+    With stream=true, each exercise is sent as an NDJSON line as soon as it is generated.
     """
+    request_started_at = time.perf_counter()
 
     # retrieve the workout plan for the current week
     current_week_workout = await get_weekly_training_plan_api(date, current_user)
@@ -151,56 +241,98 @@ async def generate_quick_workout_plan(
 
     user_id = await get_user_id_internal(current_user["email"])
     # retrieve user details from db
-    user_data = gph._extract_user_data(user_id=user_id, chat_id=None)
+    user_data = await gph._extract_user_data(user_id=user_id, chat_id=None)
 
     # retrieve all previous weeks of user fitness plans
     current_date = datetime.strptime(date, "%Y-%m-%d").date()
 
-    old_weekly_training_plans = gph._get_all_old_weekly_training_plans(
+    old_weekly_training_plans = await gph._get_all_old_weekly_training_plans(
         user_id=user_id, year=str(current_date.year)
     )
 
-    client = OpenAI()
-    with open("prompts/generate_quick_workout_plan_system_message.txt", "r") as file:
-        system_message = file.read()
-        system_message = system_message.replace("{user_data}", json.dumps(user_data))
-        system_message = system_message.replace(
-            "{current_week_workout}", json.dumps(current_week_workout)
-        )
-        system_message = system_message.replace(
-            "{current_date}", current_date.isoformat()
-        )
-        system_message = system_message.replace(
-            "{old_training_plans}", json.dumps(old_weekly_training_plans)
-        )
+    system_message = render_prompt(
+        "generate_quick_workout_plan_system_message",
+        user_details=json.dumps(user_data),
+        current_week_workout=json.dumps(current_week_workout),
+        current_date=current_date.isoformat(),
+        old_training_plans=json.dumps(old_weekly_training_plans),
+    )
     user_message = (
         "Create a workout plan for a current date based on the given information."
     )
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+    week_id = current_week_workout["week_id"]
 
-    response = client.chat.completions.create(
+    if stream:
+
+        async def generate():
+            partial_stream = llm_scheduler.stream(
+                "gpt-4o",
+                Priority.STANDARD,
+                lambda: get_async_instructor_client().chat.completions.create_partial(
+                    model="gpt-4o",
+                    response_model=Workout,
+                    messages=messages,
+                    stream=True,
+                ),
+                tokens=estimate_tokens(messages),
+            )
+            try:
+                async for kind, value in gph._iter_completed_items(
+                    partial_stream, "exercises"
+                ):
+                    if kind == "item":
+                        exercise = Exercise.model_validate(value).model_dump()
+                        yield _ndjson_line({"type": "exercise", "exercise": exercise})
+                    else:
+                        quick_workout = Workout.model_validate(
+                            value.model_dump()
+                        ).model_dump()
+                        _log_time_to_first_workout(
+                            "generateQuickWorkout", request_started_at, True
+                        )
+                        await _save_quick_workout(week_id, date, quick_workout)
+                        yield _ndjson_line(
+                            {"type": "workout", "workout": quick_workout}
+                        )
+            except Exception as e:
+                error_message = f"Error generating quick workout for date: {date} with error: {str(e)}"
+                logger.error(error_message)
+                logger.error(traceback.format_exc())
+                yield _ndjson_line({"type": "error", "detail": error_message})
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    client = get_async_openai_client()
+    response = await create_chat_completion(
+        client,
+        Priority.STANDARD,
         model="gpt-4o",
         response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message},
-        ],
+        messages=messages,
     )
     quick_workout = json.loads(response.choices[0].message.content)
     logger.info("Quick workout plan is successfully generated.")
+    _log_time_to_first_workout("generateQuickWorkout", request_started_at, False)
 
     # Update the current week's workout plan with the new quick workout
-    week_id = current_week_workout["week_id"]
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    await _save_quick_workout(week_id, date, quick_workout)
+    return quick_workout
 
+
+async def _save_quick_workout(week_id: str, date: str, quick_workout: dict) -> None:
+    """
+    Add the quick workout to the weekly plan of week_id.
+    """
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     try:
         update_query = {"$push": {"workouts": quick_workout}}
-        weekly_plan_dboperations.update_from_mongodb({"week_id": week_id}, update_query)
-
-        logger.info(
-            f"Quick workout for date {date} successfully added to the weekly plan."
+        await weekly_plan_dboperations.update_from_mongodb(
+            {"week_id": week_id}, update_query
         )
-        return quick_workout
-
     except Exception as e:
         error_message = (
             f"Error updating weekly training plan with quick workout: {str(e)}"
@@ -208,6 +340,23 @@ async def generate_quick_workout_plan(
         logger.error(error_message)
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=error_message)
+    logger.info(f"Quick workout for date {date} successfully added to the weekly plan.")
+
+
+def _ndjson_line(payload: dict) -> str:
+    return f"{json.dumps(payload)}\n"
+
+
+def _log_time_to_first_workout(
+    endpoint: str, started_at: float, streamed: bool
+) -> None:
+    """
+    Time from the start of the request until the first workout reaches the client.
+    """
+    logger.info(
+        f"time_to_first_workout endpoint={endpoint} streamed={streamed} "
+        f"seconds={time.perf_counter() - started_at:.2f}"
+    )
 
 
 @router.get("/getWeeklyTrainingPlan")
@@ -227,21 +376,22 @@ async def updateExerciseStatus(week_id: str, request: UpdateStatusRequest):
     """
     Update exercise statuses of given date based on week_id.
     """
-    weekly_plan = gph._get_weekly_training_plan(week_id)
+    # only the workout of the requested date is read, not the whole week
+    daily_plan = await gph._get_daily_training_plan(week_id, request.date)
     # update all exercise statuses of requested date
     update_operations = {}
-    for workout in weekly_plan["workouts"]:
-        if workout["date"] == request.date:
-            for idx in range(len(workout["exercises"])):
-                update_operations[f"workouts.$.exercises.{idx}.status"] = (
-                    request.status[idx]
-                )
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    for idx, exercise in enumerate(daily_plan["exercises"]):
+        update_operations[f"workouts.$.exercises.{idx}.status"] = request.status[idx]
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     if update_operations:
+        # marks the current summary as stale until it is regenerated
+        update_operations["workouts.$.status_updated_at"] = datetime.now().isoformat()
         update_query = {"$set": update_operations}
         match_query = {"week_id": week_id, "workouts.date": request.date}
         try:
-            weekly_plan_dboperations.update_from_mongodb(match_query, update_query)
+            await weekly_plan_dboperations.update_from_mongodb(
+                match_query, update_query
+            )
         except Exception as e:
             error_message = f"Error updating status of week_id: {week_id} with date: {request.date} with error: {str(e)}"
             logger.error(error_message)
@@ -250,39 +400,40 @@ async def updateExerciseStatus(week_id: str, request: UpdateStatusRequest):
 
     logger.info("Successfully updated all the statuses for: " + request.date)
 
-    # update workout summary of given date.
-    daily_plan = gph._get_daily_training_plan(week_id, request.date)
-    client = OpenAI()
-    with open("prompts/daily_plan_summary.txt", "r") as file:
-        system_message = file.read()
-        system_message = system_message.replace("daily_plan", json.dumps(daily_plan))
-    user_message = "Create the short summary of the given day training plan."
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message},
-        ],
-    )
-    response = response.choices[0].message.content
-    daily_plan_summary = {f"workouts.$.summary": (response)}
-
-    update_query = {"$set": daily_plan_summary}
-    match_query = {"week_id": week_id, "workouts.date": request.date}
-    try:
-        weekly_plan_dboperations.update_from_mongodb(match_query, update_query)
-    except Exception as e:
-        error_message = f"Error updating daily summary of week_id: {week_id} for date: {request.date} with error: {str(e)}"
-        logger.error(error_message)
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=error_message)
+    # The summary is regenerated in the background, once per burst of status updates.
+    daily_summary_scheduler.schedule(week_id, request.date)
 
     return {
         "status": "success",
-        "message": "Exercise statuses and summary are updated successfully",
+        "message": "Exercise statuses are updated successfully. The summary is being updated.",
     }, 200
 
 
+@router.get("/getDailySummaryStatus")
+async def get_daily_summary_status(
+    week_id: str, date: str, current_user: dict = Depends(user_or_admin_required)
+):
+    """
+    Return the daily summary of given date and whether it reflects the latest exercise statuses.
+    """
+    daily_plan = await gph._get_daily_training_plan(week_id, date)
+    status_updated_at = daily_plan.get("status_updated_at")
+    summary_updated_at = daily_plan.get("summary_updated_at")
+    pending = daily_summary_scheduler.is_pending(week_id, date)
+    # ISO timestamps of the same format compare chronologically as strings
+    fresh = not pending and (
+        status_updated_at is None
+        or (summary_updated_at is not None and summary_updated_at >= status_updated_at)
+    )
+    return {
+        "summary": daily_plan.get("summary", ""),
+        "fresh": fresh,
+        "pending": pending,
+        "status_updated_at": status_updated_at,
+        "summary_updated_at": summary_updated_at,
+    }
+
+
 @router.get("/updateDailySummary")
 async def update_daily_summary(
     date: str, chat_id: str, current_user: dict = Depends(user_or_admin_required)
@@ -292,9 +443,8 @@ async def update_daily_summary(
     Based on weekly_training_plan and chat_history between user and assistant.
     Summarize the workout and update the "summary" field in the weekly_training_plan document of the given date.
     """
-    chat_history, _, _ = gph._get_chat_history(chat_id, True)
-    client = OpenAI()
-    assistant = WorkoutJournalAssistant(client)
+    chat_history, _, _ = await gph._get_chat_history(chat_id, True)
+    assistant = get_assistant_registry().get(ChatPurpose.WORKOUT_JOURNAL).assistant
     checkin_summary = await assistant.summarize(
         date, current_user["email"], chat_history
     )
@@ -302,14 +452,23 @@ async def update_daily_summary(
     # Update the summary in the database
     user_id = await get_user_id_internal(current_user["email"])
     target_date = datetime.strptime(date, "%Y-%m-%d")
-    weekly_plan = await gph._get_weekly_training_plan_internal(target_date, user_id)
+    weekly_plan = await gph._get_weekly_training_plan_internal(
+        target_date, user_id, projection={"week_id": 1}
+    )
     if weekly_plan:
-        weekly_plan_dboperations = DbOperations("weekly-training-plans")
-        update_query = {"$set": {"workouts.$.summary": checkin_summary}}
+        weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
+        update_query = {
+            "$set": {
+                "workouts.$.summary": checkin_summary,
+                "workouts.$.summary_updated_at": datetime.now().isoformat(),
+            }
+        }
         match_query = {"week_id": weekly_plan["week_id"], "workouts.date": date}
 
         try:
-            weekly_plan_dboperations.update_from_mongodb(match_query, update_query)
+            await weekly_plan_dboperations.update_from_mongodb(
+                match_query, update_query
+            )
         except Exception as e:
             error_message = (
                 f"Error updating summary for date: {date} with error: {str(e)}"
@@ -334,38 +493,33 @@ async def update_workout(
     try:
         # Get user details
         user_id = await get_user_id_internal(current_user["email"])
-        user_details = gph._extract_user_data(user_id=user_id)
+        user_details = await gph._extract_user_data(user_id=user_id)
 
         # Get chat history and format chat history
-        chat_history, _, _ = gph._get_chat_history(chat_id, True)
+        chat_history, _, _ = await gph._get_chat_history(chat_id, True)
         formatted_chat_history = ""
         for message in chat_history:
             formatted_chat_history += f"{message['role']} : {message['content']}\n"
 
         # Get original workout
-        original_workout = gph.get_workout_by_date(week_id, date)
+        original_workout = await gph.get_workout_by_date(week_id, date)
 
         # Generate new workout plan
-        client = OpenAI()
-        with open(
-            "prompts/regenerate_specific_date_workout_system_message.txt", "r"
-        ) as file:
-            system_message = file.read()
-            system_message = system_message.replace(
-                "{user_details}", json.dumps(user_details)
-            )
-            system_message = system_message.replace(
-                "{chat_history}", formatted_chat_history
-            )
-            system_message = system_message.replace(
-                "{original_workout}", json.dumps(original_workout)
-            )
+        client = get_async_openai_client()
+        system_message = render_prompt(
+            "regenerate_specific_date_workout_system_message",
+            user_details=json.dumps(user_details),
+            chat_history=formatted_chat_history,
+            original_workout=json.dumps(original_workout),
+        )
 
         user_message = (
             "Create a new workout plan for a single day based on the given information."
         )
 
-        response = client.chat.completions.create(
+        response = await create_chat_completion(
+            client,
+            Priority.STANDARD,
             model="gpt-4o",
             response_format={"type": "json_object"},
             messages=[
@@ -377,7 +531,7 @@ async def update_workout(
         print(f"New workout plan generated for date: {date}")
 
         # Update the workout in the database
-        gph.update_workout_by_date(week_id, date, new_workout)
+        await gph.update_workout_by_date(week_id, date, new_workout)
         return new_workout
 
     except Exception as e:
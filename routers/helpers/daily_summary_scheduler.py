@@ -0,0 +1,147 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import traceback
+from datetime import datetime
+from db.async_db_operations import AsyncDbOperations
+from db.identity_map import without_identity_map
+from services.llm_cache import cached_chat_completion
+from services.llm_clients import get_async_openai_client
+from services.llm_scheduler import Priority
+from services.prompt_templates import render_prompt
+from . import generate_plan_helpers as gph
+
+logger = logging.getLogger(__name__)
+
+DAILY_SUMMARY_DEBOUNCE_SECONDS = float(os.getenv("DAILY_SUMMARY_DEBOUNCE_SECONDS", 10))
+
+# Bookkeeping fields on a workout that must not change the summary or its cache key.
+_NON_SUMMARY_FIELDS = {"summary", "summary_updated_at", "status_updated_at"}
+
+
+async def regenerate_daily_summary(week_id: str, date: str) -> None:
+    """
+    Summarize the workout of date as currently stored and save it with the time it was read.
+    The summary is fresh while summary_updated_at is not older than status_updated_at.
+    """
+    read_at = datetime.now().isoformat()
+    daily_plan = await gph._get_daily_training_plan(week_id, date)
+    plan_to_summarize = {
+        k: v for k, v in daily_plan.items() if k not in _NON_SUMMARY_FIELDS
+    }
+    system_message = render_prompt(
+        "daily_plan_summary", daily_plan=json.dumps(plan_to_summarize)
+    )
+    user_message = "Create the short summary of the given day training plan."
+    response = await cached_chat_completion(
+        get_async_openai_client(),
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message},
+        ],
+        priority=Priority.BACKGROUND,
+    )
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
+    await weekly_plan_dboperations.update_from_mongodb(
+        {"week_id": week_id, "workouts.date": date},
+        {
+            "$set": {
+                "workouts.$.summary": response,
+                "workouts.$.summary_updated_at": read_at,
+            }
+        },
+    )
+    logger.info(f"Daily summary is updated for week_id: {week_id} with date: {date}")
+
+
+class DailySummaryScheduler:
+    """
+    Debounced, per-(week_id, date) queue of daily summary regenerations.
+    A burst of status updates for the same day collapses into one summary, generated
+    delay_seconds after the last update. Updates that arrive while a summary is being
+    generated schedule one more run.
+    The queue lives in the process: with several workers, each one that received an
+    update for a day debounces it on its own, so a day updated through N workers is
+    summarized up to N times. The summaries are cached by content in Mongo, so a repeat
+    run of an unchanged day is usually answered from the LLM response cache.
+    """
+
+    def __init__(self, delay_seconds: float = DAILY_SUMMARY_DEBOUNCE_SECONDS):
+        self.delay_seconds = delay_seconds
+        self._due = {}
+        self._tasks = {}
+        self._running = set()
+
+    def schedule(self, week_id: str, date: str) -> None:
+        key = (week_id, date)
+        self._due[key] = asyncio.get_running_loop().time() + self.delay_seconds
+        if key not in self._tasks:
+            # Run outside the request's context so it doesn't share its identity map.
+            self._tasks[key] = contextvars.Context().run(
+                asyncio.create_task, self._run(key)
+            )
+
+    def is_pending(self, week_id: str, date: str) -> bool:
+        return (week_id, date) in self._tasks
+
+    async def _regenerate(self, key: tuple[str, str]) -> None:
+        try:
+            await regenerate_daily_summary(*key)
+        except Exception as e:
+            error_message = f"Error updating daily summary of week_id: {key[0]} for date: {key[1]} with error: {str(e)}"
+            logger.error(error_message)
+            logger.error(traceback.format_exc())
+
+    async def _run(self, key: tuple[str, str]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                remaining = self._due[key] - loop.time()
+                if remaining > 0:
+                    # schedule() only moves the due time later, so sleeping until the
+                    # current one and checking again never runs a summary early.
+                    await asyncio.sleep(remaining)
+                    continue
+                due = self._due[key]
+                self._running.add(key)
+                try:
+                    await self._regenerate(key)
+                finally:
+                    self._running.discard(key)
+                if self._due[key] == due:
+                    break
+        finally:
+            self._forget(key)
+
+    def _forget(self, key: tuple[str, str]) -> None:
+        self._tasks.pop(key, None)
+        self._due.pop(key, None)
+
+    async def drain(self) -> None:
+        """
+        Run every pending summary once now and wait for them, e.g. before shutdown.
+        Debounce timers are cancelled and their keys run directly; summaries already being
+        generated are awaited and only run again if the day was updated since they started.
+        """
+        waiting = {
+            key: task for key, task in self._tasks.items() if key not in self._running
+        }
+        running = [task for key, task in self._tasks.items() if key in self._running]
+        for task in waiting.values():
+            task.cancel()
+        await asyncio.gather(*waiting.values(), return_exceptions=True)
+        for key, task in waiting.items():
+            # A task cancelled before its first step never reaches its finally.
+            if self._tasks.get(key) is task:
+                self._forget(key)
+        await asyncio.gather(
+            *(without_identity_map(self._regenerate)(key) for key in waiting),
+            *running,
+            return_exceptions=True,
+        )
+
+
+daily_summary_scheduler = DailySummaryScheduler()
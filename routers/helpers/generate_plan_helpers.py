@@ -1,48 +1,66 @@
-from db.db_operations import DbOperations
+from db.async_db_operations import AsyncDbOperations
+from db.chat_messages import (
+    CHAT_BUCKET_SIZE,
+    count_chat_messages,
+    read_chat_document,
+    read_chat_messages,
+)
+from db.identity_map import cached_read, make_key, remember
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 import uuid
 import json
+import os
 import logging
 import traceback
 from services.onboarding_assistant import OnboardingAssistant
 from enums import ChatPurpose
-from openai import OpenAI
-from typing import Optional
+from services.llm_cache import cached_chat_completion
+from services.llm_clients import get_async_openai_client
+from services.prompt_templates import render_prompt
+from services.tokenizer import count_tokens
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, Optional
 
 logger = logging.getLogger(__name__)
 
+# Weeks of plan history sent to the model in full; older weeks are sent as their summary.
+PLAN_HISTORY_RECENT_WEEKS = int(os.getenv("PLAN_HISTORY_RECENT_WEEKS", 4))
+PLAN_HISTORY_TOKEN_BUDGET = int(os.getenv("PLAN_HISTORY_TOKEN_BUDGET", 12000))
 
-def _validate_generate_weekly_plan(user_id: str, start_date: str, year: str) -> bool:
+
+async def _validate_generate_weekly_plan(user_id: str, start_date: str) -> bool:
     """
     Check if user weekly training plan is already generated for given start_date.
     """
-    training_plans = _get_training_plan(user_id)
-    start_date_set = set()
-    for week_number in training_plans["training_plan"][year].keys():
-        start_date_set.add(
-            training_plans["training_plan"][year][week_number]["start_date"]
-        )
-
-    return start_date not in start_date_set
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
+    plan_exists = await weekly_plan_dboperations.exists_in_mongodb(
+        {"user_id": user_id, "start_date": start_date}
+    )
+    return not plan_exists
 
 
-def _extract_user_data(
+async def _extract_user_data(
     user_id: str, chat_id: str | None = None
 ) -> list[dict[str, str]]:
     """
     Retrieve user data from chat if chat_id is provided else from user-details collection.
     """
-    user_details_dboperations = DbOperations("user-details")
+    user_details_dboperations = AsyncDbOperations("user-details")
     if chat_id:
         # Onboard first-time user. Summarize assessment conversation.
-        chat_history = _get_chat_history(chat_id, True)
-        client = OpenAI()
-        assistant = OnboardingAssistant(client)
-        user_data = assistant.summarize(chat_history)
+        chat_history = await _get_chat_history(chat_id, True)
+        assistant = OnboardingAssistant()
+        user_data = await assistant.summarize(chat_history)
     else:
         try:
-            user_data = user_details_dboperations.read_from_mongodb(query_param=user_id)
+            user_data = await cached_read(
+                "user-details",
+                make_key("user_data", user_id),
+                lambda: user_details_dboperations.read_from_mongodb(
+                    query_param=user_id, projection={"_id": 0, "memories": 0}
+                ),
+            )
             if not user_data:
                 error_message = "User data not found for user_id: " + user_id
                 logger.error(error_message)
@@ -59,9 +77,6 @@ def _extract_user_data(
             logger.error(traceback.format_exc())
             return {"status": "error", "message": error_message}, 500
 
-        for data in user_data:
-            data.pop("_id", None)
-
     # Remove memories field before returning
     for data in user_data:
         data.pop("memories", None)
@@ -69,17 +84,23 @@ def _extract_user_data(
     return user_data
 
 
-def _extract_user_memories(user_id: str) -> Optional[list[str]]:
+async def _extract_user_memories(user_id: str) -> Optional[list[str]]:
     """
     Retrieve user memories from user-details collection.
     """
-    user_details_dboperations = DbOperations("user-details")
+    user_details_dboperations = AsyncDbOperations("user-details")
     try:
-        user_data = user_details_dboperations.read_from_mongodb(query_param=user_id)
+        user_data = await cached_read(
+            "user-details",
+            make_key("memories", user_id),
+            lambda: user_details_dboperations.read_one_from_mongodb_with_projection(
+                {"user_id": user_id}, {"_id": 0, "memories": 1}
+            ),
+        )
         if not user_data:
             logger.warning(f"User data not found for user_id: {user_id}")
             return None
-        return user_data[0].get("memories", [])
+        return user_data.get("memories", [])
     except Exception as e:
         error_message = (
             f"Error reading user memories for user_id: {user_id} from MongoDB: {e}"
@@ -89,53 +110,150 @@ def _extract_user_memories(user_id: str) -> Optional[list[str]]:
         return None
 
 
-def _get_all_old_weekly_training_plans(user_id: str, year: str) -> list[dict[str, str]]:
+async def _get_all_old_weekly_training_plans(
+    user_id: str,
+    year: str,
+    projection: Optional[dict] = None,
+    max_weeks: Optional[int] = None,
+) -> list[dict[str, str]]:
     """
     Retrieve and return the fitness plans of all the past weeks.
     """
+    return [
+        week_plan
+        async for week_plan in _iter_old_weekly_training_plans(
+            user_id, year, projection, max_weeks
+        )
+    ]
+
+
+async def _iter_old_weekly_training_plans(
+    user_id: str,
+    year: str,
+    projection: Optional[dict] = None,
+    max_weeks: Optional[int] = None,
+) -> AsyncIterator[dict]:
+    """
+    Stream the fitness plans of past weeks in week order with a single query.
+    Only the most recent max_weeks weeks are returned if it is given.
+    """
     # TODO: this will need to be updated to traverse through all the previous years
-    training_plans = _get_training_plan(user_id)
-
-    # get all the week_ids and retrieve all the fitness plans based on week_ids
-    week_keys = training_plans["training_plan"][year].keys()
-    week_ids = []
-    for week_key in week_keys:
-        week_ids.append(training_plans["training_plan"][year][week_key]["week_id"])
-    # print(training_plans)
-
-    old_weekly_training_plans = []
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
-    for week_id in week_ids:
-        week_query = {"week_id": week_id}
-        try:
-            week_plan = weekly_plan_dboperations.read_one_from_mongodb(week_query)
-            if week_plan["_id"]:
-                del week_plan["_id"]
-            old_weekly_training_plans.append(week_plan)
-        except Exception as e:
-            error_message = (
-                f"Error retrieving from weekly-training-plans collection "
-                f"for week_id: {week_id} with the error: {str(e)}"
-            )
-            logger.error(error_message)
-            logger.error(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=error_message)
-    return old_weekly_training_plans
+    training_plans = await _get_training_plan(
+        user_id, projection={f"training_plan.{year}": 1, "_id": 0}
+    )
+
+    # start_date is an ISO date string, so sorting it orders the weeks chronologically
+    # A new year has no entry until its first plan is saved.
+    weeks = sorted(
+        training_plans["training_plan"].get(year, {}).values(),
+        key=lambda week: week["start_date"],
+    )
+    if max_weeks is not None:
+        weeks = weeks[-max_weeks:] if max_weeks > 0 else []
+    week_ids = [week["week_id"] for week in weeks]
+    if not week_ids:
+        return
+
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
+    week_query = {"week_id": {"$in": week_ids}}
+    try:
+        cursor = weekly_plan_dboperations.read_many_from_mongodb(
+            week_query,
+            projection={"_id": 0, **(projection or {})},
+            sort=[("start_date", 1)],
+        )
+        async for week_plan in cursor:
+            if projection is None:
+                # later _get_weekly_training_plan calls in this request reuse the full plan
+                remember(
+                    "weekly-training-plans",
+                    make_key("week_id", week_plan["week_id"], None),
+                    week_plan,
+                )
+            yield week_plan
+    except Exception as e:
+        error_message = (
+            f"Error retrieving from weekly-training-plans collection "
+            f"for week_ids: {week_ids} with the error: {str(e)}"
+        )
+        logger.error(error_message)
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=error_message)
+
+
+async def _get_compacted_training_history(
+    user_id: str,
+    year: str,
+    recent_weeks: int = PLAN_HISTORY_RECENT_WEEKS,
+    token_budget: int = PLAN_HISTORY_TOKEN_BUDGET,
+) -> tuple[str, int]:
+    """
+    Return the past weeks of the year encoded for the plan prompt, and the number of past weeks.
+    The most recent weeks are included in full and older weeks by their stored summary.
+    The oldest entries are dropped until the history fits in token_budget.
+    """
+    training_plans = await _get_training_plan(
+        user_id, projection={f"training_plan.{year}": 1, "_id": 0}
+    )
+    weeks = sorted(
+        training_plans["training_plan"].get(year, {}).items(),
+        key=lambda item: item[1]["start_date"],
+    )
+    older_week_summaries = [
+        {"week": week, "start_date": entry["start_date"], "summary": entry["summary"]}
+        for week, entry in weeks[: max(len(weeks) - recent_weeks, 0)]
+        if entry.get("summary")
+    ]
+    recent_week_plans = await _get_all_old_weekly_training_plans(
+        user_id, year, max_weeks=recent_weeks
+    )
+
+    # Oldest first, so dropping from the front keeps the most relevant history.
+    entries = [("older_week_summaries", summary) for summary in older_week_summaries]
+    entries += [("recent_weeks", plan) for plan in recent_week_plans]
+
+    def render(kept_entries: list) -> str:
+        history = {"older_week_summaries": [], "recent_weeks": []}
+        for section, entry in kept_entries:
+            history[section].append(entry)
+        return json.dumps(history, separators=(",", ":"))
+
+    # The wrapper object and the comma after each entry count against the budget too.
+    entry_tokens = [
+        count_tokens(json.dumps(entry, separators=(",", ":"))) + 1
+        for _, entry in entries
+    ]
+    total_tokens = count_tokens(render([])) + sum(entry_tokens)
+    dropped = 0
+    # the latest week is always kept
+    while total_tokens > token_budget and len(entries) - dropped > 1:
+        total_tokens -= entry_tokens[dropped]
+        dropped += 1
+    # Token counts don't add up exactly across entry boundaries, so check the result.
+    history = render(entries[dropped:])
+    while count_tokens(history) > token_budget and len(entries) - dropped > 1:
+        dropped += 1
+        history = render(entries[dropped:])
+    if dropped:
+        logger.info(
+            f"Dropped the {dropped} oldest history entries to fit {token_budget} tokens."
+        )
+    return history, len(weeks)
 
 
-def _save_new_weekly_training_plan(
-    user_id: str, fitness_plan: dict, start_of_week: str
+async def _save_new_weekly_training_plan(
+    user_id: str, fitness_plan: dict, start_of_week: str, session=None
 ) -> str:
     """
     Save the newly generated weekly training plan in weekly-training-plans collection and return week_id
     """
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     week_id = f"{uuid.uuid4()}"
     fitness_plan["week_id"] = week_id
     fitness_plan["start_date"] = start_of_week
     fitness_plan["user_id"] = user_id
     try:
-        weekly_plan_dboperations.write_to_mongodb(fitness_plan)
+        await weekly_plan_dboperations.write_to_mongodb(fitness_plan, session=session)
     except Exception as e:
         error_message = (
             f"Error saving in weekly-training-plans collection "
@@ -143,28 +261,35 @@ def _save_new_weekly_training_plan(
         )
         logger.error(error_message)
         logger.error(traceback.format_exc())
-        return {"status": "error", "message": error_message}, 500
+        raise HTTPException(status_code=500, detail=error_message)
     logger.info(
         "Weekly training plan is successfully saved in weekly training plan db."
     )
     return week_id
 
 
-def _update_overall_training_plan(
-    user_id: str, week_id: str, week_number: int, start_of_week: str, year: str
+async def _update_overall_training_plan(
+    user_id: str,
+    week_id: str,
+    week_number: int,
+    start_of_week: str,
+    year: str,
+    session=None,
 ) -> None:
     """
     Update the user overall traning plan from training-plans collection with
     week_id, start_date and summary of the week.
     """
-    training_plan_dboperations = DbOperations("training-plans")
+    training_plan_dboperations = AsyncDbOperations("training-plans")
     entry = {"week_id": week_id, "start_date": start_of_week, "summary": ""}
     year = str(datetime.now().year)
     week = f"week {week_number}"
     query = {"user_id": user_id}
     new_value = {"$set": {f"training_plan.{year}.{week}": entry}}
     try:
-        training_plan_dboperations.update_from_mongodb(query, new_value)
+        await training_plan_dboperations.update_from_mongodb(
+            query, new_value, session=session
+        )
     except Exception as e:
         error_message = (
             f"Error updating training plan for user: {user_id} "
@@ -172,13 +297,13 @@ def _update_overall_training_plan(
         )
         logger.error(error_message)
         logger.error(traceback.format_exc())
-        return {"status": "error", "message": error_message}, 500
+        raise HTTPException(status_code=500, detail=error_message)
     logger.info(
         "Weekly training plan is successfully updated from user training plans."
     )
 
 
-def _get_chat_history(
+async def _get_chat_history(
     chat_id: str, is_remove_system_message: bool
 ) -> tuple[list[dict[str, str]], Optional[str], Optional[dict]]:
     """
@@ -187,60 +312,88 @@ def _get_chat_history(
     Return empty list if chat_id is not found.
     Also return purpose and purpose_data.
     """
-    db_operations = DbOperations("chat-history")
-    chat_document = db_operations.collection.find_one({"chat_id": chat_id})
-    messages = []
-    purpose = None
-    purpose_data = None
-    if chat_document and "messages" in chat_document:
-        messages = chat_document["messages"]
-        purpose = chat_document.get("purpose")
-        purpose_data = chat_document.get("purpose_data")
-        if is_remove_system_message:
-            messages = _cleanup_chat_history(chat_document)
-        return (
-            [{"role": m["role"], "content": m["content"]} for m in messages],
-            purpose,
-            purpose_data,
-        )
+    messages, purpose, purpose_data, _ = await _get_chat_history_page(
+        chat_id, is_remove_system_message
+    )
     return messages, purpose, purpose_data
 
 
-def _cleanup_chat_history(chat_document: dict):
+async def _get_chat_history_page(
+    chat_id: str,
+    is_remove_system_message: bool,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+) -> tuple[list[dict[str, str]], Optional[str], Optional[dict], Optional[int]]:
+    """
+    Retrieve the last limit messages of the chat before the message index before,
+    or all of them if limit is None. Only the storage buckets covering the page are read.
+    Also return purpose, purpose_data and the before index of the previous page,
+    or None if this page starts at the first message.
+    """
+    chat_document = await read_chat_document(chat_id)
+    if not chat_document:
+        return [], None, None, None
+    end = await count_chat_messages(chat_document)
+    if before is not None:
+        end = min(before, end)
+    start = max(end - limit, 0) if limit is not None else 0
+    messages = await read_chat_messages(chat_document, start, end)
+    purpose = chat_document.get("purpose")
+    if is_remove_system_message:
+        head = messages
+        if start > 0:
+            head = await read_chat_messages(
+                chat_document, 0, min(end, CHAT_BUCKET_SIZE)
+            )
+        messages = _cleanup_chat_history(head, messages, purpose)
+    return (
+        [{"role": m["role"], "content": m["content"]} for m in messages],
+        purpose,
+        chat_document.get("purpose_data"),
+        start if start > 0 else None,
+    )
+
+
+def _cleanup_chat_history(
+    head: list[dict], messages: list[dict], purpose: Optional[str]
+):
     """
     Always remove the first message if it's a system message.
     Remove the first user message if the purpose is "workout_journal".
+    head holds the first messages of the chat, which decide what to remove from messages.
     """
-    messages = chat_document.get("messages", [])
+    hidden = set()
 
     # Always remove the first message if it's a system message
-    if messages and messages[0]["role"] == "system":
-        messages.pop(0)
+    if head and head[0]["index"] == 0 and head[0]["role"] == "system":
+        hidden.add(0)
 
     # Remove the first user message if the purpose is "workout_journal"
-    if chat_document.get("purpose") == ChatPurpose.WORKOUT_JOURNAL.value:
-        first_user_index = next(
-            (i for i, m in enumerate(messages) if m["role"] == "user"), None
-        )
+    if purpose == ChatPurpose.WORKOUT_JOURNAL.value:
+        first_user_index = next((m["index"] for m in head if m["role"] == "user"), None)
         if first_user_index is not None:
-            messages.pop(first_user_index)
+            hidden.add(first_user_index)
 
-    return messages
+    return [m for m in messages if m["index"] not in hidden]
 
 
-def _get_daily_training_plan(week_id: str, date: str):
+async def _get_daily_training_plan(week_id: str, date: str):
     """
     Get daily training_plan based on week_id and given date.
     """
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     date_query = {"week_id": week_id, "workouts.date": date}
     projection = {
         "workouts.$": 1  # to return only the matching element in the workouts array
     }
     daily_plan = None
     try:
-        result = weekly_plan_dboperations.read_one_from_mongodb_with_projection(
-            date_query, projection
+        result = await cached_read(
+            "weekly-training-plans",
+            make_key("workout", week_id, date),
+            lambda: weekly_plan_dboperations.read_one_from_mongodb_with_projection(
+                date_query, projection
+            ),
         )
         if not result:
             error_message = f"No workout found for date: {date}"
@@ -263,15 +416,22 @@ def _get_daily_training_plan(week_id: str, date: str):
     return daily_plan
 
 
-def _get_weekly_training_plan(week_id: str):
+async def _get_weekly_training_plan(week_id: str, projection: Optional[dict] = None):
     """
     Get weekly training_plan based on week_id.
+    Only the projected fields are returned if projection is given.
     """
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     weekly_plan = None
     try:
         weekly_plan_query = {"week_id": week_id}
-        weekly_plan = weekly_plan_dboperations.read_one_from_mongodb(weekly_plan_query)
+        weekly_plan = await cached_read(
+            "weekly-training-plans",
+            make_key("week_id", week_id, projection),
+            lambda: weekly_plan_dboperations.read_one_from_mongodb_with_projection(
+                weekly_plan_query, {"_id": 0, **(projection or {})}
+            ),
+        )
         if not weekly_plan:
             error_message = "Weekly training plan not found"
             logger.error(error_message)
@@ -285,23 +445,26 @@ def _get_weekly_training_plan(week_id: str):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=error_message)
 
-    # Remove the _id field from the response
-    if weekly_plan["_id"]:
-        weekly_plan.pop("_id", None)
-
     logger.info(f"Successfully retrieved weekly training plan for week_id: {week_id}")
     return weekly_plan
 
 
-def _get_training_plan(user_id: str):
+async def _get_training_plan(user_id: str, projection: Optional[dict] = None):
     """
     Get training_plan based on user_id.
+    Only the projected fields are returned if projection is given.
     """
-    training_plan_dboperations = DbOperations("training-plans")
+    training_plan_dboperations = AsyncDbOperations("training-plans")
     training_plans = None
     try:
         plan_query = {"user_id": user_id}
-        training_plans = training_plan_dboperations.read_one_from_mongodb(plan_query)
+        training_plans = await cached_read(
+            "training-plans",
+            make_key("user_id", user_id, projection),
+            lambda: training_plan_dboperations.read_one_from_mongodb_with_projection(
+                plan_query, projection
+            ),
+        )
         if not training_plans:
             error_message = f"Training plan not found for the user: {user_id} as it may have never been created with user-details."
             logger.error(error_message)
@@ -320,47 +483,66 @@ def _get_training_plan(user_id: str):
     return training_plans
 
 
-async def _get_weekly_training_plan_internal(target_date: datetime, user_id: str):
+async def _get_weekly_training_plan_internal(
+    target_date: datetime, user_id: str, projection: Optional[dict] = None
+):
     """
     Internal function to get weekly training plan for a given date and user_id.
-    """
-    # Retrieve the training plan for the user
-    training_plan = _get_training_plan(user_id)
+    The week covering target_date is the latest one starting at most 6 days before it,
+    found with a single query on the (user_id, start_date) index.
+    """
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
+    target_day = target_date.strftime("%Y-%m-%d")
+    earliest_start_day = (target_date - timedelta(days=6)).strftime("%Y-%m-%d")
+    query = {
+        "user_id": user_id,
+        "start_date": {"$gte": earliest_start_day, "$lte": target_day},
+    }
 
-    # Find the correct week for the given date
-    year = str(target_date.year)
-    if year not in training_plan["training_plan"]:
-        error_message = "No training plan found for the specified year"
-        logger.error(error_message)
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=404, detail=error_message)
-
-    week_id = None
-    for _, week_data in training_plan["training_plan"][year].items():
-        week_start = datetime.strptime(week_data["start_date"], "%Y-%m-%d")
-        week_end = week_start + timedelta(days=6)
-        if week_start <= target_date <= week_end:
-            week_id = week_data["week_id"]
-            break
-    if not week_id:
+    async def read_covering_week():
+        cursor = weekly_plan_dboperations.read_many_from_mongodb(
+            query,
+            projection={"_id": 0, **(projection or {})},
+            sort=[("start_date", -1)],
+            limit=1,
+        )
+        async for weekly_plan in cursor:
+            return weekly_plan
         return None
 
-    # Retrieve the weekly training plan
-    weekly_plan = _get_weekly_training_plan(week_id)
+    try:
+        weekly_plan = await cached_read(
+            "weekly-training-plans",
+            make_key("covering_week", user_id, target_day, projection),
+            read_covering_week,
+        )
+    except Exception as e:
+        error_message = f"Error retrieving weekly training plan: {str(e)}"
+        logger.error(error_message)
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=error_message)
+    if weekly_plan:
+        logger.info(
+            f"Successfully retrieved weekly training plan for user_id: {user_id} on {target_day}"
+        )
     return weekly_plan
 
 
-def get_workout_by_date(week_id: str, date: str) -> dict:
+async def get_workout_by_date(week_id: str, date: str) -> dict:
     """
     Retrieve the workout plan for a specific date within a given week.
     """
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     query = {"week_id": week_id, "workouts.date": date}
     projection = {"workouts.$": 1}
 
     try:
-        result = weekly_plan_dboperations.read_one_from_mongodb_with_projection(
-            query, projection
+        result = await cached_read(
+            "weekly-training-plans",
+            make_key("workout", week_id, date),
+            lambda: weekly_plan_dboperations.read_one_from_mongodb_with_projection(
+                query, projection
+            ),
         )
         if result and "workouts" in result and len(result["workouts"]) > 0:
             return result["workouts"][0]
@@ -380,11 +562,11 @@ def get_workout_by_date(week_id: str, date: str) -> dict:
         raise HTTPException(status_code=500, detail=error_message)
 
 
-def update_workout_by_date(week_id: str, date: str, new_workout: dict):
+async def update_workout_by_date(week_id: str, date: str, new_workout: dict):
     """
     Update with new_workout based on given week_id and date.
     """
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     update_query = {
         "$set": {
             "workouts.$.exercises": new_workout["exercises"],
@@ -394,13 +576,9 @@ def update_workout_by_date(week_id: str, date: str, new_workout: dict):
     match_query = {"week_id": week_id, "workouts.date": date}
 
     try:
-        existing_workout = weekly_plan_dboperations.read_one_from_mongodb(match_query)
-        if not existing_workout:
-            error_message = f"No workout found for week_id: {week_id} and date: {date}"
-            logger.error(error_message)
-            logger.error(traceback.format_exc())
-            raise HTTPException(status_code=404, detail=error_message)
-        weekly_plan_dboperations.update_from_mongodb(match_query, update_query)
+        # raises 404 when the day is missing; usually answered from the identity map
+        await get_workout_by_date(week_id, date)
+        await weekly_plan_dboperations.update_from_mongodb(match_query, update_query)
     except Exception as e:
         error_message = f"Error updating workout for date: {date} in week_id: {week_id}. Error: {str(e)}"
         logger.error(error_message)
@@ -408,44 +586,47 @@ def update_workout_by_date(week_id: str, date: str, new_workout: dict):
         raise HTTPException(status_code=500, detail=error_message)
 
 
-def update_weekly_summary(user_id: str):
+async def update_weekly_summary(user_id: str):
     """
     Update weekly summary of the last week.
     """
-    training_plans = _get_training_plan(user_id)
     year = str(datetime.now().year)
+    training_plans = await _get_training_plan(
+        user_id, projection={f"training_plan.{year}": 1, "_id": 0}
+    )
 
     # if exist, get the latest week and update that week training plan summary
     if training_plans:
-        week_keys = training_plans["training_plan"][year].keys()
-        if week_keys:
-            most_recent_week = sorted(week_keys)[-1]
-            week_id = training_plans["training_plan"][year][most_recent_week]["week_id"]
-
-            most_recent_week_plan = _get_weekly_training_plan(week_id)
-            client = OpenAI()
-            with open("prompts/weekly_plan_summary.txt", "r") as file:
-                system_message = file.read()
-                system_message = system_message.replace(
-                    "most_recent_week_plan", json.dumps(most_recent_week_plan)
-                )
+        year_plans = training_plans["training_plan"].get(year, {})
+        if year_plans:
+            most_recent_week = sorted(year_plans.keys())[-1]
+            week_id = year_plans[most_recent_week]["week_id"]
+
+            most_recent_week_plan = await _get_weekly_training_plan(week_id)
+            client = get_async_openai_client()
+            system_message = render_prompt(
+                "weekly_plan_summary",
+                most_recent_week_plan=json.dumps(most_recent_week_plan),
+            )
             user_message = "Create the summary of the last week training plan."
 
-            response = client.chat.completions.create(
+            response = await cached_chat_completion(
+                client,
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": user_message},
                 ],
             )
-            response = response.choices[0].message.content
             new_value = {
                 "$set": {f"training_plan.{year}.{most_recent_week}.summary": response}
             }
-            training_plan_dboperations = DbOperations("training-plans")
+            training_plan_dboperations = AsyncDbOperations("training-plans")
             plan_query = {"user_id": user_id}
             try:
-                training_plan_dboperations.update_from_mongodb(plan_query, new_value)
+                await training_plan_dboperations.update_from_mongodb(
+                    plan_query, new_value
+                )
             except Exception as e:
                 error_message = (
                     f"Error updating training summary of training plan "
@@ -456,7 +637,7 @@ def update_weekly_summary(user_id: str):
                 raise HTTPException(status_code=500, detail=error_message)
 
 
-def _update_or_insert_workout_for_specific_date(
+async def _update_or_insert_workout_for_specific_date(
     week_id: str, date: str, new_workout: dict, shouldReplace: bool
 ):
     """
@@ -479,10 +660,10 @@ def _update_or_insert_workout_for_specific_date(
     Raises:
     Any exceptions raised by the database operations are not caught in this function.
     """
-    weekly_plan_dboperations = DbOperations("weekly-training-plans")
+    weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
     query = {"week_id": week_id, "workouts.date": date}
 
-    existing_workout = weekly_plan_dboperations.read_one_from_mongodb(query)
+    existing_workout = await weekly_plan_dboperations.exists_in_mongodb(query)
 
     if existing_workout:
         # Replace existing workout
@@ -493,11 +674,37 @@ def _update_or_insert_workout_for_specific_date(
             update_query = {
                 "$push": {"workouts.$.exercises": {"$each": new_workout["exercises"]}}
             }
-        weekly_plan_dboperations.update_from_mongodb(query, update_query)
+        await weekly_plan_dboperations.update_from_mongodb(query, update_query)
     else:
         # Insert new workout
         update_query = {"$push": {"workouts": new_workout}}
-        weekly_plan_dboperations.update_from_mongodb({"week_id": week_id}, update_query)
+        await weekly_plan_dboperations.update_from_mongodb(
+            {"week_id": week_id}, update_query
+        )
+
+
+async def _iter_completed_items(
+    partial_stream: AsyncIterator[BaseModel], field: str
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Follow a partial structured-output stream and yield ("item", item) for each element of
+    the list field as soon as it is complete, then ("final", last partial object).
+    An element is complete once the model has started the next one or the stream has ended.
+    """
+    emitted = 0
+    partial = None
+    async for partial in partial_stream:
+        items = getattr(partial, field) or []
+        while emitted < len(items) - 1:
+            yield "item", items[emitted].model_dump()
+            emitted += 1
+    if partial is None:
+        return
+    items = getattr(partial, field) or []
+    while emitted < len(items):
+        yield "item", items[emitted].model_dump()
+        emitted += 1
+    yield "final", partial
 
 
 def format_chat_history(chat_history):
@@ -1,11 +1,11 @@
 from dotenv import load_dotenv
-from openai import OpenAI
+from services.llm_clients import get_async_openai_client
+from services.llm_scheduler import Priority, create_chat_completion, llm_scheduler
+from services.prompt_templates import render_prompt
 from fastapi import HTTPException, UploadFile
 import os
 import logging
 import traceback
-import tempfile
-import contextlib
 
 # Load .env file
 load_dotenv()
@@ -18,7 +18,7 @@ MAX_FILE_SIZE_MB = 25
 class Translator:
     def __init__(self, audio: UploadFile):
         self.audio = audio
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = get_async_openai_client()
         self.allowed_types = {'mp3', 'mp4', 'wav', 'mpeg', 'mpga', 'm4a', 'webm'}
         self.max_size_mb = MAX_FILE_SIZE_MB
         self.file_extension = self.audio.filename.split('.')[-1].lower()
@@ -49,25 +49,23 @@ class Translator:
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=400, detail=error_message)
 
-    def translate(self):
+    async def translate(self):
         """
         Translate given audio to text and post processing with AI for misspell.
         """
-        temp_file_path = None
         try:
-            file_content = self.audio.file.read()
-            # Convert to a temporary file for OpenAI 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{self.file_extension}') as temp_file:
-                temp_file.write(file_content)
-                temp_file_path = temp_file.name
-                
-            with open(temp_file_path, 'rb') as audio_file:
-                translation = self.client.audio.translations.create(
+            # The file name tells OpenAI the audio format.
+            audio_file = (self.audio.filename, self.audio.file.read())
+            translation = await llm_scheduler.call(
+                "whisper-1",
+                Priority.INTERACTIVE,
+                lambda: self.client.audio.translations.create(
                     model="whisper-1",
                     file=audio_file,
-                )
+                ),
+            )
             # Post-processing for any mis-spelling.
-            # corrected_text = self._post_process(translation.text)
+            # corrected_text = await self._post_process(translation.text)
             # return corrected_text
             return translation.text
         except Exception as e:
@@ -75,30 +73,24 @@ class Translator:
             logger.error(error_message)
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail=error_message)
-        finally:
-            # Ensure the file is deleted even if an exception occurs
-            with contextlib.suppress(FileNotFoundError):
-                os.unlink(temp_file_path)
 
-    def transcribe(self):
+    async def transcribe(self):
         """
         Transcribe given audio to text and post process with AI for misspellings.
         """
-        temp_file_path = None
         try:
-            file_content = self.audio.file.read()
-            # Convert to a temporary file for OpenAI 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{self.file_extension}') as temp_file:
-                temp_file.write(file_content)
-                temp_file_path = temp_file.name
-                
-            with open(temp_file_path, 'rb') as audio_file:
-                transcription = self.client.audio.transcriptions.create(
+            # The file name tells OpenAI the audio format.
+            audio_file = (self.audio.filename, self.audio.file.read())
+            transcription = await llm_scheduler.call(
+                "whisper-1",
+                Priority.INTERACTIVE,
+                lambda: self.client.audio.transcriptions.create(
                     model="whisper-1",
                     file=audio_file
-                )
+                ),
+            )
             # Post-processing for any mis-spelling.
-            # corrected_text = self._post_process(transcription.text)
+            # corrected_text = await self._post_process(transcription.text)
             # return corrected_text
             return transcription.text
         except Exception as e:
@@ -106,21 +98,17 @@ class Translator:
             logger.error(error_message)
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail=error_message)
-        finally:
-            # Ensure the file is deleted even if an exception occurs
-            with contextlib.suppress(FileNotFoundError):
-                os.unlink(temp_file_path)
 
-    def _post_process(self, text):
+    async def _post_process(self, text):
         """
         Correct given text for any misspell or grammatical mistake and remove unnecessary characters.
         """
-        with open('routers/helpers/prompts/correct_speech_to_text_system_message.txt', 'r') as file:
-            system_message = file.read().strip()
-            system_message = system_message.replace("{translated_text}", text)
+        system_message = render_prompt("correct_speech_to_text_system_message", translated_text=text).strip()
         user_message = f"Please correct any spelling errors in the given text."
         
-        response = self.client.chat.completions.create(
+        response = await create_chat_completion(
+            self.client,
+            Priority.INTERACTIVE,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_message},
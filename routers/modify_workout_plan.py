@@ -2,13 +2,15 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import json
 from datetime import datetime
-from openai import OpenAI
+from services.llm_clients import get_async_openai_client
+from services.llm_scheduler import Priority, create_chat_completion
+from services.prompt_templates import render_prompt
 from authorization import user_or_admin_required
 from routers.generate_plan import get_weekly_training_plan_api
 from routers.helpers import generate_plan_helpers as gph
 import logging
 import traceback
-from db.db_operations import DbOperations
+from db.async_db_operations import AsyncDbOperations
 
 router = APIRouter()
 logging.basicConfig(level=logging.ERROR)
@@ -42,18 +44,20 @@ async def log_workout(
         raise HTTPException(status_code=400, detail=error_message)
 
     current_date = datetime.strptime(request.date, "%Y-%m-%d").date().isoformat()
-    chat_history, _, _ = gph._get_chat_history(request.chat_id, True)
+    chat_history, _, _ = await gph._get_chat_history(request.chat_id, True)
     formatted_chat_history = gph.format_chat_history(chat_history)
 
-    client = OpenAI()
-    with open("prompts/log_user_specified_workout_system_message.txt", "r") as file:
-        system_message = file.read()
-    with open("prompts/log_user_specified_workout_user_message.txt", "r") as file:
-        user_message = file.read()
-        user_message = user_message.replace("{workout_date}", current_date)
-        user_message = user_message.replace("{chat_history}", formatted_chat_history)
+    client = get_async_openai_client()
+    system_message = render_prompt("log_user_specified_workout_system_message")
+    user_message = render_prompt(
+        "log_user_specified_workout_user_message",
+        workout_date=current_date,
+        chat_history=formatted_chat_history,
+    )
 
-    response = client.chat.completions.create(
+    response = await create_chat_completion(
+        client,
+        Priority.STANDARD,
         model="gpt-4o",
         response_format={"type": "json_object"},
         messages=[
@@ -71,7 +75,7 @@ async def log_workout(
 
     week_id = current_week_workout["week_id"]
     try:
-        gph._update_or_insert_workout_for_specific_date(
+        await gph._update_or_insert_workout_for_specific_date(
             week_id, current_date, workout_log, request.should_replace
         )
         logger.info(
@@ -101,20 +105,22 @@ async def delete_exercise(
     Delete a single exercise from a workout for a specific date in a weekly plan.
     """
     try:
-        weekly_plan_dboperations = DbOperations("weekly-training-plans")
-
-        # Fetch the weekly plan
-        weekly_plan = weekly_plan_dboperations.read_one_from_mongodb(
-            {"week_id": request.week_id}
+        weekly_plan_dboperations = AsyncDbOperations("weekly-training-plans")
+
+        # Fetch only the workout for the specified date from the weekly plan
+        weekly_plan = (
+            await weekly_plan_dboperations.read_one_from_mongodb_with_elem_match(
+                {"week_id": request.week_id},
+                "workouts",
+                {"date": request.date},
+                projection={"_id": 1},
+            )
         )
 
         if not weekly_plan:
             raise HTTPException(status_code=404, detail="Weekly plan not found")
 
-        # Find the workout for the specified date
-        workout = next(
-            (w for w in weekly_plan["workouts"] if w["date"] == request.date), None
-        )
+        workout = weekly_plan["workouts"][0] if weekly_plan.get("workouts") else None
 
         if not workout:
             raise HTTPException(
@@ -130,10 +136,10 @@ async def delete_exercise(
         # Remove the exercise
         del workout["exercises"][request.exercise_index]
 
-        # Update the weekly plan in the database
-        result = weekly_plan_dboperations.update_from_mongodb(
-            {"week_id": request.week_id},
-            {"$set": {"workouts": weekly_plan["workouts"]}},
+        # Update the workout in the database
+        result = await weekly_plan_dboperations.update_from_mongodb(
+            {"week_id": request.week_id, "workouts.date": request.date},
+            {"$set": {"workouts.$.exercises": workout["exercises"]}},
         )
 
         if result.modified_count == 0:
@@ -2,16 +2,25 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Union, Dict, Any
 from datetime import datetime
-from db.db_operations import DbOperations
+from db.async_db_operations import AsyncDbOperations
+from db.mongo_client import async_transaction
+from db.cache import TTLCache
 from authorization import user_or_admin_required
 from enum import Enum
 import logging
 import traceback
+import os
 
 router = APIRouter(prefix="/user", tags=["user_profile"])
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# email -> user_id, so authenticated requests don't query user-profiles every time.
+_user_id_cache = TTLCache(
+    maxsize=int(os.getenv("USER_ID_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("USER_ID_CACHE_TTL_SECONDS", 300)),
+)
+
 
 class FitnessLevel(str, Enum):
     BEGINNER = "Beginner (You're new to fitness and want to learn the basics)"
@@ -52,7 +61,7 @@ async def uploadUserDetails(
         user_details = request.model_dump()
         user_details["user_id"] = user_id
 
-        if _validate_user_details(user_id):
+        if await _validate_user_details(user_id):
             error_message = (
                 f'The user details already exist for username: {current_user["email"]}'
             )
@@ -60,25 +69,21 @@ async def uploadUserDetails(
             logger.error(traceback.format_exc())
             return {"status": "error", "message": error_message}, 400
 
-        user_dboperations = DbOperations("user-details")
-        user_dboperations.write_to_mongodb(user_details)
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        error_message = f'Error writing user-details for {current_user["email"]} in MongoDB: {str(e)}'
-        logger.error(error_message)
-        logger.error(traceback.format_exc())
-        return {"status": "error", "message": error_message}, 500
-
-    # write a skeleton schema of user training plan without any plan details into db
-    try:
+        # a skeleton schema of user training plan without any plan details
         training_plan = {"user_id": user_id}
         training_plan["training_plan"] = {}
         year = datetime.now().year
         training_plan["training_plan"][str(year)] = {}
         training_plan["training_plan"]["summary"] = ""
-        training_plan_dboperations = DbOperations("training-plans")
-        training_plan_dboperations.write_to_mongodb(training_plan)
+
+        # both documents are written together or not at all
+        async with async_transaction() as session:
+            user_dboperations = AsyncDbOperations("user-details")
+            await user_dboperations.write_to_mongodb(user_details, session=session)
+            training_plan_dboperations = AsyncDbOperations("training-plans")
+            await training_plan_dboperations.write_to_mongodb(
+                training_plan, session=session
+            )
         logger.info(
             "Successfully uploaded user data and stored the skeleton schema for user training plan."
         )
@@ -89,7 +94,7 @@ async def uploadUserDetails(
     except HTTPException as he:
         raise he
     except Exception as e:
-        error_message = f'Error creating skeleton training plan for {current_user["email"]} in MongoDB: {str(e)}'
+        error_message = f'Error writing user-details and skeleton training plan for {current_user["email"]} in MongoDB: {str(e)}'
         logger.error(error_message)
         logger.error(traceback.format_exc())
         return {"status": "error", "message": error_message}, 500
@@ -103,7 +108,7 @@ async def initiateUserDetails(current_user: dict = Depends(user_or_admin_require
     user_id = await get_user_id_internal(current_user["email"])
 
     try:
-        if _validate_user_details(user_id):
+        if await _validate_user_details(user_id):
             error_message = (
                 f'User details already exist for username: {current_user["email"]}'
             )
@@ -143,17 +148,19 @@ async def initiateUserDetails(current_user: dict = Depends(user_or_admin_require
             "memories": [],
         }
 
-        user_dboperations = DbOperations("user-details")
-        user_dboperations.write_to_mongodb(user_details)
-
         # Create skeleton training plan
         training_plan = {
             "user_id": user_id,
             "training_plan": {str(datetime.now().year): {}, "summary": ""},
         }
 
-        training_plan_dboperations = DbOperations("training-plans")
-        training_plan_dboperations.write_to_mongodb(training_plan)
+        async with async_transaction() as session:
+            user_dboperations = AsyncDbOperations("user-details")
+            await user_dboperations.write_to_mongodb(user_details, session=session)
+            training_plan_dboperations = AsyncDbOperations("training-plans")
+            await training_plan_dboperations.write_to_mongodb(
+                training_plan, session=session
+            )
 
         logger.info(
             f"Successfully initiated user details and training plan for user_id: {user_id}"
@@ -178,13 +185,13 @@ async def update_user_details(
     Update specific user details field for current user.
     """
     user_id = await get_user_id_internal(current_user["email"])
-    user_dboperations = DbOperations("user-details")
+    user_dboperations = AsyncDbOperations("user-details")
 
     print(request)
     try:
         _validate_update_user_details(request.user_details_field, request.value)
         update_query = {"$set": {request.user_details_field: request.value}}
-        result = user_dboperations.update_from_mongodb(
+        result = await user_dboperations.update_from_mongodb(
             {"user_id": user_id}, update_query
         )
 
@@ -214,18 +221,18 @@ async def get_user_details(current_user: dict = Depends(user_or_admin_required))
     Retrieve user details for the current user.
     """
     user_id = await get_user_id_internal(current_user["email"])
-    user_dboperations = DbOperations("user-details")
+    user_dboperations = AsyncDbOperations("user-details")
 
     try:
-        user_details = user_dboperations.read_one_from_mongodb({"user_id": user_id})
+        user_details = await user_dboperations.read_one_from_mongodb_with_projection(
+            {"user_id": user_id}, {"_id": 0}
+        )
         if not user_details:
             error_message = f"User details not found for user_id: {user_id}"
             logger.error(error_message)
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=404, detail=error_message)
 
-        # Remove the _id field from the response
-        user_details.pop("_id", None)
         return user_details
 
     except HTTPException as he:
@@ -240,9 +247,11 @@ async def get_user_details(current_user: dict = Depends(user_or_admin_required))
 @router.get("/getUserId")
 async def get_user_id(username: str = None):
 
-    user_profiles_db = DbOperations("user-profiles")
+    user_profiles_db = AsyncDbOperations("user-profiles")
     try:
-        user_profile = user_profiles_db.read_one_from_mongodb({"email": username})
+        user_profile = await user_profiles_db.read_one_from_mongodb_with_projection(
+            {"email": username}, {"_id": 0, "user_id": 1}
+        )
         if not user_profile:
             error_message = f"User profile is not found"
             logger.error(error_message)
@@ -270,16 +279,16 @@ async def delete_user_profile(current_user: dict = Depends(user_or_admin_require
     query = {"user_id": user_id}
 
     collections = [
-        ("user-profiles", "read_one_from_mongodb")
-        # ("user-details", "read_one_from_mongodb"),
-        # ("training-plans", "read_one_from_mongodb")
+        ("user-profiles", "exists_in_mongodb")
+        # ("user-details", "exists_in_mongodb"),
+        # ("training-plans", "exists_in_mongodb")
     ]
 
     # Check if user exists in all collections
     for collection, read_method in collections:
-        db_operations = DbOperations(collection)
+        db_operations = AsyncDbOperations(collection)
         try:
-            result = getattr(db_operations, read_method)(query)
+            result = await getattr(db_operations, read_method)(query)
             if not result:
                 error_message = f"User with id {user_id} not found in {collection}"
                 logger.error(error_message)
@@ -300,17 +309,21 @@ async def delete_user_profile(current_user: dict = Depends(user_or_admin_require
         ("user-details", "delete_one_from_mongodb"),
         ("user-profiles", "delete_one_from_mongodb"),
         ("chat-history", "delete_many_from_mongodb"),
+        ("chat-message-buckets", "delete_many_from_mongodb"),
     ]
 
-    for collection, delete_method in delete_operations:
-        db_operations = DbOperations(collection)
-        try:
-            getattr(db_operations, delete_method)(query)
-        except Exception as e:
-            error_message = f"Error deleting from {collection} collection for user_id: {user_id} with the error: {e}"
-            logger.error(error_message)
-            logger.error(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=error_message)
+    # All deletes share one transaction, so a failure leaves the user untouched.
+    async with async_transaction() as session:
+        for collection, delete_method in delete_operations:
+            db_operations = AsyncDbOperations(collection)
+            try:
+                await getattr(db_operations, delete_method)(query, session=session)
+            except Exception as e:
+                error_message = f"Error deleting from {collection} collection for user_id: {user_id} with the error: {e}"
+                logger.error(error_message)
+                logger.error(traceback.format_exc())
+                raise HTTPException(status_code=500, detail=error_message)
+    invalidate_user_id(current_user["email"])
 
     return {
         "status": "success",
@@ -324,13 +337,9 @@ async def verify_user_details(current_user: dict = Depends(user_or_admin_require
     Verify if all required fields in the user-details collection are populated.
     """
     user_id = await get_user_id_internal(current_user["email"])
-    user_dboperations = DbOperations("user-details")
+    user_dboperations = AsyncDbOperations("user-details")
 
     try:
-        user_details = user_dboperations.read_one_from_mongodb({"user_id": user_id})
-        if not user_details:
-            raise HTTPException(status_code=404, detail="User details not found")
-
         required_fields = [
             "personalInfo.name",
             "personalInfo.gender",
@@ -350,6 +359,12 @@ async def verify_user_details(current_user: dict = Depends(user_or_admin_require
             "lifestyle.availableDays",
         ]
 
+        user_details = await user_dboperations.read_one_from_mongodb_with_projection(
+            {"user_id": user_id}, {"_id": 1, **{field: 1 for field in required_fields}}
+        )
+        if not user_details:
+            raise HTTPException(status_code=404, detail="User details not found")
+
         missing_fields = [
             field
             for field in required_fields
@@ -373,8 +388,19 @@ async def verify_user_details(current_user: dict = Depends(user_or_admin_require
 
 
 async def get_user_id_internal(username: str):
-    user_profile = await get_user_id(username)
-    return user_profile["user_id"]
+    user_id = _user_id_cache.get(username)
+    if user_id is None:
+        user_profile = await get_user_id(username)
+        user_id = user_profile["user_id"]
+        _user_id_cache.set(username, user_id)
+    return user_id
+
+
+def invalidate_user_id(username: str):
+    """
+    Drop the cached user_id of username. Other workers drop theirs when the entry expires.
+    """
+    _user_id_cache.invalidate(username)
 
 
 def _validate_update_user_details(
@@ -462,15 +488,15 @@ def _validate_update_user_details(
         raise HTTPException(status_code=400, detail=error_message)
 
 
-def _validate_user_details(user_id: str):
+async def _validate_user_details(user_id: str):
     """
     Check if user details for given user_id already exists
     """
-    user_details_dboperations = DbOperations("user-details")
-    user_details = None
+    user_details_dboperations = AsyncDbOperations("user-details")
+    user_details_exist = False
     try:
         query = {"user_id": user_id}
-        user_details = user_details_dboperations.read_one_from_mongodb(query)
+        user_details_exist = await user_details_dboperations.exists_in_mongodb(query)
 
     except Exception as e:
         error_message = f"Error reading from user-details collection for user: {user_id} with the error: {e}"
@@ -478,7 +504,7 @@ def _validate_user_details(user_id: str):
         logger.error(traceback.format_exc())
         return {"status": "error", "message": error_message}, 500
 
-    return user_details is not None
+    return user_details_exist
 
 
 def _get_nested_value(data: Dict[str, Any], key: str) -> Any:
@@ -0,0 +1,118 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, NamedTuple, Optional
+from enums import ChatPurpose
+from .base_assistant import BaseAssistant
+from .openai_chat_base import OpenAIBase
+from .onboarding_assistant import OnboardingAssistant, OnboardingPurposeData
+from .workout_guide_assistant import WorkoutGuideAssistant, WorkoutGuidePurposeData
+from .workout_journal_assistant import (
+    WorkoutJournalAssistant,
+    WorkoutJournalPurposeData,
+)
+from .workout_log_assistant import WorkoutLogAssistant
+
+logger = logging.getLogger(__name__)
+
+# Turns the purpose_data of a chat request and the user's email into what the assistant expects.
+PurposeDataBuilder = Callable[[Any, str], Any]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+class RegisteredAssistant(NamedTuple):
+    assistant: BaseAssistant
+    build_purpose_data: PurposeDataBuilder
+
+
+def _no_purpose_data(purpose_data: Any, user_email: str) -> None:
+    return None
+
+
+class AssistantRegistry:
+    """
+    Chat assistants keyed by ChatPurpose, created once and shared by every request.
+    Assistants hold no per-request state and use the process-wide OpenAI clients.
+    """
+
+    def __init__(self):
+        self._assistants = {}
+
+    def register(
+        self,
+        purpose: ChatPurpose,
+        assistant: BaseAssistant,
+        build_purpose_data: Optional[PurposeDataBuilder] = None,
+    ) -> None:
+        """
+        Register assistant for purpose and build the schema and validators of its response model.
+        """
+        OpenAIBase.prepare_response_model(assistant.response_model)
+        self._assistants[purpose] = RegisteredAssistant(
+            assistant, build_purpose_data or _no_purpose_data
+        )
+
+    def get(self, purpose: ChatPurpose) -> Optional[RegisteredAssistant]:
+        return self._assistants.get(purpose)
+
+    def __contains__(self, purpose: ChatPurpose) -> bool:
+        return purpose in self._assistants
+
+    def __len__(self) -> int:
+        return len(self._assistants)
+
+
+def _onboarding_purpose_data(purpose_data, user_email: str) -> OnboardingPurposeData:
+    return {"user_name": purpose_data.user_name}
+
+
+def _workout_journal_purpose_data(
+    purpose_data, user_email: str
+) -> WorkoutJournalPurposeData:
+    return {"workout_date": purpose_data.workout_date, "user_email": user_email}
+
+
+def _workout_guide_purpose_data(
+    purpose_data, user_email: str
+) -> WorkoutGuidePurposeData:
+    return {
+        "workout_date": datetime.strptime(purpose_data.workout_guide_date, "%Y-%m-%d"),
+        "user_email": user_email,
+    }
+
+
+def load_assistant_registry() -> AssistantRegistry:
+    """
+    Create the assistant of every implemented ChatPurpose.
+    ChatPurpose.GENERAL has no assistant yet; registering one here is all it takes to serve it.
+    """
+    registry = AssistantRegistry()
+    registry.register(
+        ChatPurpose.ONBOARDING, OnboardingAssistant(), _onboarding_purpose_data
+    )
+    registry.register(
+        ChatPurpose.WORKOUT_JOURNAL,
+        WorkoutJournalAssistant(),
+        _workout_journal_purpose_data,
+    )
+    registry.register(
+        ChatPurpose.WORKOUT_GUIDE, WorkoutGuideAssistant(), _workout_guide_purpose_data
+    )
+    registry.register(ChatPurpose.WORKOUT_LOG, WorkoutLogAssistant())
+
+    global _registry
+    with _registry_lock:
+        _registry = registry
+    logger.info(f"Registered {len(registry)} chat assistants.")
+    return registry
+
+
+def get_assistant_registry() -> AssistantRegistry:
+    """
+    Return the assistant registry, loading it on first use.
+    """
+    if _registry is None:
+        load_assistant_registry()
+    return _registry
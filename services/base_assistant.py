@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple, Type
+from pydantic import BaseModel
 
 
 class BaseAssistant(ABC):
+    # Structured reply streamed by chat.
+    response_model: Type[BaseModel]
 
     @abstractmethod
     async def chat(
@@ -12,5 +14,9 @@ class BaseAssistant(ABC):
         user_message: str,
         purpose_data: Dict[str, Any],
         user_memories: Optional[str] = None,
-    ) -> StreamingResponse:
+    ) -> Tuple[AsyncIterator[BaseModel], Optional[str]]:
+        """
+        Return an async stream of partial responses and the system message to persist
+        if this is a new conversation.
+        """
         pass
@@ -0,0 +1,122 @@
+import logging
+import os
+import traceback
+from db.async_db_operations import AsyncDbOperations
+from db.chat_messages import count_chat_messages, read_chat_document, read_chat_messages
+from .llm_scheduler import Priority
+from .openai_chat_base import OpenAIBase
+from .prompt_templates import render_prompt
+
+logger = logging.getLogger(__name__)
+
+# Turns (a user message and its reply) that are always sent to the model verbatim.
+CHAT_MEMORY_RECENT_TURNS = int(os.getenv("CHAT_MEMORY_RECENT_TURNS", 6))
+# Older turns are folded into the summary once at least this many have piled up.
+CHAT_MEMORY_SUMMARY_BATCH_TURNS = int(os.getenv("CHAT_MEMORY_SUMMARY_BATCH_TURNS", 4))
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+class ConversationMemory:
+    """
+    Sliding window over a chat: the last turns verbatim and a rolling summary of the rest.
+    The summary lives on the chat-history document as memory_summary, covering the
+    messages before index summarized_until, and is only updated off the request path.
+    """
+
+    def __init__(
+        self,
+        chat_id: str,
+        recent_turns: int = CHAT_MEMORY_RECENT_TURNS,
+        summary_batch_turns: int = CHAT_MEMORY_SUMMARY_BATCH_TURNS,
+    ):
+        self.chat_id = chat_id
+        self.recent_messages = recent_turns * 2
+        self.summary_batch_messages = summary_batch_turns * 2
+        self.db_operations = AsyncDbOperations("chat-history")
+
+    async def window(self) -> list[dict]:
+        """
+        Return the messages to send to the model for the next turn.
+        A leading system message is kept, followed by the summary and the unsummarized messages.
+        Those are capped at the most a working summary leaves unfolded, so a chat whose summary
+        is missing or failing to update still only sends its newest messages.
+        Only the storage buckets holding those messages are read.
+        """
+        document = await read_chat_document(self.chat_id)
+        message_count = await count_chat_messages(document)
+        if not message_count:
+            return []
+        # Empty if the count was read before the first messages were.
+        head = await read_chat_messages(document, 0, 1)
+        start = 1 if head and head[0]["role"] == "system" else 0
+        window = head[:start]
+        summary = document.get("memory_summary")
+        if summary:
+            window.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+            start = max(document.get("summarized_until", 0), start)
+        max_unsummarized = self.recent_messages + self.summary_batch_messages
+        start = max(start, message_count - max_unsummarized)
+        window.extend(await read_chat_messages(document, start, message_count))
+        return [{"role": m["role"], "content": m["content"]} for m in window]
+
+    async def update_summary(self) -> None:
+        """
+        Fold the messages that fell out of the recent window into the rolling summary.
+        Meant to run as a background task after the turn has been saved.
+        The update is skipped if another turn moved the summary on in the meantime.
+        """
+        try:
+            document = await read_chat_document(self.chat_id)
+            message_count = await count_chat_messages(document)
+            if not message_count:
+                return
+            head = await read_chat_messages(document, 0, 1)
+            if not head:
+                return
+            start = 1 if head[0]["role"] == "system" else 0
+            summarized_until = max(document.get("summarized_until", 0), start)
+            fold_until = message_count - self.recent_messages
+            if fold_until - summarized_until < self.summary_batch_messages:
+                return
+
+            messages = await read_chat_messages(document, summarized_until, fold_until)
+            if len(messages) < fold_until - summarized_until:
+                # Not all of them are stored yet; the next turn folds them.
+                return
+            new_messages = "\n\n".join(
+                f"{message['role']}: {message['content']}" for message in messages
+            )
+            system_message = render_prompt(
+                "chat_memory_summary",
+                summary=document.get("memory_summary") or "No summary yet.",
+                messages=new_messages,
+            )
+            summary = await OpenAIBase().achat_str_output(
+                [],
+                system_message,
+                "Update the summary as instructed.",
+                priority=Priority.BACKGROUND,
+            )
+
+            query = {"chat_id": self.chat_id}
+            if "summarized_until" in document:
+                query["summarized_until"] = document["summarized_until"]
+            else:
+                query["summarized_until"] = {"$exists": False}
+            await self.db_operations.update_from_mongodb(
+                query,
+                {
+                    "$set": {
+                        "memory_summary": summary,
+                        "summarized_until": fold_until,
+                    }
+                },
+            )
+            logger.info(
+                f"Folded messages {summarized_until}-{fold_until} of chat_id: {self.chat_id} into its summary."
+            )
+        except Exception as e:
+            error_message = f"Error updating conversation summary for chat_id: {self.chat_id}: {str(e)}"
+            logger.error(error_message)
+            logger.error(traceback.format_exc())
@@ -0,0 +1,515 @@
+import asyncio
+import hashlib
+import importlib
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Iterator, Optional
+import httpx
+from .prompt_templates import get_prompt_template
+
+logger = logging.getLogger(__name__)
+
+# live: call OpenAI. record: call OpenAI and append every exchange to LLM_CASSETTE.
+# replay: answer from LLM_CASSETTE. synthetic: generate responses locally.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live").lower()
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", "llm_cassette.jsonl")
+# Multiplies the recorded delays on replay; 0 replays without waiting.
+LLM_REPLAY_SPEED = float(os.getenv("LLM_REPLAY_SPEED", 1))
+LLM_SYNTHETIC_TTFT_MS = float(os.getenv("LLM_SYNTHETIC_TTFT_MS", 400))
+LLM_SYNTHETIC_TTFT_SIGMA = float(os.getenv("LLM_SYNTHETIC_TTFT_SIGMA", 0.5))
+LLM_SYNTHETIC_TOKENS_PER_SECOND = float(
+    os.getenv("LLM_SYNTHETIC_TOKENS_PER_SECOND", 60)
+)
+LLM_SYNTHETIC_TOKENS_PER_SECOND_STDDEV = float(
+    os.getenv("LLM_SYNTHETIC_TOKENS_PER_SECOND_STDDEV", 10)
+)
+LLM_SYNTHETIC_ARRAY_ITEMS = int(os.getenv("LLM_SYNTHETIC_ARRAY_ITEMS", 3))
+LLM_SYNTHETIC_SEED = os.getenv("LLM_SYNTHETIC_SEED")
+# Requests accepted per window before the synthetic backend answers 429; 0 disables the limit.
+LLM_SYNTHETIC_RATE_LIMIT_REQUESTS = int(
+    os.getenv("LLM_SYNTHETIC_RATE_LIMIT_REQUESTS", 0)
+)
+LLM_SYNTHETIC_RATE_LIMIT_WINDOW_SECONDS = float(
+    os.getenv("LLM_SYNTHETIC_RATE_LIMIT_WINDOW_SECONDS", 60)
+)
+
+_SYNTHETIC_TEXT = (
+    "This is a synthetic response generated for local load testing. "
+    "Keep training consistently, rest well and stay hydrated."
+)
+# Roughly one token per chunk of a synthetic stream.
+_CHARS_PER_TOKEN = 4
+_ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+
+
+# Response models of the prompts that ask for a json_object, as (module, class), so the
+# synthetic backend can answer them. They are imported on first use.
+_JSON_RESPONSE_MODELS = {
+    "generate_fitness_plan_system_message": ("routers.generate_plan", "WeeklyPlan"),
+    "generate_quick_workout_plan_system_message": ("routers.generate_plan", "Workout"),
+    "regenerate_specific_date_workout_system_message": (
+        "routers.generate_plan",
+        "Workout",
+    ),
+    "log_user_specified_workout_system_message": ("routers.generate_plan", "Workout"),
+}
+_json_response_schemas = {}
+
+
+def _json_response_schema(prompt_name: str) -> dict:
+    if prompt_name not in _json_response_schemas:
+        module_name, class_name = _JSON_RESPONSE_MODELS[prompt_name]
+        response_model = getattr(importlib.import_module(module_name), class_name)
+        _json_response_schemas[prompt_name] = response_model.model_json_schema()
+    return _json_response_schemas[prompt_name]
+
+
+def request_key(request: httpx.Request) -> str:
+    """
+    Identity of a request for replay: method, path and the canonical JSON body.
+    """
+    try:
+        body = json.dumps(json.loads(request.content), sort_keys=True)
+    except ValueError:
+        body = request.content.decode("utf-8", "surrogateescape")
+    payload = f"{request.method} {request.url.path} {body}"
+    return hashlib.sha256(payload.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+def _encode_chunk(chunk: bytes) -> str:
+    return chunk.decode("utf-8", "surrogateescape")
+
+
+def _decode_chunk(chunk: str) -> bytes:
+    return chunk.encode("utf-8", "surrogateescape")
+
+
+class _TimedStream(httpx.AsyncByteStream):
+    """
+    Response body that yields (delay, chunk) pairs, waiting delay seconds since the
+    start of the request before each chunk.
+    """
+
+    def __init__(self, chunks: list, started_at: float, speed: float = 1):
+        self.chunks = chunks
+        self.started_at = started_at
+        self.speed = speed
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for delay, chunk in self.chunks:
+            wait = self.started_at + delay * self.speed - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield chunk
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, response: httpx.Response, started_at: float, on_complete):
+        self.response = response
+        self.started_at = started_at
+        self.on_complete = on_complete
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        chunks = []
+        async for chunk in self.response.stream:
+            chunks.append([time.perf_counter() - self.started_at, _encode_chunk(chunk)])
+            yield chunk
+        self.on_complete(chunks)
+
+    async def aclose(self) -> None:
+        await self.response.aclose()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Forwards requests to transport and appends each exchange to path as a JSON line,
+    with every body chunk and its delay from the start of the request.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, path: str):
+        self.transport = transport
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, request: httpx.Request, response: httpx.Response, chunks):
+        entry = {
+            "key": request_key(request),
+            "method": request.method,
+            "path": request.url.path,
+            "request": _encode_chunk(request.content),
+            "status_code": response.status_code,
+            "headers": [
+                [name, value]
+                for name, value in response.headers.items()
+                if name not in ("content-length", "transfer-encoding")
+            ],
+            "chunks": chunks,
+        }
+        with self._lock, open(self.path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # Keep recorded bodies readable and replayable without decompression.
+        request.headers["accept-encoding"] = "identity"
+        started_at = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(
+                response,
+                started_at,
+                lambda chunks: self._write(request, response, chunks),
+            ),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Answers requests from a cassette written by RecordingTransport, reproducing the
+    recorded chunk timing scaled by speed. A request recorded several times is
+    answered with its recordings in turn.
+    """
+
+    def __init__(self, path: str, speed: float = LLM_REPLAY_SPEED):
+        self.speed = speed
+        self._recordings = {}
+        self._next = {}
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._recordings.setdefault(entry["key"], []).append(entry)
+        logger.info(
+            f"Loaded {sum(len(v) for v in self._recordings.values())} LLM recordings from {path}."
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        recordings = self._recordings.get(key)
+        if not recordings:
+            error_message = f"No recorded LLM response for {request.method} {request.url.path} with key: {key}"
+            logger.error(error_message)
+            # 404 so the scheduler does not retry a request that can never be answered.
+            return httpx.Response(
+                404,
+                json={"error": {"message": error_message, "type": "replay_miss"}},
+            )
+        index = self._next.get(key, 0)
+        self._next[key] = index + 1
+        entry = recordings[index % len(recordings)]
+        chunks = [(delay, _decode_chunk(chunk)) for delay, chunk in entry["chunks"]]
+        return httpx.Response(
+            status_code=entry["status_code"],
+            headers=entry["headers"],
+            stream=_TimedStream(chunks, time.perf_counter(), self.speed),
+        )
+
+
+def _sample_schema(schema: dict, defs: dict, dates: Optional[Iterator[str]] = None):
+    """
+    Smallest plausible value for a JSON schema, enough to validate a response model.
+    With dates, properties named date take its successive values.
+    """
+    if "$ref" in schema:
+        return _sample_schema(defs[schema["$ref"].split("/")[-1]], defs, dates)
+    if schema.get("default") is not None:
+        return schema["default"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"]
+            return _sample_schema(
+                options[0] if options else schema[key][0], defs, dates
+            )
+    schema_type = schema.get("type", "object")
+    if schema_type == "object":
+        return {
+            name: (
+                next(dates)
+                if name == "date" and dates is not None
+                else _sample_schema(property_schema, defs, dates)
+            )
+            for name, property_schema in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return [
+            _sample_schema(schema.get("items", {}), defs, dates)
+            for _ in range(LLM_SYNTHETIC_ARRAY_ITEMS)
+        ]
+    return {
+        "string": "synthetic",
+        "integer": 1,
+        "number": 1.0,
+        "boolean": True,
+        "null": None,
+    }.get(schema_type, "synthetic")
+
+
+class SyntheticTransport(httpx.AsyncBaseTransport):
+    """
+    Generates chat completions locally, streamed or not, with a lognormal time to first
+    token and a normally distributed token rate.
+    Tool calls (the instructor call sites) get arguments that satisfy the tool's schema,
+    json_object requests get an object satisfying the response model of their prompt
+    (see _JSON_RESPONSE_MODELS), or "{}", and other requests get placeholder text.
+    With rate_limit_requests, responses carry x-ratelimit-* headers like the API's and
+    requests past the limit of the current window are answered 429 with retry-after.
+    """
+
+    def __init__(
+        self,
+        seed: Optional[str] = LLM_SYNTHETIC_SEED,
+        ttft_ms: float = LLM_SYNTHETIC_TTFT_MS,
+        tokens_per_second: float = LLM_SYNTHETIC_TOKENS_PER_SECOND,
+        rate_limit_requests: int = LLM_SYNTHETIC_RATE_LIMIT_REQUESTS,
+        rate_limit_window: float = LLM_SYNTHETIC_RATE_LIMIT_WINDOW_SECONDS,
+    ):
+        self.random = random.Random(seed)
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_requests = rate_limit_requests
+        self.rate_limit_window = rate_limit_window
+        self._window_started = time.monotonic()
+        self._window_requests = 0
+        self.rate_limited = 0
+
+    def _rate_limit_headers(self) -> tuple[dict, bool]:
+        """
+        Count the request against the current window.
+        Return the rate-limit headers for its response and whether it is over the limit.
+        """
+        if not self.rate_limit_requests:
+            return {}, False
+        now = time.monotonic()
+        if now - self._window_started >= self.rate_limit_window:
+            self._window_started = now
+            self._window_requests = 0
+        self._window_requests += 1
+        reset_after = self._window_started + self.rate_limit_window - now
+        remaining = max(0, self.rate_limit_requests - self._window_requests)
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rate_limit_requests),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset_after:.3f}s",
+        }
+        if self._window_requests <= self.rate_limit_requests:
+            return headers, False
+        headers["retry-after"] = f"{reset_after:.3f}"
+        return headers, True
+
+    def _content(self, body: dict) -> tuple[Optional[str], Optional[str]]:
+        """
+        Return (tool name, content) for body.
+        """
+        tools = body.get("tools")
+        if tools:
+            function = tools[0]["function"]
+            parameters = function.get("parameters", {})
+            arguments = _sample_schema(parameters, parameters.get("$defs", {}))
+            return function["name"], json.dumps(arguments)
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            schema = self._json_response_schema(body)
+            if schema is None:
+                return None, "{}"
+            content = _sample_schema(schema, schema.get("$defs", {}), self._dates(body))
+            return None, json.dumps(content)
+        return None, _SYNTHETIC_TEXT
+
+    @staticmethod
+    def _dates(body: dict) -> Iterator[str]:
+        """
+        Successive days from the first date in the last user message, else in the system
+        message, else today, so the dates of a synthetic plan line up with the request.
+        """
+        start = date.today()
+        messages = body.get("messages", [])
+        user_messages = [m for m in messages if m.get("role") == "user"]
+        system_messages = [m for m in messages if m.get("role") == "system"]
+        for message in user_messages[-1:] + system_messages[:1]:
+            match = _ISO_DATE.search(str(message.get("content")))
+            if match:
+                try:
+                    start = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+                    break
+                except ValueError:
+                    continue
+        return ((start + timedelta(days=day)).isoformat() for day in itertools.count())
+
+    @staticmethod
+    def _json_response_schema(body: dict) -> Optional[dict]:
+        """
+        Schema of the prompt in _JSON_RESPONSE_MODELS whose template the system message renders.
+        """
+        system_message = next(
+            (
+                message["content"]
+                for message in body.get("messages", [])
+                if message.get("role") == "system"
+                and isinstance(message.get("content"), str)
+            ),
+            None,
+        )
+        if system_message is None:
+            return None
+        for prompt_name in _JSON_RESPONSE_MODELS:
+            if get_prompt_template(prompt_name).matches(system_message):
+                return _json_response_schema(prompt_name)
+        return None
+
+    def _timing(self, content: str) -> list[float]:
+        ttft = (
+            self.ttft_ms
+            / 1000
+            * self.random.lognormvariate(0, LLM_SYNTHETIC_TTFT_SIGMA)
+        )
+        tokens_per_second = max(
+            1.0,
+            self.random.gauss(
+                self.tokens_per_second, LLM_SYNTHETIC_TOKENS_PER_SECOND_STDDEV
+            ),
+        )
+        tokens = max(1, len(content) // _CHARS_PER_TOKEN)
+        return [ttft + i / tokens_per_second for i in range(tokens)]
+
+    def _completion(self, body, tool_name, content, delays):
+        message = {"role": "assistant", "content": None if tool_name else content}
+        if tool_name:
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {"name": tool_name, "arguments": content},
+                }
+            ]
+        return [
+            (
+                delays[-1],
+                json.dumps(
+                    {
+                        "id": f"chatcmpl-{uuid.uuid4().hex}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "synthetic"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": message,
+                                "finish_reason": "tool_calls" if tool_name else "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": 0,
+                            "completion_tokens": len(delays),
+                            "total_tokens": len(delays),
+                        },
+                    }
+                ).encode("utf-8"),
+            )
+        ]
+
+    def _stream(self, body, tool_name, content, delays):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        step = -(-len(content) // len(delays))
+        pieces = [content[i : i + step] for i in range(0, len(content), step)]
+
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "synthetic"),
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        chunks = []
+        for i, (delay, piece) in enumerate(zip(delays, pieces)):
+            if tool_name:
+                tool_call = {"index": 0, "function": {"arguments": piece}}
+                if i == 0:
+                    tool_call.update(
+                        id=f"call_{uuid.uuid4().hex[:24]}", type="function"
+                    )
+                    tool_call["function"]["name"] = tool_name
+                delta = {"tool_calls": [tool_call]}
+            else:
+                delta = {"content": piece}
+            if i == 0:
+                delta["role"] = "assistant"
+            chunks.append((delay, event(delta)))
+        finish_reason = "tool_calls" if tool_name else "stop"
+        chunks.append((delays[-1], event({}, finish_reason)))
+        chunks.append((delays[-1], b"data: [DONE]\n\n"))
+        return chunks
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started_at = time.perf_counter()
+        headers, rate_limited = self._rate_limit_headers()
+        if rate_limited:
+            self.rate_limited += 1
+            return httpx.Response(
+                429,
+                headers=headers,
+                json={
+                    "error": {
+                        "message": "Synthetic rate limit reached for requests",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+            )
+        body = json.loads(request.content)
+        tool_name, content = self._content(body)
+        delays = self._timing(content)
+        if body.get("stream"):
+            chunks = self._stream(body, tool_name, content, delays)
+            content_type = "text/event-stream"
+        else:
+            chunks = self._completion(body, tool_name, content, delays)
+            content_type = "application/json"
+        return httpx.Response(
+            200,
+            headers={"content-type": content_type, **headers},
+            stream=_TimedStream(chunks, started_at),
+        )
+
+
+def make_llm_transport(limits: httpx.Limits) -> Optional[httpx.AsyncBaseTransport]:
+    """
+    Transport for the shared async OpenAI client according to LLM_BACKEND,
+    or None to let the client use its default live transport.
+    """
+    if LLM_BACKEND == "live":
+        return None
+    logger.info(f"LLM backend is {LLM_BACKEND}.")
+    if LLM_BACKEND == "record":
+        return RecordingTransport(httpx.AsyncHTTPTransport(limits=limits), LLM_CASSETTE)
+    if LLM_BACKEND == "replay":
+        return ReplayTransport(LLM_CASSETTE)
+    if LLM_BACKEND == "synthetic":
+        return SyntheticTransport()
+    raise ValueError(
+        f"Unknown LLM_BACKEND: {LLM_BACKEND}. Use live, record, replay or synthetic."
+    )
+
+
+def is_offline_backend() -> bool:
+    return LLM_BACKEND in ("replay", "synthetic")
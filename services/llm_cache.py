@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import traceback
+from datetime import datetime, timedelta
+from openai import AsyncOpenAI
+from db.async_db_operations import AsyncDbOperations
+from db.cache import TTLCache
+from .llm_scheduler import Priority, create_chat_completion
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_COLLECTION = "llm-response-cache"
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+# Front for the Mongo store so repeated calls in one process skip the round trip too.
+_memory_cache = TTLCache(
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", 1000)),
+    ttl=LLM_CACHE_TTL_SECONDS,
+)
+
+_metrics = {"memory_hits": 0, "store_hits": 0, "misses": 0}
+_metrics_lock = threading.Lock()
+
+
+def _llm_cache_enabled() -> bool:
+    return os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+
+
+def _count(metric: str) -> None:
+    with _metrics_lock:
+        _metrics[metric] += 1
+        snapshot = dict(_metrics)
+    logger.debug(
+        f"LLM response cache {metric} counted. Totals: "
+        f"{snapshot['memory_hits']} memory hits, {snapshot['store_hits']} store hits, "
+        f"{snapshot['misses']} misses so far"
+    )
+
+
+def get_llm_cache_metrics() -> dict:
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def make_cache_key(model: str, messages: list[dict], **params) -> str:
+    """
+    Content address of a completion: the model, the rendered messages and the request params.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def cached_chat_completion(
+    client: AsyncOpenAI,
+    model: str,
+    messages: list[dict],
+    priority: Priority = Priority.STANDARD,
+    **params,
+) -> str:
+    """
+    Return the content of a chat completion, answered from the cache when the same
+    model, messages and params were completed before.
+    Only use it for calls whose output is a pure function of their input.
+    Cache store errors are logged and the completion is requested as if it were a miss.
+    Misses go through the LLM scheduler with priority.
+    """
+    if not _llm_cache_enabled():
+        response = await create_chat_completion(
+            client, priority, model=model, messages=messages, **params
+        )
+        return response.choices[0].message.content
+
+    key = make_cache_key(model, messages, **params)
+    content = _memory_cache.get(key)
+    if content is not None:
+        _count("memory_hits")
+        return content
+
+    db_operations = AsyncDbOperations(LLM_CACHE_COLLECTION)
+    try:
+        document = await db_operations.read_one_from_mongodb_with_projection(
+            {"key": key}, {"_id": 0, "content": 1}
+        )
+    except Exception as e:
+        logger.error(f"Error reading LLM response cache for key: {key}: {str(e)}")
+        logger.error(traceback.format_exc())
+        document = None
+    if document:
+        _count("store_hits")
+        _memory_cache.set(key, document["content"])
+        return document["content"]
+
+    _count("misses")
+    response = await create_chat_completion(
+        client, priority, model=model, messages=messages, **params
+    )
+    content = response.choices[0].message.content
+    _memory_cache.set(key, content)
+    now = datetime.now()
+    try:
+        await db_operations.collection.update_one(
+            {"key": key},
+            {
+                "$set": {
+                    "model": model,
+                    "content": content,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=LLM_CACHE_TTL_SECONDS),
+                }
+            },
+            upsert=True,
+        )
+    except Exception as e:
+        logger.error(f"Error writing LLM response cache for key: {key}: {str(e)}")
+        logger.error(traceback.format_exc())
+    return content
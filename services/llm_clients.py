@@ -0,0 +1,90 @@
+from dotenv import load_dotenv
+import os
+import threading
+import logging
+import httpx
+import instructor
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from .llm_backends import is_offline_backend, make_llm_transport
+from .llm_scheduler import record_rate_limit_headers
+
+# Load .env file
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+_async_client = None
+_async_instructor_client = None
+_client_lock = threading.Lock()
+
+
+def _http_client_options() -> dict:
+    """
+    Connection limits and keep-alive for the shared OpenAI client, configurable through the environment.
+    """
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(
+                os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20)
+            ),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", 60)),
+        ),
+        "timeout": httpx.Timeout(
+            float(os.getenv("OPENAI_TIMEOUT_SECONDS", 600)),
+            connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", 5)),
+        ),
+    }
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Return the process-wide AsyncOpenAI client used by the async route handlers.
+    Retries are left to the LLM scheduler, which reads the rate-limit headers of every response.
+    LLM_BACKEND selects a recording, replaying or synthetic transport instead of the live API.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                options = _http_client_options()
+                transport = make_llm_transport(options["limits"])
+                if transport is not None:
+                    options["transport"] = transport
+                _async_client = AsyncOpenAI(
+                    # Offline backends never reach the API, so no real key is needed.
+                    api_key=(
+                        os.getenv("OPENAI_API_KEY") or "offline"
+                        if is_offline_backend()
+                        else None
+                    ),
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(
+                        event_hooks={"response": [record_rate_limit_headers]},
+                        **options,
+                    ),
+                )
+    return _async_client
+
+
+def get_async_instructor_client() -> instructor.AsyncInstructor:
+    """
+    Return the instructor wrapper around the shared AsyncOpenAI client.
+    """
+    global _async_instructor_client
+    if _async_instructor_client is None:
+        client = get_async_openai_client()
+        with _client_lock:
+            if _async_instructor_client is None:
+                _async_instructor_client = instructor.from_openai(client)
+    return _async_instructor_client
+
+
+async def close_llm_clients() -> None:
+    global _async_client, _async_instructor_client
+    with _client_lock:
+        async_client = _async_client
+        _async_client = _async_instructor_client = None
+    if async_client is not None:
+        await async_client.close()
+    logger.info("OpenAI clients are closed.")
@@ -0,0 +1,351 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import time
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+import httpx
+import openai
+from .tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+# Open streams per model. A stream gives back its LLM_MAX_CONCURRENCY slot at the first
+# chunk, but keeps one of these until it ends.
+LLM_MAX_STREAMS = int(os.getenv("LLM_MAX_STREAMS", 64))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 1))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", 30))
+
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class Priority(IntEnum):
+    """
+    Lower values are admitted first. Lower priorities also leave part of the
+    rate limit unused so interactive requests still get through during a burst.
+    """
+
+    INTERACTIVE = 0
+    STANDARD = 1
+    BACKGROUND = 2
+
+
+# Share of the provider's remaining requests/tokens each priority must leave untouched.
+_RESERVED_SHARE = {
+    Priority.INTERACTIVE: 0.0,
+    Priority.STANDARD: 0.05,
+    Priority.BACKGROUND: 0.2,
+}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse reset durations such as "20ms", "1s" or "6m0s" from the rate-limit headers.
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for amount, unit in parts)
+
+
+class _Bucket:
+    """
+    Provider-side budget of requests or tokens, as last reported by the response headers.
+    """
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.resets_at = 0.0
+
+    def update(self, limit, remaining, reset_after) -> None:
+        if limit is None or remaining is None:
+            return
+        self.limit = int(limit)
+        self.remaining = int(remaining)
+        self.resets_at = time.monotonic() + (reset_after or 0)
+
+    def wait_time(self, priority: Priority, amount: int = 1) -> float:
+        """
+        Seconds until priority may spend amount from this bucket, 0 if it may now.
+        """
+        if self.remaining is None:
+            return 0
+        now = time.monotonic()
+        if now >= self.resets_at:
+            self.remaining = self.limit
+            return 0
+        # A request larger than the whole budget goes through once the budget is full.
+        amount = min(amount, self.limit)
+        if self.remaining - amount >= self.limit * _RESERVED_SHARE[priority]:
+            return 0
+        return self.resets_at - now
+
+    def spend(self, amount: int) -> None:
+        """
+        Count amount against the budget until the next response reports the real figure.
+        """
+        if self.remaining is not None:
+            self.remaining = max(0, self.remaining - amount)
+
+
+class _ModelState:
+    def __init__(self):
+        self.requests = _Bucket()
+        self.tokens = _Bucket()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.streams = 0
+        self.waiters = []
+        self.stream_waiters = []
+        self.changed = asyncio.Condition()
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM requests, per model:
+    priority-ordered admission, a concurrency cap, a cap on open streams, token buckets
+    driven by the x-ratelimit-* response headers and jittered retries of rate-limited or
+    failed calls.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_streams: int = LLM_MAX_STREAMS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_streams = max_streams
+        self._models = {}
+        self._tickets = itertools.count()
+
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._models:
+            self._models[model] = _ModelState()
+        return self._models[model]
+
+    def _wait_time(self, state: _ModelState, priority: Priority, tokens: int) -> float:
+        return max(
+            state.blocked_until - time.monotonic(),
+            state.requests.wait_time(priority),
+            state.tokens.wait_time(priority, tokens),
+            0,
+        )
+
+    async def _acquire(self, model: str, priority: Priority, tokens: int = 0) -> None:
+        """
+        Wait for a concurrency slot and for the rate limits to admit a request of tokens.
+        """
+        state = self._state(model)
+        ticket = (priority, next(self._tickets))
+        async with state.changed:
+            heapq.heappush(state.waiters, ticket)
+            try:
+                while True:
+                    wait_time = self._wait_time(state, priority, tokens)
+                    if (
+                        state.waiters[0] == ticket
+                        and state.in_flight < self.max_concurrency
+                        and wait_time == 0
+                    ):
+                        break
+                    try:
+                        await asyncio.wait_for(
+                            state.changed.wait(), timeout=wait_time or None
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                state.waiters.remove(ticket)
+                heapq.heapify(state.waiters)
+                state.changed.notify_all()
+            state.in_flight += 1
+            state.requests.spend(1)
+            state.tokens.spend(tokens)
+
+    async def _release(self, model: str) -> None:
+        state = self._state(model)
+        async with state.changed:
+            state.in_flight -= 1
+            state.changed.notify_all()
+
+    async def _open_stream(self, model: str, priority: Priority) -> None:
+        """
+        Wait, in priority order, until fewer than max_streams streams of model are open.
+        """
+        state = self._state(model)
+        ticket = (priority, next(self._tickets))
+        async with state.changed:
+            heapq.heappush(state.stream_waiters, ticket)
+            try:
+                await state.changed.wait_for(
+                    lambda: state.stream_waiters[0] == ticket
+                    and state.streams < self.max_streams
+                )
+            finally:
+                state.stream_waiters.remove(ticket)
+                heapq.heapify(state.stream_waiters)
+                state.changed.notify_all()
+            state.streams += 1
+
+    async def _close_stream(self, model: str) -> None:
+        state = self._state(model)
+        async with state.changed:
+            state.streams -= 1
+            state.changed.notify_all()
+
+    def record_headers(self, model: str, headers: httpx.Headers, status: int) -> None:
+        """
+        Update the buckets of model from the rate-limit headers of a response.
+        """
+        state = self._state(model)
+        state.requests.update(
+            headers.get("x-ratelimit-limit-requests"),
+            headers.get("x-ratelimit-remaining-requests"),
+            _parse_duration(headers.get("x-ratelimit-reset-requests")),
+        )
+        state.tokens.update(
+            headers.get("x-ratelimit-limit-tokens"),
+            headers.get("x-ratelimit-remaining-tokens"),
+            _parse_duration(headers.get("x-ratelimit-reset-tokens")),
+        )
+        if status == 429:
+            retry_after = _parse_duration(headers.get("retry-after")) or 1
+            state.blocked_until = max(
+                state.blocked_until, time.monotonic() + retry_after
+            )
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, "response", None)
+        retry_after = None
+        if response is not None:
+            retry_after = _parse_duration(response.headers.get("retry-after"))
+        ceiling = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2**attempt)
+        return max(retry_after or 0, random.uniform(0, ceiling))
+
+    async def call(
+        self,
+        model: str,
+        priority: Priority,
+        request: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+    ) -> T:
+        """
+        Run request once admitted, retrying rate-limited and transient failures.
+        tokens is the estimated token cost of the request, see estimate_tokens.
+        """
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self._acquire(model, priority, tokens)
+            try:
+                return await request()
+            except _RETRYABLE_ERRORS as e:
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                backoff = self._backoff(attempt, e)
+                logger.warning(
+                    f"LLM request to {model} failed with {type(e).__name__}, retrying in {backoff:.2f}s."
+                )
+            finally:
+                await self._release(model)
+            await asyncio.sleep(backoff)
+
+    async def stream(
+        self,
+        model: str,
+        priority: Priority,
+        request: Callable[[], AsyncIterator[T]],
+        tokens: int = 0,
+    ) -> AsyncIterator[T]:
+        """
+        Yield from the stream returned by request.
+        The stream holds one of max_streams stream slots until it ends. Its concurrency slot
+        is only held until the first item arrives: rate limits count requests and tokens,
+        not open streams, so a long reply doesn't hold up other calls.
+        Failures are retried only until the first item has been yielded.
+        """
+        await self._open_stream(model, priority)
+        try:
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                started = False
+                await self._acquire(model, priority, tokens)
+                try:
+                    async for item in request():
+                        if not started:
+                            started = True
+                            await self._release(model)
+                        yield item
+                    return
+                except _RETRYABLE_ERRORS as e:
+                    if started or attempt == LLM_MAX_RETRIES:
+                        raise
+                    backoff = self._backoff(attempt, e)
+                    logger.warning(
+                        f"LLM stream from {model} failed with {type(e).__name__}, retrying in {backoff:.2f}s."
+                    )
+                finally:
+                    if not started:
+                        await self._release(model)
+                await asyncio.sleep(backoff)
+        finally:
+            await self._close_stream(model)
+
+
+def estimate_tokens(messages: list[dict], max_tokens: Optional[int] = None) -> int:
+    """
+    Token cost the provider's token limit charges a request with: its prompt plus max_tokens.
+    """
+    prompt_tokens = sum(
+        count_tokens(message["content"])
+        for message in messages
+        if isinstance(message.get("content"), str)
+    )
+    return prompt_tokens + (max_tokens or 0)
+
+
+llm_scheduler = LLMScheduler()
+
+
+async def record_rate_limit_headers(response: httpx.Response) -> None:
+    """
+    httpx response hook feeding the scheduler with the rate-limit headers of every API response.
+    """
+    try:
+        model = json.loads(response.request.content).get("model")
+    except (ValueError, AttributeError, httpx.RequestNotRead):
+        return
+    if model:
+        llm_scheduler.record_headers(model, response.headers, response.status_code)
+
+
+async def create_chat_completion(
+    client: openai.AsyncOpenAI, priority: Priority = Priority.STANDARD, **params
+):
+    """
+    client.chat.completions.create(**params) through the scheduler.
+    """
+    return await llm_scheduler.call(
+        params["model"],
+        priority,
+        lambda: client.chat.completions.create(**params),
+        tokens=estimate_tokens(params["messages"], params.get("max_tokens")),
+    )
@@ -1,10 +1,9 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel
-from typing import Optional, TypedDict, Dict, Any
+from typing import AsyncIterator, Optional, TypedDict, Dict, Any
 from .openai_chat_base import OpenAIBase
-from fastapi.responses import StreamingResponse
-from fastapi.responses import StreamingResponse
 from .base_assistant import BaseAssistant
+from .prompt_templates import render_prompt
 
 
 class QuestionModel(BaseModel):
@@ -22,8 +21,8 @@ class ResponseModel(BaseModel):
 
 
 prompt_map = {
-    "onboarding_assessment": "services/prompts/onboarding_assessment.txt",
-    "summarize_onboarding_assessment": "services/prompts/summarize_onboarding_assessment.txt",
+    "onboarding_assessment": "onboarding_assessment",
+    "summarize_onboarding_assessment": "summarize_onboarding_assessment",
 }
 
 
@@ -32,15 +31,18 @@ class OnboardingPurposeData(TypedDict):
 
 
 class OnboardingAssistant(BaseAssistant):
-    def __init__(self, client: OpenAI):
-        self.client = OpenAIBase(client)
+    response_model = ResponseModel
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.client = OpenAIBase(async_client=client)
 
     async def chat(
         self,
         chat_history: list[dict],
         user_message: str,
         purpose_data: OnboardingPurposeData,
-    ) -> StreamingResponse:
+        user_memories: Optional[str] = None,
+    ) -> tuple[AsyncIterator[ResponseModel], Optional[str]]:
         """
         Process a chat message for onboarding purposes.
 
@@ -51,20 +53,20 @@ class OnboardingAssistant(BaseAssistant):
                 user_profile (Dict[str, Any]): The user's profile information.
 
         Returns:
-            StreamingResponse: The AI's response as a stream.
+            tuple[AsyncIterator[ResponseModel], Optional[str]]: The AI's response as a stream.
+            The system prompt is read on every call, so no system message is returned to persist.
         """
-        with open(prompt_map["onboarding_assessment"], "r") as file:
-            system_message = file.read()
-        response_data = self.client.chat_json_output_stream(
-            chat_history, system_message, user_message, ResponseModel
+        system_message = render_prompt(prompt_map["onboarding_assessment"])
+        response_data = self.client.achat_json_output_stream(
+            chat_history, system_message, user_message, self.response_model
         )
-        return response_data
+        return response_data, None
 
-    def summarize(self, chat_history: list[dict]) -> str:
-        with open(prompt_map["summarize_onboarding_assessment"], "r") as file:
-            system_message = file.read()
-        return self.client.chat_str_output(
+    async def summarize(self, chat_history: list[dict]) -> str:
+        system_message = render_prompt(prompt_map["summarize_onboarding_assessment"])
+        return await self.client.achat_str_output(
             chat_history,
             system_message,
             "Summarize the content as instructed.",
+            cached=True,
         )
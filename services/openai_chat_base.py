@@ -1,39 +1,159 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 import json
 import instructor
 from pydantic import BaseModel
-from typing import Type
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Type
+from .llm_cache import cached_chat_completion
+from .llm_scheduler import (
+    Priority,
+    create_chat_completion,
+    estimate_tokens,
+    llm_scheduler,
+)
+from .llm_clients import get_async_instructor_client, get_async_openai_client
+from .structured_stream import StreamEvent, StructuredStream
+
+
+@lru_cache(maxsize=None)
+def _tool_schema(response_model: Type[BaseModel]) -> dict:
+    return instructor.openai_schema(response_model).openai_schema
 
 
 class OpenAIBase:
-    def __init__(self, client: OpenAI):
-        self.client = client
-        self.instructor_client = instructor.from_openai(client)
+    """
+    Chat helpers over the async OpenAI client.
+    The process-wide client and its instructor wrapper are used unless a client is passed in.
+    """
+
+    def __init__(self, async_client: Optional[AsyncOpenAI] = None):
+        self._async_client = async_client
+        self._async_instructor_client = (
+            instructor.from_openai(async_client) if async_client else None
+        )
         self.model = "gpt-4o-mini"
 
-    def chat_json_output_stream(
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return self._async_client or get_async_openai_client()
+
+    @property
+    def async_instructor_client(self) -> instructor.AsyncInstructor:
+        return self._async_instructor_client or get_async_instructor_client()
+
+    @staticmethod
+    def prepare_response_model(response_model: Type[BaseModel]) -> None:
+        """
+        Build the tool schema and field validators of response_model up front,
+        so the first structured stream for it doesn't pay for them.
+        """
+        _tool_schema(response_model)
+        StructuredStream.prepare(response_model)
+
+    async def _stream_tool_arguments(
+        self, messages: list[dict], response_model: Type[BaseModel]
+    ) -> AsyncIterator[str]:
+        """
+        Request response_model as a forced tool call, as instructor does, and yield the
+        chunks of its JSON arguments.
+        """
+        schema = _tool_schema(response_model)
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            tools=[{"type": "function", "function": schema}],
+            tool_choice={"type": "function", "function": {"name": schema["name"]}},
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.tool_calls:
+                arguments = chunk.choices[0].delta.tool_calls[0].function.arguments
+                if arguments:
+                    yield arguments
+
+    async def _achat_structured(
         self,
         chat_history: list[dict],
         system_message: str,
         user_message: str,
-        response_model: Type[BaseModel],
-    ):
-        response_stream = self.instructor_client.chat.completions.create_partial(
-            model=self.model,
-            response_model=response_model,
-            messages=[
+        structured: StructuredStream,
+        priority: Priority,
+    ) -> AsyncIterator[list[StreamEvent]]:
+        """
+        Feed the streamed reply into structured and yield the events of every chunk that has any.
+        The stream is admitted by the LLM scheduler with priority and holds its slot until it ends.
+        """
+        messages = (
+            [
                 {"role": "system", "content": system_message},
             ]
             + chat_history
-            + [{"role": "user", "content": user_message}],
-            stream=True,
+            + [{"role": "user", "content": user_message}]
         )
-        return response_stream
+        async for arguments in llm_scheduler.stream(
+            self.model,
+            priority,
+            lambda: self._stream_tool_arguments(messages, structured.response_model),
+            tokens=estimate_tokens(messages),
+        ):
+            events = structured.feed(arguments)
+            if events:
+                yield events
 
-    def chat_json_output(
-        self, chat_history: list[dict], system_message: str, user_message: str
+    async def achat_json_output_stream(
+        self,
+        chat_history: list[dict],
+        system_message: str,
+        user_message: str,
+        response_model: Type[BaseModel],
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> AsyncIterator[BaseModel]:
+        """
+        Stream a response_model reply. Iterate it with async for.
+        Yields the response so far after every chunk, unvalidated, and the validated
+        response_model last. A field other than streaming text only appears once complete.
+        """
+        structured = StructuredStream(response_model)
+        async for events in self._achat_structured(
+            chat_history, system_message, user_message, structured, priority
+        ):
+            if events[-1].kind == "done":
+                yield events[-1].value
+            else:
+                yield structured.snapshot()
+
+    async def achat_json_output_events(
+        self,
+        chat_history: list[dict],
+        system_message: str,
+        user_message: str,
+        response_model: Type[BaseModel],
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Like achat_json_output_stream, but yields field-level events: text appended to a
+        string field, each field once it is complete and validated, and the model when done.
+        """
+        async for events in self._achat_structured(
+            chat_history,
+            system_message,
+            user_message,
+            StructuredStream(response_model),
+            priority,
+        ):
+            for event in events:
+                yield event
+
+    async def achat_json_output(
+        self,
+        chat_history: list[dict],
+        system_message: str,
+        user_message: str,
+        priority: Priority = Priority.STANDARD,
     ) -> dict:
-        response = self.client.chat.completions.create(
+        response = await create_chat_completion(
+            self.async_client,
+            priority,
             model=self.model,
             response_format={"type": "json_object"},
             messages=[
@@ -44,16 +164,37 @@ class OpenAIBase:
         )
         return json.loads(response.choices[0].message.content)
 
-    def chat_str_output(
-        self, chat_history: list[dict], system_message: str, user_message: str
+    async def achat_str_output(
+        self,
+        chat_history: list[dict],
+        system_message: str,
+        user_message: str,
+        cached: bool = False,
+        priority: Priority = Priority.STANDARD,
     ) -> str:
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
+        """
+        With cached=True the response is served from the LLM response cache when the
+        same messages were completed before.
+        """
+        messages = (
+            [
                 {"role": "system", "content": system_message},
             ]
             + chat_history
-            + [{"role": "user", "content": user_message}],
+            + [{"role": "user", "content": user_message}]
+        )
+        if cached:
+            return await cached_chat_completion(
+                self.async_client,
+                model=self.model,
+                messages=messages,
+                priority=priority,
+            )
+        response = await create_chat_completion(
+            self.async_client,
+            priority,
+            model=self.model,
+            messages=messages,
         )
 
         return response.choices[0].message.content
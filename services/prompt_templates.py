@@ -0,0 +1,121 @@
+from dotenv import load_dotenv
+import os
+import re
+import threading
+import logging
+
+# Load .env file
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+_ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT_DIRECTORIES = ["prompts", "services/prompts", "routers/helpers/prompts"]
+
+# Prompts use both {name} and {%name%} slots. JSON examples such as {"key": ...} never match.
+_PLACEHOLDER = re.compile(r"\{%(\w+)%\}|\{(\w+)\}")
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+class PromptTemplate:
+    """
+    A prompt file split once into literal text and named slots, rendered in a single pass.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._load()
+
+    def _load(self) -> None:
+        self.mtime = os.path.getmtime(self.path)
+        with open(self.path, "r") as file:
+            text = file.read()
+        self._literals = []
+        self._slots = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(text):
+            self._literals.append(text[position : match.start()])
+            self._slots.append(match.group(1) or match.group(2))
+            position = match.end()
+        self._literals.append(text[position:])
+        self.slots = frozenset(self._slots)
+
+    def reload_if_changed(self) -> None:
+        if os.path.getmtime(self.path) != self.mtime:
+            self._load()
+            logger.info(f"Reloaded prompt template {self.path}")
+
+    def matches(self, text: str) -> bool:
+        """
+        Whether text can be a rendering of this template: its literal parts appear in order.
+        """
+        if not text.startswith(self._literals[0]):
+            return False
+        position = len(self._literals[0])
+        for literal in self._literals[1:]:
+            position = text.find(literal, position)
+            if position == -1:
+                return False
+            position += len(literal)
+        return True
+
+    def render(self, **values: str) -> str:
+        """
+        Fill every slot with its value. Missing or unknown slot names raise a ValueError.
+        """
+        missing = self.slots - values.keys()
+        unknown = values.keys() - self.slots
+        if missing or unknown:
+            raise ValueError(
+                f"Prompt template {self.path} expects slots {sorted(self.slots)}, "
+                f"missing: {sorted(missing)}, unknown: {sorted(unknown)}"
+            )
+        parts = [self._literals[0]]
+        for slot, literal in zip(self._slots, self._literals[1:]):
+            parts.append(values[slot])
+            parts.append(literal)
+        return "".join(parts)
+
+
+def _reload_enabled() -> bool:
+    return os.getenv("PROMPT_TEMPLATES_RELOAD", "false").lower() == "true"
+
+
+def load_prompt_templates() -> None:
+    """
+    Load and parse every prompt file, keyed by its file name without extension.
+    """
+    templates = {}
+    for directory in PROMPT_DIRECTORIES:
+        directory_path = os.path.join(_ROOT_DIRECTORY, directory)
+        for file_name in sorted(os.listdir(directory_path)):
+            name, extension = os.path.splitext(file_name)
+            if extension != ".txt":
+                continue
+            if name in templates:
+                raise ValueError(f"Duplicate prompt template name: {name}")
+            templates[name] = PromptTemplate(os.path.join(directory_path, file_name))
+    with _templates_lock:
+        _templates.clear()
+        _templates.update(templates)
+    logger.info(f"Loaded {len(templates)} prompt templates.")
+
+
+def get_prompt_template(name: str) -> PromptTemplate:
+    """
+    Return the template for name, loading the registry on first use.
+    With PROMPT_TEMPLATES_RELOAD=true the file is re-read whenever its mtime changes.
+    """
+    if not _templates:
+        load_prompt_templates()
+    template = _templates[name]
+    if _reload_enabled():
+        with _templates_lock:
+            template.reload_if_changed()
+    return template
+
+
+def render_prompt(name: str, **values: str) -> str:
+    return get_prompt_template(name).render(**values)
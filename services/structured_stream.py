@@ -0,0 +1,259 @@
+import json
+from typing import Any, Iterator, NamedTuple, Optional, Type
+from pydantic import BaseModel, TypeAdapter
+
+_WHITESPACE = " \t\r\n"
+
+
+class StreamEvent(NamedTuple):
+    """
+    kind is "text" (value is text appended to the string field), "field" (value is the
+    validated value of a field that just completed) or "done" (value is the validated model).
+    """
+
+    kind: str
+    field: Optional[str]
+    value: Any
+
+
+class IncrementalObjectParser:
+    """
+    Parses a JSON object arriving in chunks, keeping its state between chunks so every
+    character is only looked at once.
+    Yields ("text", key, delta) while a top-level string value streams in, ("value", key, value)
+    when a top-level value completes and ("end", None, None) when the object closes.
+    Nested objects and arrays are only decoded once they are complete.
+    """
+
+    def __init__(self):
+        self.state = "object"
+        self.key = None
+        self.raw = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        # Start of an escape sequence in a string value that continues in the next chunk.
+        self.pending_escape = ""
+        self.text = []
+
+    def feed(self, chunk: str) -> Iterator[tuple]:
+        i = 0
+        n = len(chunk)
+        while i < n:
+            state = self.state
+            if state == "string":
+                i = yield from self._feed_string(chunk, i)
+                continue
+            c = chunk[i]
+            if state in ("raw", "scalar", "key"):
+                i = yield from self._feed_raw(chunk, i)
+                continue
+            i += 1
+            if c in _WHITESPACE:
+                continue
+            if state == "object":
+                if c != "{":
+                    raise ValueError(f"Expected a JSON object, got {c!r}")
+                self.state = "key_or_end"
+            elif state == "key_or_end":
+                if c == '"':
+                    self.state = "key"
+                    self.raw = [c]
+                    self.in_string = True
+                elif c == "}":
+                    self.state = "done"
+                    yield ("end", None, None)
+                elif c != ",":
+                    raise ValueError(f"Expected a key, got {c!r}")
+            elif state == "colon":
+                if c != ":":
+                    raise ValueError(f"Expected ':', got {c!r}")
+                self.state = "value"
+            elif state == "value":
+                if c == '"':
+                    self.state = "string"
+                    self.text = []
+                elif c in "{[":
+                    self.state = "raw"
+                    self.raw = [c]
+                    self.depth = 1
+                else:
+                    self.state = "scalar"
+                    self.raw = [c]
+            elif state == "after_value":
+                if c == ",":
+                    self.state = "key_or_end"
+                elif c == "}":
+                    self.state = "done"
+                    yield ("end", None, None)
+                else:
+                    raise ValueError(f"Expected ',' or '}}', got {c!r}")
+            elif state == "done":
+                raise ValueError(f"Unexpected {c!r} after the end of the object")
+
+    def current_text(self) -> str:
+        """
+        Text of the string value being streamed so far.
+        """
+        # Joined pieces are kept as one, so repeated calls only copy the text once each.
+        text = "".join(self.text)
+        self.text = [text]
+        return text
+
+    def _feed_string(self, chunk: str, i: int):
+        """
+        Stream the text of a string value up to its closing quote or the end of chunk.
+        """
+        n = len(chunk)
+        if self.pending_escape:
+            i = yield from self._feed_escape(chunk, i)
+            if self.pending_escape:
+                return i
+        while i < n:
+            quote = chunk.find('"', i)
+            backslash = chunk.find("\\", i, quote if quote != -1 else n)
+            end = backslash if backslash != -1 else quote if quote != -1 else n
+            if end > i:
+                self.text.append(chunk[i:end])
+                yield ("text", self.key, chunk[i:end])
+            i = end
+            if backslash != -1:
+                self.pending_escape = "\\"
+                i = yield from self._feed_escape(chunk, i + 1)
+                if self.pending_escape:
+                    return i
+            elif quote != -1:
+                self.state = "after_value"
+                yield ("value", self.key, "".join(self.text))
+                return quote + 1
+        return i
+
+    @staticmethod
+    def _escape_length(escape: str) -> int:
+        if len(escape) < 2 or escape[1] != "u":
+            return 2
+        if len(escape) < 6:
+            return 6
+        # A high surrogate is only decoded together with the low surrogate escape after it.
+        if 0xD800 <= int(escape[2:6], 16) < 0xDC00:
+            return 12
+        return 6
+
+    def _feed_escape(self, chunk: str, i: int):
+        """
+        Complete pending_escape from chunk and stream the character it stands for.
+        """
+        escape = self.pending_escape
+        while len(escape) < self._escape_length(escape):
+            if i >= len(chunk):
+                self.pending_escape = escape
+                return i
+            take = chunk[i : i + self._escape_length(escape) - len(escape)]
+            escape += take
+            i += len(take)
+        self.pending_escape = ""
+        text = json.loads(f'"{escape}"')
+        self.text.append(text)
+        yield ("text", self.key, text)
+        return i
+
+    def _feed_raw(self, chunk: str, i: int):
+        """
+        Collect a key, a nested value or a scalar up to where it ends.
+        """
+        n = len(chunk)
+        start = i
+        while i < n:
+            c = chunk[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.state == "key":
+                        self.raw.append(chunk[start : i + 1])
+                        self.key = json.loads("".join(self.raw))
+                        self.state = "colon"
+                        return i + 1
+            elif self.state == "scalar":
+                if c in _WHITESPACE or c in ",}":
+                    self.raw.append(chunk[start:i])
+                    self.state = "after_value"
+                    yield ("value", self.key, json.loads("".join(self.raw)))
+                    return i
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.raw.append(chunk[start : i + 1])
+                    self.state = "after_value"
+                    yield ("value", self.key, json.loads("".join(self.raw)))
+                    return i + 1
+            i += 1
+        self.raw.append(chunk[start:i])
+        return i
+
+
+class StructuredStream:
+    """
+    Builds response_model from streamed JSON chunks.
+    Fields are validated one at a time when they complete, and the whole model once at the end,
+    so the work per chunk doesn't grow with the length of the response.
+    """
+
+    _adapters = {}
+
+    def __init__(self, response_model: Type[BaseModel]):
+        self.response_model = response_model
+        self.parser = IncrementalObjectParser()
+        self.values = {}
+        self._empty = response_model.model_construct()
+
+    @classmethod
+    def _adapter(cls, response_model: Type[BaseModel], field: str) -> TypeAdapter:
+        key = (response_model, field)
+        if key not in cls._adapters:
+            annotation = response_model.model_fields[field].annotation
+            cls._adapters[key] = TypeAdapter(annotation)
+        return cls._adapters[key]
+
+    @classmethod
+    def prepare(cls, response_model: Type[BaseModel]) -> None:
+        """
+        Build the field validators of response_model ahead of its first stream.
+        """
+        for field in response_model.model_fields:
+            cls._adapter(response_model, field)
+
+    def _validate(self, field: str, value: Any) -> Any:
+        if field not in self.response_model.model_fields:
+            return value
+        return self._adapter(self.response_model, field).validate_python(value)
+
+    def feed(self, chunk: str) -> list[StreamEvent]:
+        events = []
+        for kind, field, value in self.parser.feed(chunk):
+            if kind == "text":
+                events.append(StreamEvent("text", field, value))
+            elif kind == "value":
+                self.values[field] = self._validate(field, value)
+                events.append(StreamEvent("field", field, self.values[field]))
+            else:
+                model = self.response_model.model_validate(self.values)
+                events.append(StreamEvent("done", None, model))
+        return events
+
+    def snapshot(self) -> BaseModel:
+        """
+        The response so far, without validation. A string field that is still streaming
+        holds its text so far; other incomplete fields are left at their defaults.
+        """
+        values = dict(self.values)
+        if self.parser.state == "string":
+            values[self.parser.key] = self.parser.current_text()
+        return self._empty.model_copy(update=values)
@@ -0,0 +1,41 @@
+import logging
+import threading
+import traceback
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Encoding used by the gpt-4o family.
+ENCODING_NAME = "o200k_base"
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    Load the tokenizer once. tiktoken fetches the encoding file on first use,
+    so a host without access to it falls back to an estimate instead of failing requests.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    _encoding = tiktoken.get_encoding(ENCODING_NAME)
+                except Exception as e:
+                    _encoding_failed = True
+                    logger.error(
+                        f"Error loading the {ENCODING_NAME} tokenizer, token counts are estimated: {str(e)}"
+                    )
+                    logger.error(traceback.format_exc())
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        # roughly four characters per token for English text and JSON
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
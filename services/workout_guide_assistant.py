@@ -1,9 +1,9 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel
-from typing import TypedDict, Optional
+from typing import AsyncIterator, TypedDict, Optional
 from .openai_chat_base import OpenAIBase
-from fastapi.responses import StreamingResponse
 from .base_assistant import BaseAssistant
+from .prompt_templates import render_prompt
 import json
 from datetime import datetime
 from routers.helpers.generate_plan_helpers import _get_weekly_training_plan_internal
@@ -30,13 +30,15 @@ class WorkoutGuidePurposeData(TypedDict):
 
 
 prompt_map = {
-    "workout_guide_checkin_chat": "services/prompts/workout_guide_chat.txt",
+    "workout_guide_checkin_chat": "workout_guide_chat",
 }
 
 
 class WorkoutGuideAssistant(BaseAssistant):
-    def __init__(self, client: OpenAI):
-        self.client = OpenAIBase(client)
+    response_model = ResponseModel
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.client = OpenAIBase(async_client=client)
 
     async def chat(
         self,
@@ -44,7 +46,7 @@ class WorkoutGuideAssistant(BaseAssistant):
         user_message: str,
         purpose_data: WorkoutGuidePurposeData,
         user_memories: Optional[str] = None,
-    ) -> tuple[StreamingResponse, Optional[str]]:
+    ) -> tuple[AsyncIterator[ResponseModel], Optional[str]]:
         """
         Process a chat message for the workout guide assistant.
 
@@ -56,27 +58,25 @@ class WorkoutGuideAssistant(BaseAssistant):
                 user_email (str): The email of the user.
 
         Returns:
-            tuple[StreamingResponse, Optional[str]]: The AI's response as a stream and the system message if it's a new conversation.
+            tuple[AsyncIterator[ResponseModel], Optional[str]]: The AI's response as a stream and the system message if it's a new conversation.
         """
         system_message = None
         is_new_conversation = not chat_history
 
         if is_new_conversation:
-            with open(prompt_map["workout_guide_checkin_chat"], "r") as file:
-                system_message = file.read()
             training_plan = await self._retrieve_training_plan(
                 purpose_data["workout_date"], purpose_data["user_email"]
             )
-            system_message = system_message.replace(
-                "{%weekly_workout_plan%}",
-                json.dumps(training_plan),
+            system_message = render_prompt(
+                prompt_map["workout_guide_checkin_chat"],
+                weekly_workout_plan=json.dumps(training_plan),
             )
         elif chat_history[0]["role"] == "system":
             system_message = chat_history[0]["content"]
             chat_history = chat_history[1:]
 
-        response_data = self.client.chat_json_output_stream(
-            chat_history, system_message, user_message, ResponseModel
+        response_data = self.client.achat_json_output_stream(
+            chat_history, system_message, user_message, self.response_model
         )
 
         return response_data, system_message if is_new_conversation else None
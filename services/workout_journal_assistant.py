@@ -1,9 +1,9 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel
-from typing import TypedDict, Optional
+from typing import AsyncIterator, TypedDict, Optional
 from .openai_chat_base import OpenAIBase
-from fastapi.responses import StreamingResponse
 from .base_assistant import BaseAssistant
+from .prompt_templates import render_prompt
 import json
 from datetime import datetime
 from routers.helpers.generate_plan_helpers import _get_weekly_training_plan_internal
@@ -30,14 +30,16 @@ class WorkoutJournalPurposeData(TypedDict):
 
 
 prompt_map = {
-    "workout_journal_checkin_chat": "services/prompts/workout_journal_checkin_chat.txt",
-    "workout_journal_checkin_summarize": "services/prompts/workout_journal_checkin_summarize.txt",
+    "workout_journal_checkin_chat": "workout_journal_checkin_chat",
+    "workout_journal_checkin_summarize": "workout_journal_checkin_summarize",
 }
 
 
 class WorkoutJournalAssistant(BaseAssistant):
-    def __init__(self, client: OpenAI):
-        self.client = OpenAIBase(client)
+    response_model = ResponseModel
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.client = OpenAIBase(async_client=client)
 
     async def chat(
         self,
@@ -45,7 +47,7 @@ class WorkoutJournalAssistant(BaseAssistant):
         user_message: str,
         purpose_data: WorkoutJournalPurposeData,
         user_memories: Optional[str] = None,
-    ) -> tuple[StreamingResponse, Optional[str]]:
+    ) -> tuple[AsyncIterator[ResponseModel], Optional[str]]:
         """
         Process a chat message for workout journaling.
 
@@ -57,25 +59,21 @@ class WorkoutJournalAssistant(BaseAssistant):
                 user_email (str): The email of the user.
 
         Returns:
-            tuple[StreamingResponse, Optional[str]]: The AI's response as a stream and the system message if it's a new conversation.
+            tuple[AsyncIterator[ResponseModel], Optional[str]]: The AI's response as a stream and the system message if it's a new conversation.
         """
 
         system_message = None
         is_new_conversation = not chat_history
 
         if is_new_conversation:
-            with open(prompt_map["workout_journal_checkin_chat"], "r") as file:
-                system_message = file.read()
             training_plan = await self._retrieve_training_plan(
                 datetime.strptime(purpose_data["workout_date"], "%Y-%m-%d"),
                 purpose_data["user_email"],
             )
-            system_message = system_message.replace(
-                "{%weekly_workout_plan%}",
-                json.dumps(training_plan),
-            )
-            system_message = system_message.replace(
-                "{%current_date%}", purpose_data["workout_date"]
+            system_message = render_prompt(
+                prompt_map["workout_journal_checkin_chat"],
+                weekly_workout_plan=json.dumps(training_plan),
+                current_date=purpose_data["workout_date"],
             )
             # Initial message isn't initiated by the user.
             user_message = "Let's start the daily workout check-in"
@@ -83,8 +81,8 @@ class WorkoutJournalAssistant(BaseAssistant):
             system_message = chat_history[0]["content"]
             chat_history = chat_history[1:]
 
-        response_data = self.client.chat_json_output_stream(
-            chat_history, system_message, user_message, ResponseModel
+        response_data = self.client.achat_json_output_stream(
+            chat_history, system_message, user_message, self.response_model
         )
         return response_data, system_message if is_new_conversation else None
 
@@ -95,18 +93,15 @@ class WorkoutJournalAssistant(BaseAssistant):
         Summarize the daily workout and checkin.
         Based on weekly_training_plan and chat_history between user and assistant.
         """
-        with open(prompt_map["workout_journal_checkin_summarize"], "r") as file:
-            system_message = file.read()
-
         workout_journal_data = await self._retrieve_training_plan(
             datetime.strptime(date, "%Y-%m-%d"), user_email
         )
-        system_message = system_message.replace(
-            "{%workout_journal_data%}",
-            json.dumps(workout_journal_data),
+        system_message = render_prompt(
+            prompt_map["workout_journal_checkin_summarize"],
+            workout_journal_data=json.dumps(workout_journal_data),
+            current_date=date,
         )
-        system_message = system_message.replace("{%current_date%}", date)
-        return self.client.chat_str_output(
+        return await self.client.achat_str_output(
             chat_history,
             system_message,
             "Summarize the content as instructed.",
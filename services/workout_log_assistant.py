@@ -1,9 +1,9 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Optional, Dict, Any
 from .openai_chat_base import OpenAIBase
-from fastapi.responses import StreamingResponse
 from .base_assistant import BaseAssistant
+from .prompt_templates import render_prompt
 import json
 from datetime import datetime
 from routers.user_profile import get_user_id_internal
@@ -24,13 +24,15 @@ class ResponseModel(BaseModel):
 
 
 prompt_map = {
-    "workout_log_chat": "services/prompts/workout_log_chat.txt",
+    "workout_log_chat": "workout_log_chat",
 }
 
 
 class WorkoutLogAssistant(BaseAssistant):
-    def __init__(self, client: OpenAI):
-        self.client = OpenAIBase(client)
+    response_model = ResponseModel
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.client = OpenAIBase(async_client=client)
 
     async def chat(
         self,
@@ -38,7 +40,7 @@ class WorkoutLogAssistant(BaseAssistant):
         user_message: str,
         purpose_data: Optional[Dict[str, Any]] = None,
         user_memories: Optional[str] = None,
-    ) -> tuple[StreamingResponse, Optional[str]]:
+    ) -> tuple[AsyncIterator[ResponseModel], Optional[str]]:
         """
         Process a chat message for the workout guide assistant.
 
@@ -50,23 +52,20 @@ class WorkoutLogAssistant(BaseAssistant):
                 user_email (str): The email of the user.
 
         Returns:
-            tuple[StreamingResponse, Optional[str]]: The AI's response as a stream and the system message if it's a new conversation.
+            tuple[AsyncIterator[ResponseModel], Optional[str]]: The AI's response as a stream and the system message if it's a new conversation.
         """
         system_message = None
         is_new_conversation = not chat_history
 
         if is_new_conversation:
-            with open(prompt_map["workout_log_chat"], "r") as file:
-                system_message = file.read()
-                if user_memories:
-                    system_message = system_message.replace(
-                        "{instructions}", user_memories
-                    )
+            system_message = render_prompt(
+                prompt_map["workout_log_chat"], instructions=user_memories or ""
+            )
         elif chat_history[0]["role"] == "system":
             system_message = chat_history[0]["content"]
             chat_history = chat_history[1:]
-        response_data = self.client.chat_json_output_stream(
-            chat_history, system_message, user_message, ResponseModel
+        response_data = self.client.achat_json_output_stream(
+            chat_history, system_message, user_message, self.response_model
         )
 
         return response_data, system_message if is_new_conversation else None
@@ -0,0 +1,199 @@
+import asyncio
+import functools
+import os
+import sys
+from datetime import datetime
+from contextlib import asynccontextmanager
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EMAIL = "synthetic@example.com"
+USER_ID = "synthetic-user"
+
+
+class AsyncCursor:
+    """
+    Motor-style cursor over a mongomock cursor.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, count):
+        self.cursor = self.cursor.limit(count)
+        return self
+
+    def skip(self, count):
+        self.cursor = self.cursor.skip(count)
+        return self
+
+    def __aiter__(self):
+        self.iterator = iter(self.cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return list(self.cursor)
+
+
+class AsyncCollection:
+    """
+    Motor-style collection over a mongomock collection. Sessions are accepted and ignored.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        return AsyncCursor(iter(self.collection.aggregate(pipeline)))
+
+    async def find_one(
+        self, query=None, projection=None, *args, session=None, **kwargs
+    ):
+        """
+        find_one with the positional projection ("array.$": 1) mongomock lacks, for
+        queries matching array elements by equality.
+        """
+        await asyncio.sleep(0)
+        positional = [key for key in projection or {} if key.endswith(".$")]
+        if not positional:
+            return self.collection.find_one(query, projection, *args, **kwargs)
+        projection = {k: v for k, v in projection.items() if k not in positional}
+        for key in positional:
+            projection[key[:-2]] = 1
+        document = self.collection.find_one(query, projection, *args, **kwargs)
+        if document is None:
+            return None
+        for key in positional:
+            field = key[:-2]
+            conditions = {
+                name[len(field) + 1 :]: value
+                for name, value in query.items()
+                if name.startswith(field + ".")
+            }
+            document[field] = [
+                element
+                for element in document.get(field, [])
+                if all(element.get(k) == v for k, v in conditions.items())
+            ][:1]
+        return document
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, session=None, **kwargs):
+            # Give other tasks a turn, as a round trip to the server would.
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.database[name])
+
+
+class _Session:
+    @asynccontextmanager
+    async def start_transaction(self):
+        yield
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class _AsyncClient:
+    async def start_session(self):
+        return _Session()
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """
+    In-memory stand-in for MongoDB behind AsyncDbOperations and DbOperations.
+    Yields the sync mongomock database so tests can seed and inspect collections.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    from db import async_db_operations, db_operations, mongo_client
+
+    database = mongomock.MongoClient()["fitness-plans"]
+    monkeypatch.setattr(
+        async_db_operations, "get_async_database", lambda: AsyncDatabase(database)
+    )
+    monkeypatch.setattr(db_operations, "get_database", lambda: database)
+    monkeypatch.setattr(mongo_client, "get_async_mongo_client", _AsyncClient)
+    monkeypatch.setattr(mongo_client, "_transactions_supported", False)
+    monkeypatch.delenv("MONGODB_TRANSACTIONS", raising=False)
+    return database
+
+
+@pytest.fixture
+def client(mongo, monkeypatch):
+    """
+    The app with LLM_BACKEND=synthetic, answering without delay, and a seeded user.
+    """
+    from authorization import user_or_admin_required
+    from main import app
+    from services import llm_backends, llm_clients
+    from services.llm_backends import SyntheticTransport
+
+    monkeypatch.setattr(llm_backends, "LLM_BACKEND", "synthetic")
+    monkeypatch.setattr(
+        llm_backends,
+        "SyntheticTransport",
+        functools.partial(SyntheticTransport, ttft_ms=0, tokens_per_second=1e6),
+    )
+    monkeypatch.setattr(llm_clients, "_async_client", None)
+    monkeypatch.setattr(llm_clients, "_async_instructor_client", None)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    app.dependency_overrides[user_or_admin_required] = lambda: {
+        "email": EMAIL,
+        "role": "user",
+    }
+
+    mongo["user-profiles"].insert_one({"email": EMAIL, "user_id": USER_ID})
+    mongo["user-details"].insert_one(
+        {"user_id": USER_ID, "personalInfo": {"name": "Sam"}, "memories": []}
+    )
+    year = str(datetime.now().year)
+    mongo["training-plans"].insert_one(
+        {"user_id": USER_ID, "training_plan": {year: {}}}
+    )
+    mongo["chat-history"].insert_one(
+        {"chat_id": "chat", "user_id": USER_ID, "message_count": 2}
+    )
+    mongo["chat-message-buckets"].insert_one(
+        {
+            "chat_id": "chat",
+            "bucket": 0,
+            "user_id": USER_ID,
+            "messages": [
+                {"role": "user", "content": "I ran 5k today.", "index": 0},
+                {"role": "assistant", "content": "Nice run!", "index": 1},
+            ],
+        }
+    )
+    yield TestClient(app)
+    app.dependency_overrides.clear()
@@ -0,0 +1,42 @@
+from enums import ChatPurpose
+from services import openai_chat_base
+from services.assistant_registry import get_assistant_registry
+from services.workout_log_assistant import WorkoutLogAssistant
+
+MESSAGE = {"message": "I ran 5k this morning.", "purpose": "workout_log"}
+
+
+def test_chat_uses_the_registered_assistant(client, monkeypatch):
+    registered = get_assistant_registry().get(ChatPurpose.WORKOUT_LOG).assistant
+    answered_by = []
+    clients_built = []
+    chat = WorkoutLogAssistant.chat
+    base_init = openai_chat_base.OpenAIBase.__init__
+
+    async def recording_chat(self, *args, **kwargs):
+        answered_by.append(self)
+        return await chat(self, *args, **kwargs)
+
+    def counting_init(self, *args, **kwargs):
+        clients_built.append(self)
+        base_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(WorkoutLogAssistant, "chat", recording_chat)
+    monkeypatch.setattr(openai_chat_base.OpenAIBase, "__init__", counting_init)
+
+    for _ in range(3):
+        response = client.post("/chat/chat", json=MESSAGE | {"chat_id": "chat"})
+        assert response.status_code == 200, response.text
+
+    assert len(answered_by) == 3
+    assert all(assistant is registered for assistant in answered_by)
+    # No assistant, and so no OpenAIBase or instructor client, is built per request.
+    assert clients_built == []
+
+
+def test_unregistered_purpose_is_rejected(client):
+    response = client.post(
+        "/chat/chat", json={"message": "Hi", "purpose": ChatPurpose.GENERAL.value}
+    )
+
+    assert response.status_code == 400
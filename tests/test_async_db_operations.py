@@ -0,0 +1,98 @@
+import asyncio
+import pathlib
+from db import async_db_operations
+from db.async_db_operations import AsyncDbOperations
+from conftest import AsyncCollection
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+class _PendingCollection(AsyncCollection):
+    """
+    Holds every find_one in flight, as a slow round trip would, until release is set.
+    """
+
+    def __init__(self, collection):
+        super().__init__(collection)
+        self.pending = 0
+        self.release = asyncio.Event()
+
+    async def find_one(self, *args, **kwargs):
+        self.pending += 1
+        await self.release.wait()
+        return await super().find_one(*args, **kwargs)
+
+
+async def _until(condition, timeout: float = 5) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_routers_do_not_use_the_blocking_data_layer():
+    sources = (ROOT / "routers").rglob("*.py")
+    offenders = [
+        str(path.relative_to(ROOT))
+        for path in sources
+        if "db.db_operations" in path.read_text()
+    ]
+    assert offenders == []
+
+
+def test_other_tasks_progress_while_a_read_is_pending(mongo, monkeypatch):
+    mongo["user-profiles"].insert_one({"email": "sam@example.com", "user_id": "sam"})
+    collection = _PendingCollection(mongo["user-profiles"])
+    monkeypatch.setattr(
+        async_db_operations,
+        "get_async_database",
+        lambda: {"user-profiles": collection},
+    )
+
+    async def run():
+        read = asyncio.create_task(
+            AsyncDbOperations("user-profiles").read_one_from_mongodb(
+                {"email": "sam@example.com"}
+            )
+        )
+        # The read only finishes once this task has run while it was pending.
+        await _until(lambda: collection.pending == 1)
+        assert not read.done()
+        collection.release.set()
+        return await asyncio.wait_for(read, 5)
+
+    assert asyncio.run(run())["user_id"] == "sam"
+
+
+def test_concurrent_reads_are_in_flight_together(mongo, monkeypatch):
+    reads = 50
+    mongo["user-profiles"].insert_many(
+        [{"email": f"user{i}@example.com", "user_id": str(i)} for i in range(reads)]
+    )
+    collection = _PendingCollection(mongo["user-profiles"])
+    monkeypatch.setattr(
+        async_db_operations,
+        "get_async_database",
+        lambda: {"user-profiles": collection},
+    )
+
+    async def run():
+        documents = asyncio.gather(
+            *(
+                AsyncDbOperations("user-profiles").read_one_from_mongodb(
+                    {"email": f"user{i}@example.com"}
+                )
+                for i in range(reads)
+            )
+        )
+        await _until(lambda: collection.pending == reads)
+        # Every read reached the server before any of them got a reply.
+        collection.release.set()
+        return await asyncio.wait_for(documents, 5)
+
+    documents = asyncio.run(run())
+
+    assert [document["user_id"] for document in documents] == [
+        str(i) for i in range(reads)
+    ]
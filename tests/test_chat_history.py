@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from db.async_db_operations import AsyncDbOperations
+from tests.conftest import USER_ID
+
+START = datetime(2024, 3, 1, 8, 0)
+
+
+def _seed(mongo, times: list, prefix: str = "chat") -> list[str]:
+    """
+    Insert one chat per time and return the chat ids newest first, ties by _id.
+    """
+    chats = [
+        {"_id": ObjectId(), "chat_id": f"{prefix}-{i}", "user_id": USER_ID, "time": t}
+        for i, t in enumerate(times)
+    ]
+    mongo["chat-history"].insert_many(chats)
+    chats.sort(
+        key=lambda chat: (
+            (
+                datetime.fromisoformat(chat["time"])
+                if isinstance(chat["time"], str)
+                else chat["time"]
+            ),
+            chat["_id"],
+        ),
+        reverse=True,
+    )
+    return [chat["chat_id"] for chat in chats]
+
+
+def _walk(client, limit: int, **params) -> list[list[str]]:
+    """
+    Follow X-Next-Cursor through every page of the year listing.
+    """
+    pages = []
+    cursor = None
+    while True:
+        query = {"year": 2024, "limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/chat/getChatHistoryByYearMonth", params=query)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_cursor_pages_cover_every_chat_once_in_order(client, mongo):
+    expected = _seed(mongo, [START + timedelta(hours=i) for i in range(25)])
+
+    pages = _walk(client, limit=10)
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [chat_id for page in pages for chat_id in page] == expected
+
+
+def test_chats_with_the_same_time_are_split_across_pages_by_id(client, mongo):
+    expected = _seed(mongo, [START] * 7 + [START - timedelta(days=1)] * 2)
+
+    pages = _walk(client, limit=3)
+
+    assert [chat_id for page in pages for chat_id in page] == expected
+    assert pages[2] == expected[-3:]
+
+
+def test_page_that_ends_the_listing_returns_no_cursor(client, mongo):
+    _seed(mongo, [START + timedelta(hours=i) for i in range(6)])
+
+    pages = _walk(client, limit=3)
+
+    # A full last page hands out a cursor, whose page is then empty.
+    assert [len(page) for page in pages] == [3, 3, 0]
+
+
+def test_deep_cursor_page_reads_one_page(client, mongo, monkeypatch):
+    expected = _seed(mongo, [START + timedelta(minutes=i) for i in range(60)])
+    pages = _walk(client, limit=10)
+    limits = []
+    read_many = AsyncDbOperations.read_many_from_mongodb
+
+    def recording_read_many(self, *args, limit=0, **kwargs):
+        limits.append(limit)
+        return read_many(self, *args, limit=limit, **kwargs)
+
+    monkeypatch.setattr(
+        AsyncDbOperations, "read_many_from_mongodb", recording_read_many
+    )
+    response = client.get(
+        "/chat/getChatHistoryByYearMonth",
+        params={"year": 2024, "limit": 10, "offset": 50},
+    )
+    assert response.json() == expected[50:] == pages[5]
+    assert limits == [60, 60]
+
+    # Cursor handed out with the fifth page.
+    cursor = None
+    for _ in range(5):
+        params = {"year": 2024, "limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/chat/getChatHistoryByYearMonth", params=params)
+        cursor = response.headers["X-Next-Cursor"]
+    limits.clear()
+    response = client.get(
+        "/chat/getChatHistoryByYearMonth",
+        params={"year": 2024, "limit": 10, "cursor": cursor},
+    )
+    assert response.json() == expected[50:]
+    assert limits == [10, 10]
+
+
+def test_chats_with_string_times_are_listed_until_migrated(client, mongo):
+    # Every third chat still stores time as an ISO string.
+    times = [START + timedelta(minutes=i) for i in range(20)]
+    times = [t.isoformat() if i % 3 == 0 else t for i, t in enumerate(times)]
+    # Equal times of both types are ordered by _id like any other tie.
+    times += [START + timedelta(minutes=5), (START + timedelta(minutes=5)).isoformat()]
+    expected = _seed(mongo, times)
+
+    pages = _walk(client, limit=4)
+    by_range = client.get(
+        "/chat/getChatHistoryByDateRange",
+        params={"start_date": "2024-03-01", "end_date": "2024-03-01", "limit": 100},
+    ).json()
+
+    assert [chat_id for page in pages for chat_id in page] == expected
+    assert by_range == {"2024-03-01": expected}
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get(
+        "/chat/getChatHistoryByYearMonth",
+        params={"year": 2024, "cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
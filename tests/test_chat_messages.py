@@ -0,0 +1,76 @@
+import asyncio
+from db.chat_messages import (
+    CHAT_BUCKETS_COLLECTION,
+    CHAT_HISTORY_COLLECTION,
+    append_chat_messages,
+    read_chat_document,
+    read_chat_messages,
+)
+from services.conversation_memory import ConversationMemory
+
+
+def _turn(number: int) -> list[dict]:
+    return [
+        {"role": "user", "content": f"question {number}"},
+        {"role": "assistant", "content": f"answer {number}"},
+    ]
+
+
+def _stored_indexes(mongo, chat_id: str) -> list[int]:
+    return sorted(
+        message["index"]
+        for bucket in mongo[CHAT_BUCKETS_COLLECTION].find({"chat_id": chat_id})
+        for message in bucket["messages"]
+    )
+
+
+def test_turns_are_appended_to_buckets(mongo):
+    async def main():
+        for number in range(3):
+            await append_chat_messages("chat", "user", _turn(number), {})
+        document = await read_chat_document("chat")
+        return await read_chat_messages(document, 4)
+
+    tail = asyncio.run(main())
+
+    assert [m["content"] for m in tail] == ["question 2", "answer 2"]
+    assert _stored_indexes(mongo, "chat") == list(range(6))
+
+
+def test_concurrent_turns_move_a_legacy_chat_once(mongo):
+    mongo[CHAT_HISTORY_COLLECTION].insert_one(
+        {
+            "chat_id": "legacy",
+            "user_id": "user",
+            "messages": [{"role": "system", "content": "prompt"}] + _turn(0),
+        }
+    )
+
+    async def main():
+        return await asyncio.gather(
+            append_chat_messages("legacy", "user", _turn(1), {}),
+            append_chat_messages("legacy", "user", _turn(2), {}),
+        )
+
+    counts = asyncio.run(main())
+
+    assert sorted(counts) == [5, 7]
+    assert _stored_indexes(mongo, "legacy") == list(range(7))
+    document = mongo[CHAT_HISTORY_COLLECTION].find_one({"chat_id": "legacy"})
+    assert "messages" not in document
+    assert document["message_count"] == 7
+
+
+def test_window_allows_for_a_count_ahead_of_the_buckets(mongo):
+    # The count was written but the messages weren't, or not yet.
+    mongo[CHAT_HISTORY_COLLECTION].insert_one(
+        {"chat_id": "ahead", "user_id": "user", "message_count": 2}
+    )
+    memory = ConversationMemory("ahead", recent_turns=0, summary_batch_turns=0)
+
+    assert asyncio.run(memory.window()) == []
+    # Nothing to fold until the messages are stored, and no model call is made.
+    asyncio.run(memory.update_summary())
+    assert "summarized_until" not in mongo[CHAT_HISTORY_COLLECTION].find_one(
+        {"chat_id": "ahead"}
+    )
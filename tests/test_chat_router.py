@@ -0,0 +1,181 @@
+import functools
+import json
+from types import SimpleNamespace
+import bson
+import pytest
+from db.chat_messages import CHAT_BUCKET_SIZE
+from routers.chat_router import _ChatDeltaEncoder
+from services import llm_backends, llm_clients
+from services.llm_backends import SyntheticTransport
+from conftest import USER_ID, AsyncCollection
+
+MESSAGE = {"message": "I ran 5k this morning.", "purpose": "workout_log"}
+
+
+def _reassemble(body: str) -> dict:
+    """
+    Rebuild the final response from the server-sent events of a delta stream.
+    """
+    response = {"message": "", "question": None, "complete": False}
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        data = json.loads(fields["data"])
+        if fields["event"] == "start":
+            response["chat_id"] = data["chat_id"]
+        elif fields["event"] == "delta":
+            response["message"] += data["text"]
+        elif fields["event"] == "replace":
+            response["message"] = data["text"]
+        else:
+            response.update(data)
+    return response
+
+
+@pytest.fixture
+def chat(client, monkeypatch):
+    def post(body: dict = MESSAGE, **params) -> str:
+        # A fresh transport with the same seed gives every request the same reply.
+        monkeypatch.setattr(
+            llm_backends,
+            "SyntheticTransport",
+            functools.partial(
+                SyntheticTransport, seed="chat", ttft_ms=0, tokens_per_second=1e6
+            ),
+        )
+        monkeypatch.setattr(llm_clients, "_async_client", None)
+        response = client.post("/chat/chat", params=params, json=body)
+        assert response.status_code == 200, response.text
+        return response.text
+
+    return post
+
+
+def test_full_snapshots_are_the_default(chat):
+    lines = chat().strip().split("\n")
+
+    for line in lines:
+        assert set(json.loads(line)) == {"message", "chat_id", "question", "complete"}
+
+
+def test_delta_stream_reassembles_to_the_full_response(chat):
+    full = chat()
+    delta = chat(delta="true")
+
+    expected = json.loads(full.strip().split("\n")[-1])
+    reassembled = _reassemble(delta)
+    assert reassembled.pop("chat_id") and expected.pop("chat_id")
+    assert reassembled == expected
+    assert expected["message"] and expected["question"] and expected["complete"]
+    assert len(delta.encode()) < len(full.encode())
+
+
+def _extraction(response, question=None, complete=None):
+    return SimpleNamespace(
+        response=response,
+        question=SimpleNamespace(model_dump=lambda: question) if question else None,
+        complete=complete,
+    )
+
+
+def test_encoder_replaces_rewritten_text():
+    encoder = _ChatDeltaEncoder("chat")
+    extractions = [
+        _extraction("Nice"),
+        _extraction("Nice run"),
+        _extraction("Great run"),
+        _extraction("Great run!", {"type": "rating"}),
+        _extraction("Great run!", {"type": "rating"}, True),
+    ]
+
+    body = encoder.start()
+    for extraction in extractions:
+        body += encoder.update(extraction)
+    body += encoder.finish(extractions[-1])
+
+    assert "event: replace" in body
+    assert body.count("event: question") == 1
+    assert _reassemble(body) == {
+        "chat_id": "chat",
+        "message": "Great run!",
+        "question": {"type": "rating"},
+        "complete": True,
+    }
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """
+    Every write the app sends to MongoDB, as (collection, method, arguments).
+    """
+    recorded = []
+    collection_method = AsyncCollection.__getattr__
+
+    def recording_method(self, name):
+        method = collection_method(self, name)
+        if not name.startswith(("insert", "update", "replace", "find_one_and")):
+            return method
+
+        async def call(*args, **kwargs):
+            recorded.append((self.name, name, args))
+            return await method(*args, **kwargs)
+
+        return call
+
+    monkeypatch.setattr(AsyncCollection, "__getattr__", recording_method)
+    return recorded
+
+
+def _seed_long_chat(mongo, chat_id: str, count: int) -> None:
+    mongo["chat-history"].insert_one(
+        {
+            "chat_id": chat_id,
+            "user_id": USER_ID,
+            "message_count": count,
+            # Nothing left to fold, so the turn's writes are the only ones.
+            "summarized_until": count,
+            "memory_summary": "Runs 5k most mornings.",
+        }
+    )
+    for bucket in range(count // CHAT_BUCKET_SIZE):
+        mongo["chat-message-buckets"].insert_one(
+            {
+                "chat_id": chat_id,
+                "bucket": bucket,
+                "user_id": USER_ID,
+                "messages": [
+                    {"role": "user", "content": f"old message {index}", "index": index}
+                    for index in range(
+                        bucket * CHAT_BUCKET_SIZE, (bucket + 1) * CHAT_BUCKET_SIZE
+                    )
+                ],
+            }
+        )
+
+
+def _written_bytes(writes: list) -> int:
+    return sum(len(bson.encode(argument)) for _, _, args in writes for argument in args)
+
+
+def test_turn_writes_only_its_new_messages(chat, mongo, writes):
+    chat(MESSAGE | {"chat_id": "chat"})
+
+    [(_, _, (query, update))] = [w for w in writes if w[0] == "chat-message-buckets"]
+    pushed = update["$push"]["messages"]["$each"]
+    assert [(m["role"], m["index"]) for m in pushed] == [("user", 2), ("assistant", 3)]
+    assert pushed[0]["content"] == MESSAGE["message"]
+    # The stored transcript is neither read back into nor sent with any write.
+    for _, _, args in writes:
+        assert "Nice run!" not in str(args)
+    assert mongo["chat-history"].find_one({"chat_id": "chat"})["message_count"] == 4
+
+
+def test_bytes_written_per_turn_do_not_grow_with_the_chat(chat, mongo, writes):
+    _seed_long_chat(mongo, "long", 3 * CHAT_BUCKET_SIZE)
+
+    chat(MESSAGE | {"chat_id": "long"})
+    long_turn, writes[:] = list(writes), []
+    # The seeded two-message chat.
+    chat(MESSAGE | {"chat_id": "chat"})
+
+    assert [w[:2] for w in long_turn] == [w[:2] for w in writes]
+    assert _written_bytes(long_turn) == _written_bytes(writes)
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from db.chat_messages import CHAT_HISTORY_COLLECTION, append_chat_messages
+from services import conversation_memory
+from services.conversation_memory import SUMMARY_PREFIX, ConversationMemory
+
+SYSTEM = {"role": "system", "content": "You are a coach."}
+
+
+def _messages(count: int) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+        for i in range(count)
+    ]
+
+
+def _seed(chat_id: str, count: int) -> None:
+    asyncio.run(append_chat_messages(chat_id, "user", [SYSTEM] + _messages(count), {}))
+
+
+def _contents(window: list[dict]) -> list[str]:
+    return [message["content"] for message in window]
+
+
+class _Summarizer:
+    def __init__(self, fail: bool = False):
+        self.prompts = []
+        self.fail = fail
+
+    def __call__(self):
+        return self
+
+    async def achat_str_output(
+        self, chat_history, system_message, user_message, **kwargs
+    ):
+        self.prompts.append(system_message)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return f"summary {len(self.prompts)}"
+
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    summarizer = _Summarizer()
+    monkeypatch.setattr(conversation_memory, "OpenAIBase", summarizer)
+    return summarizer
+
+
+def test_short_chat_is_sent_whole(mongo):
+    _seed("short", 4)
+    memory = ConversationMemory("short", recent_turns=2, summary_batch_turns=1)
+
+    window = asyncio.run(memory.window())
+
+    assert _contents(window) == [SYSTEM["content"]] + _contents(_messages(4))
+
+
+def test_chat_without_summary_sends_only_its_newest_messages(mongo):
+    # A chat from before the summaries, or one whose summary keeps failing.
+    _seed("unsummarized", 40)
+    memory = ConversationMemory("unsummarized", recent_turns=2, summary_batch_turns=1)
+
+    window = asyncio.run(memory.window())
+
+    assert _contents(window) == [SYSTEM["content"]] + [
+        f"message {i}" for i in range(34, 40)
+    ]
+
+
+@pytest.mark.parametrize(
+    "summarized_until, first_message", [(30, 34), (37, 36), (40, 39)]
+)
+def test_window_follows_the_summary(mongo, summarized_until, first_message):
+    _seed("summarized", 40)
+    mongo[CHAT_HISTORY_COLLECTION].update_one(
+        {"chat_id": "summarized"},
+        {
+            "$set": {
+                "memory_summary": "Likes hills.",
+                "summarized_until": summarized_until,
+            }
+        },
+    )
+    memory = ConversationMemory("summarized", recent_turns=2, summary_batch_turns=1)
+
+    window = asyncio.run(memory.window())
+
+    # Index 0 is the system message, so message i is stored at index i + 1.
+    assert _contents(window) == [
+        SYSTEM["content"],
+        SUMMARY_PREFIX + "Likes hills.",
+    ] + [f"message {i}" for i in range(first_message, 40)]
+
+
+def test_update_summary_folds_messages_out_of_the_recent_window(mongo, summarizer):
+    _seed("folding", 10)
+    memory = ConversationMemory("folding", recent_turns=2, summary_batch_turns=2)
+
+    asyncio.run(memory.update_summary())
+
+    document = mongo[CHAT_HISTORY_COLLECTION].find_one({"chat_id": "folding"})
+    # 11 stored messages, the last 4 stay verbatim, the system message is never folded.
+    assert document["summarized_until"] == 7
+    assert document["memory_summary"] == "summary 1"
+    assert "message 5" in summarizer.prompts[0]
+    assert "message 6" not in summarizer.prompts[0]
+    assert _contents(asyncio.run(memory.window()))[-4:] == [
+        f"message {i}" for i in range(6, 10)
+    ]
+
+    # Nothing new to fold, so the model isn't asked again.
+    asyncio.run(memory.update_summary())
+    assert len(summarizer.prompts) == 1
+
+
+def test_failed_summary_leaves_the_window_capped(mongo, summarizer):
+    summarizer.fail = True
+    _seed("failing", 30)
+    memory = ConversationMemory("failing", recent_turns=2, summary_batch_turns=1)
+
+    asyncio.run(memory.update_summary())
+
+    assert summarizer.prompts
+    assert "summarized_until" not in mongo[CHAT_HISTORY_COLLECTION].find_one(
+        {"chat_id": "failing"}
+    )
+    assert len(asyncio.run(memory.window())) == 1 + 6
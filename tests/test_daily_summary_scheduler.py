@@ -0,0 +1,73 @@
+import asyncio
+from collections import Counter
+from routers.helpers import daily_summary_scheduler as dss
+
+
+def test_drain_runs_every_pending_summary_once(monkeypatch):
+    calls = Counter()
+
+    async def run():
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def regenerate(week_id, date):
+            calls[(week_id, date)] += 1
+            if date == "running":
+                started.set()
+                await finish.wait()
+
+        monkeypatch.setattr(dss, "regenerate_daily_summary", regenerate)
+        scheduler = dss.DailySummaryScheduler(delay_seconds=60)
+        scheduler.schedule("week", "waiting")
+        scheduler.schedule("week", "waiting")
+        scheduler.schedule("week", "other")
+        # Already generating when the drain starts.
+        running = dss.DailySummaryScheduler(delay_seconds=0)
+        running.schedule("week", "running")
+        await started.wait()
+
+        drain = asyncio.gather(scheduler.drain(), running.drain())
+        await asyncio.sleep(0)
+        finish.set()
+        await asyncio.wait_for(drain, 5)
+        assert not scheduler.is_pending("week", "waiting")
+        assert not running.is_pending("week", "running")
+
+    asyncio.run(run())
+    assert calls == {
+        ("week", "waiting"): 1,
+        ("week", "other"): 1,
+        ("week", "running"): 1,
+    }
+
+
+def test_burst_of_updates_is_summarized_once(monkeypatch):
+    calls = Counter()
+
+    async def run():
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def regenerate(week_id, date):
+            calls[(week_id, date)] += 1
+            started.set()
+            await finish.wait()
+
+        monkeypatch.setattr(dss, "regenerate_daily_summary", regenerate)
+        scheduler = dss.DailySummaryScheduler(delay_seconds=0.01)
+        for _ in range(3):
+            scheduler.schedule("week", "day")
+        await asyncio.wait_for(started.wait(), 5)
+        assert calls[("week", "day")] == 1
+
+        # An update while the summary is generated schedules exactly one more run.
+        started.clear()
+        scheduler.schedule("week", "day")
+        scheduler.schedule("week", "day")
+        finish.set()
+        await asyncio.wait_for(started.wait(), 5)
+        await asyncio.wait_for(asyncio.gather(*scheduler._tasks.values()), 5)
+        assert not scheduler.is_pending("week", "day")
+
+    asyncio.run(run())
+    assert calls == {("week", "day"): 2}
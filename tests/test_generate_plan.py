@@ -0,0 +1,97 @@
+import json
+from types import SimpleNamespace
+import pytest
+from routers import generate_plan
+from routers.generate_plan import WeeklyPlan, Workout
+from conftest import USER_ID
+
+WORKOUTS = [
+    {
+        "date": f"2024-03-0{day}",
+        "exercises": [{"name": f"Exercise {day}", "description": "3x10"}],
+        "reasoning": f"Day {day}",
+    }
+    for day in (4, 5, 7)
+]
+
+
+def _lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _snapshots() -> list[WeeklyPlan]:
+    """
+    The partial plans of a stream that writes WORKOUTS one at a time, each one first
+    showing up without its exercises.
+    """
+    snapshots = []
+    for count in range(1, len(WORKOUTS) + 1):
+        started = WORKOUTS[count - 1] | {"exercises": []}
+        for last in (started, WORKOUTS[count - 1]):
+            workouts = [Workout(**w) for w in WORKOUTS[: count - 1] + [last]]
+            snapshots.append(WeeklyPlan(workouts=workouts))
+    return snapshots
+
+
+@pytest.fixture
+def partial_plans(monkeypatch):
+    """
+    Serve the plan stream from a list of partial plans instead of the model.
+    """
+    stream = {"snapshots": _snapshots(), "fail_after": None}
+
+    async def create_partial(**kwargs):
+        for index, snapshot in enumerate(stream["snapshots"]):
+            if index == stream["fail_after"]:
+                raise RuntimeError("stream interrupted")
+            yield snapshot
+
+    instructor_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create_partial=create_partial))
+    )
+    monkeypatch.setattr(
+        generate_plan, "get_async_instructor_client", lambda: instructor_client
+    )
+    return stream
+
+
+def test_every_line_is_a_workout_of_the_saved_plan(client, mongo):
+    # End to end on the synthetic backend.
+    response = client.post("/generateWeeklyPlan", params={"stream": True}, json={})
+
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = _lines(response)
+    assert [line["type"] for line in lines] == ["workout"] * (len(lines) - 1) + ["plan"]
+    streamed = [Workout.model_validate(line["workout"]) for line in lines[:-1]]
+    saved = mongo["weekly-training-plans"].find_one({"user_id": USER_ID})
+    assert [Workout.model_validate(w) for w in saved["workouts"]] == streamed
+    assert lines[-1]["plan"]["week_id"] == saved["week_id"]
+
+
+def test_workouts_are_sent_once_complete_and_in_order(client, mongo, partial_plans):
+    response = client.post("/generateWeeklyPlan", params={"stream": True}, json={})
+
+    lines = _lines(response)
+    workouts = [Workout(**workout).model_dump() for workout in WORKOUTS]
+    assert [line["workout"] for line in lines[:-1]] == workouts
+    assert lines[-1]["plan"]["workouts"] == workouts
+    saved = mongo["weekly-training-plans"].find_one({"user_id": USER_ID})
+    assert saved["workouts"] == workouts
+    training_plan = mongo["training-plans"].find_one({"user_id": USER_ID})
+    [entry] = next(iter(training_plan["training_plan"].values())).values()
+    assert entry["week_id"] == saved["week_id"]
+
+
+def test_interrupted_stream_ends_with_an_error_and_saves_nothing(
+    client, mongo, partial_plans
+):
+    partial_plans["fail_after"] = 3
+
+    response = client.post("/generateWeeklyPlan", params={"stream": True}, json={})
+
+    lines = _lines(response)
+    # The first workout was complete before the stream broke off.
+    assert [line["type"] for line in lines] == ["workout", "error"]
+    assert Workout.model_validate(lines[0]["workout"]).date == WORKOUTS[0]["date"]
+    assert mongo["weekly-training-plans"].count_documents({}) == 0
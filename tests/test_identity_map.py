@@ -0,0 +1,58 @@
+import asyncio
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from starlette.background import BackgroundTask
+from db import identity_map
+from db.identity_map import identity_map_scope, without_identity_map
+from routers.helpers import daily_summary_scheduler as dss
+
+
+def test_background_task_runs_without_the_request_identity_map():
+    seen = {}
+
+    async def record(name):
+        seen[name] = identity_map._current_identity_map.get()
+
+    app = FastAPI(dependencies=[Depends(identity_map_scope)])
+
+    @app.get("/plain")
+    async def plain():
+        return StreamingResponse(
+            iter(["ok"]), background=BackgroundTask(record, "plain")
+        )
+
+    @app.get("/detached")
+    async def detached():
+        return StreamingResponse(
+            iter(["ok"]),
+            background=BackgroundTask(without_identity_map(record), "detached"),
+        )
+
+    with TestClient(app) as client:
+        client.get("/plain")
+        client.get("/detached")
+
+    # A plain BackgroundTask still sees the request's map; the wrapped one doesn't.
+    assert seen["plain"] is not None
+    assert seen["detached"] is None
+
+
+def test_scheduled_summary_runs_without_the_request_identity_map(monkeypatch):
+    seen = []
+
+    async def regenerate(week_id, date):
+        seen.append(identity_map._current_identity_map.get())
+
+    monkeypatch.setattr(dss, "regenerate_daily_summary", regenerate)
+
+    async def request():
+        scope = identity_map_scope()
+        await scope.__anext__()
+        scheduler = dss.DailySummaryScheduler(delay_seconds=0)
+        scheduler.schedule("week", "2024-01-01")
+        assert identity_map._current_identity_map.get() is not None
+        await scheduler.drain()
+
+    asyncio.run(request())
+    assert seen == [None]
@@ -0,0 +1,69 @@
+from pymongo import ASCENDING
+import pytest
+from db.indexes import INDEX_MANIFEST, ensure_indexes
+
+mongomock = pytest.importorskip("mongomock")
+
+
+class _BrokenCollection:
+    name = "user-details"
+
+    def index_information(self):
+        raise RuntimeError("not authorized")
+
+
+def _stale_indexes():
+    db = mongomock.MongoClient()["fitness-plans"]
+    db["user-profiles"].insert_many(
+        [{"email": "a@example.com", "user_id": str(i)} for i in range(2)]
+    )
+    db["user-profiles"].create_index([("email", ASCENDING)], name="email_unique")
+    db["password-reset-tokens"].create_index(
+        [("expiration", ASCENDING)], name="expiration_ttl", expireAfterSeconds=3600
+    )
+    return db
+
+
+def test_startup_keeps_indexes_whose_options_changed():
+    db = _stale_indexes()
+
+    assert ensure_indexes(db) == []
+
+    assert "unique" not in db["user-profiles"].index_information()["email_unique"]
+    ttl = db["password-reset-tokens"].index_information()["expiration_ttl"]
+    assert ttl["expireAfterSeconds"] == 3600
+    # The rest of the manifest is still created.
+    assert "user_id_unique" in db["user-profiles"].index_information()
+
+
+def test_rebuild_recreates_indexes_whose_options_changed():
+    db = _stale_indexes()
+    db["user-profiles"].delete_many({})
+
+    assert ensure_indexes(db, rebuild=True) == []
+
+    assert db["user-profiles"].index_information()["email_unique"]["unique"]
+    ttl = db["password-reset-tokens"].index_information()["expiration_ttl"]
+    assert ttl["expireAfterSeconds"] == 0
+    # A second run finds nothing to rebuild.
+    assert ensure_indexes(db, rebuild=True) == []
+
+
+def test_rebuild_reports_indexes_that_cannot_be_recreated():
+    db = _stale_indexes()
+
+    # The duplicate emails keep the unique index from being built.
+    assert ensure_indexes(db, rebuild=True) == ["user-profiles"]
+
+
+def test_failing_collection_does_not_stop_the_others():
+    client_db = mongomock.MongoClient()["fitness-plans"]
+    db = {name: client_db[name] for name in INDEX_MANIFEST}
+    db["user-details"] = _BrokenCollection()
+
+    assert ensure_indexes(db) == ["user-details"]
+
+    for name, indexes in INDEX_MANIFEST.items():
+        if name != "user-details":
+            existing = client_db[name].index_information()
+            assert {model.document["name"] for model in indexes} <= set(existing)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from datetime import timedelta
+from types import SimpleNamespace
+import pytest
+from db.cache import TTLCache
+from routers.helpers import daily_summary_scheduler as dss
+from services import llm_cache
+from services.llm_cache import (
+    LLM_CACHE_COLLECTION,
+    LLM_CACHE_TTL_SECONDS,
+    cached_chat_completion,
+    get_llm_cache_metrics,
+)
+
+MESSAGES = [{"role": "user", "content": "Summarize my week."}]
+
+
+class _Client:
+    """
+    Stand-in for AsyncOpenAI that answers every completion with a numbered reply.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **params):
+        self.requests.append(params)
+        content = f"reply {len(self.requests)}"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+@pytest.fixture
+def cache(mongo, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "true")
+    monkeypatch.setattr(llm_cache, "_memory_cache", TTLCache(maxsize=10, ttl=3600))
+    return mongo[LLM_CACHE_COLLECTION]
+
+
+def _complete(client, messages=MESSAGES, **params) -> str:
+    return asyncio.run(
+        cached_chat_completion(client, model="gpt-4o", messages=messages, **params)
+    )
+
+
+def _metrics_since(before: dict) -> dict:
+    return {k: v - before[k] for k, v in get_llm_cache_metrics().items()}
+
+
+def test_miss_completes_and_stores_the_reply(cache):
+    client = _Client()
+    before = get_llm_cache_metrics()
+
+    assert _complete(client) == "reply 1"
+
+    assert len(client.requests) == 1
+    assert _metrics_since(before) == {"memory_hits": 0, "store_hits": 0, "misses": 1}
+    document = cache.find_one({})
+    assert document["content"] == "reply 1"
+    assert document["expires_at"] - document["created_at"] == timedelta(
+        seconds=LLM_CACHE_TTL_SECONDS
+    )
+
+
+def test_hit_is_answered_without_the_model(cache, caplog):
+    client = _Client()
+    _complete(client)
+    before = get_llm_cache_metrics()
+    caplog.set_level(logging.INFO, logger=llm_cache.__name__)
+
+    assert _complete(client) == "reply 1"
+
+    assert len(client.requests) == 1
+    assert _metrics_since(before) == {"memory_hits": 1, "store_hits": 0, "misses": 0}
+    # Lookups are counted at debug level, not logged on every call.
+    assert not caplog.records
+
+
+def test_other_params_are_a_different_entry(cache):
+    client = _Client()
+    _complete(client)
+
+    assert _complete(client, temperature=0) == "reply 2"
+    assert _complete(client, [{"role": "user", "content": "Other."}]) == "reply 3"
+    assert cache.count_documents({}) == 3
+
+
+def test_expired_entries_are_completed_again(cache, monkeypatch):
+    client = _Client()
+    # Entries of a zero TTL cache have expired by the next lookup.
+    monkeypatch.setattr(llm_cache, "_memory_cache", TTLCache(maxsize=10, ttl=0))
+    _complete(client)
+    before = get_llm_cache_metrics()
+
+    # The in-process copy expired, the stored one hasn't.
+    assert _complete(client) == "reply 1"
+    assert _metrics_since(before)["store_hits"] == 1
+
+    # The TTL index removes the stored one once expires_at has passed.
+    cache.delete_many({"expires_at": {"$exists": True}})
+    assert _complete(client) == "reply 2"
+    assert _metrics_since(before)["misses"] == 1
+
+
+def test_daily_summary_key_ignores_bookkeeping_fields(cache, monkeypatch):
+    client = _Client()
+    workout = {"date": "2024-03-04", "type": "run", "distance_km": 8}
+    stored = {}
+
+    async def daily_plan(week_id, date):
+        return stored["workout"]
+
+    monkeypatch.setattr(dss.gph, "_get_daily_training_plan", daily_plan)
+    monkeypatch.setattr(dss, "get_async_openai_client", lambda: client)
+
+    stored["workout"] = workout
+    asyncio.run(dss.regenerate_daily_summary("week", "2024-03-04"))
+    for field in dss._NON_SUMMARY_FIELDS:
+        stored["workout"] = {**workout, field: "2024-03-04T09:00:00"}
+        asyncio.run(dss.regenerate_daily_summary("week", "2024-03-04"))
+    assert len(client.requests) == 1
+
+    stored["workout"] = {**workout, "distance_km": 10}
+    asyncio.run(dss.regenerate_daily_summary("week", "2024-03-04"))
+    assert len(client.requests) == 2
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from services import llm_backends, llm_clients
+from services.openai_chat_base import OpenAIBase
+
+COMPLETION = json.dumps(
+    {
+        "id": "completion",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "ok"},
+            }
+        ],
+    }
+).encode()
+
+
+async def _serve(connections: list):
+    """
+    Minimal keep-alive HTTP/1.1 endpoint answering every request with COMPLETION.
+    """
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                await reader.readexactly(length)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n" % len(COMPLETION) + COMPLETION
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_requests_reuse_one_pooled_connection(monkeypatch):
+    monkeypatch.setattr(llm_backends, "LLM_BACKEND", "live")
+    monkeypatch.setattr(llm_clients, "_async_client", None)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    connections = []
+
+    async def main():
+        server = await _serve(connections)
+        port = server.sockets[0].getsockname()[1]
+        monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+        clients = set()
+        # As handlers do: a new OpenAIBase for every request.
+        for i in range(20):
+            base = OpenAIBase()
+            clients.add(id(base.async_client))
+            assert (
+                await base.achat_str_output([], "You are a coach.", f"hi {i}") == "ok"
+            )
+        await llm_clients.close_llm_clients()
+        server.close()
+        return clients
+
+    clients = asyncio.run(main())
+
+    assert len(clients) == 1
+    # One TCP (and, against the API, TLS) handshake for all 20 requests.
+    assert len(connections) == 1
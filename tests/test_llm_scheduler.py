@@ -0,0 +1,153 @@
+import asyncio
+import httpx
+import pytest
+from openai import AsyncOpenAI
+from services import llm_scheduler as scheduler_module
+from services.llm_backends import SyntheticTransport
+from services.llm_scheduler import (
+    Priority,
+    create_chat_completion,
+    estimate_tokens,
+    llm_scheduler,
+    record_rate_limit_headers,
+)
+
+
+def _client(transport: SyntheticTransport) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key="test",
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            transport=transport,
+            event_hooks={"response": [record_rate_limit_headers]},
+        ),
+    )
+
+
+async def _burst(client: AsyncOpenAI, model: str, warm_up: bool) -> list[Priority]:
+    finished = []
+
+    async def call(priority: Priority, index: int):
+        await create_chat_completion(
+            client,
+            priority,
+            model=model,
+            messages=[{"role": "user", "content": f"request {index}"}],
+        )
+        finished.append(priority)
+
+    if warm_up:
+        # One call first so the scheduler has seen the rate-limit headers.
+        await call(Priority.STANDARD, -1)
+        finished.clear()
+    # Background work arrives first, as a burst of summaries would.
+    await asyncio.gather(
+        *[call(Priority.BACKGROUND, i) for i in range(8)],
+        *[call(Priority.INTERACTIVE, i) for i in range(4)],
+    )
+    await client.close()
+    return finished
+
+
+def test_rate_limited_requests_are_retried(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_RETRY_BASE_SECONDS", 0.01)
+    transport = SyntheticTransport(
+        seed="retries", ttft_ms=1, rate_limit_requests=5, rate_limit_window=0.3
+    )
+
+    finished = asyncio.run(_burst(_client(transport), "retried-model", False))
+
+    # Nothing is known about the limit before the first responses, so the burst hits it.
+    assert transport.rate_limited > 0
+    assert len(finished) == 12
+
+
+def test_interactive_requests_are_admitted_before_background(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_RETRY_BASE_SECONDS", 0.01)
+    transport = SyntheticTransport(
+        seed="priorities", ttft_ms=1, rate_limit_requests=5, rate_limit_window=0.3
+    )
+
+    finished = asyncio.run(_burst(_client(transport), "prioritised-model", True))
+
+    assert len(finished) == 12
+    interactive = [i for i, p in enumerate(finished) if p == Priority.INTERACTIVE]
+    background = [i for i, p in enumerate(finished) if p == Priority.BACKGROUND]
+    assert sum(interactive) / len(interactive) < sum(background) / len(background)
+
+
+def test_open_streams_are_capped_separately(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "max_concurrency", 2)
+    monkeypatch.setattr(llm_scheduler, "max_streams", 4)
+    transport = SyntheticTransport(seed="streams", ttft_ms=10, tokens_per_second=200)
+    client = _client(transport)
+    model = "streaming-model"
+    replying = []
+    peak = 0
+
+    async def stream(index: int) -> int:
+        nonlocal peak
+        chunks = 0
+
+        async def request():
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": f"stream {index}"}],
+                stream=True,
+            )
+            async for chunk in response:
+                yield chunk
+
+        async for _ in llm_scheduler.stream(model, Priority.INTERACTIVE, request):
+            if not chunks:
+                replying.append(index)
+                peak = max(peak, len(replying))
+            chunks += 1
+        replying.remove(index)
+        return chunks
+
+    async def main():
+        chunks = await asyncio.gather(*[stream(i) for i in range(10)])
+        await client.close()
+        return chunks
+
+    chunks = asyncio.run(main())
+
+    assert all(chunks)
+    # More streams reply at once than there are concurrency slots, but no more than max_streams.
+    assert peak == 4
+    state = llm_scheduler._state(model)
+    assert state.in_flight == 0 and state.streams == 0
+
+
+def test_token_budget_is_spent_on_admission():
+    model = "token-model"
+    llm_scheduler.record_headers(
+        model,
+        httpx.Headers(
+            {
+                "x-ratelimit-limit-tokens": "1000",
+                "x-ratelimit-remaining-tokens": "1000",
+                "x-ratelimit-reset-tokens": "0.5s",
+            }
+        ),
+        200,
+    )
+    messages = [{"role": "user", "content": "x" * 2400}]
+    tokens = estimate_tokens(messages, max_tokens=0)
+
+    async def main():
+        await llm_scheduler._acquire(model, Priority.INTERACTIVE, tokens)
+        await llm_scheduler._release(model)
+        # The first request has used most of the budget before any response reported it.
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                llm_scheduler._acquire(model, Priority.INTERACTIVE, tokens), 0.2
+            )
+        # Admitted once the budget resets.
+        await llm_scheduler._acquire(model, Priority.INTERACTIVE, tokens)
+        await llm_scheduler._release(model)
+
+    assert 500 < tokens < 1000
+    asyncio.run(main())
+    assert llm_scheduler._state(model).in_flight == 0
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+import pytest
+from pymongo import MongoClient
+from db import mongo_client
+from db.db_operations import DbOperations
+
+
+class _Session:
+    def __init__(self):
+        self.in_transaction = False
+
+    @asynccontextmanager
+    async def start_transaction(self):
+        self.in_transaction = True
+        yield
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class _Admin:
+    def __init__(self, hello: dict):
+        self.hello = hello
+        self.commands = 0
+
+    async def command(self, name: str):
+        self.commands += 1
+        return self.hello
+
+
+class _Client:
+    def __init__(self, hello: dict):
+        self.admin = _Admin(hello)
+
+    async def start_session(self):
+        return _Session()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    def install(hello: dict) -> _Client:
+        client = _Client(hello)
+        monkeypatch.setattr(mongo_client, "get_async_mongo_client", lambda: client)
+        monkeypatch.setattr(mongo_client, "_transactions_supported", None)
+        monkeypatch.delenv("MONGODB_TRANSACTIONS", raising=False)
+        return client
+
+    return install
+
+
+async def _session_in_transaction() -> bool:
+    async with mongo_client.async_transaction() as session:
+        return session.in_transaction
+
+
+@pytest.mark.parametrize(
+    "hello, expected",
+    [
+        ({"isWritablePrimary": True}, False),
+        ({"isWritablePrimary": True, "setName": "rs0"}, True),
+        ({"isWritablePrimary": True, "msg": "isdbgrid"}, True),
+    ],
+)
+def test_transactions_follow_server_support(server, hello, expected):
+    client = server(hello)
+
+    assert asyncio.run(_session_in_transaction()) is expected
+    assert asyncio.run(_session_in_transaction()) is expected
+    # The server is asked once.
+    assert client.admin.commands == 1
+
+
+def test_transactions_setting_overrides_detection(server, monkeypatch):
+    client = server({"isWritablePrimary": True})
+    monkeypatch.setenv("MONGODB_TRANSACTIONS", "true")
+
+    assert asyncio.run(_session_in_transaction()) is True
+    assert client.admin.commands == 0
+
+
+def test_db_operations_handles_share_one_client(monkeypatch):
+    created = []
+    barrier = threading.Barrier(8)
+
+    def counting_client(*args, **kwargs):
+        # connect=False keeps the real client from dialing the unreachable host.
+        client = MongoClient(*args, connect=False, **kwargs)
+        created.append(client)
+        return client
+
+    def build_handles(handles):
+        barrier.wait()
+        # One request's worth of handles, as many as delete_user_profile builds.
+        handles.extend(DbOperations(name) for name in ["a", "b", "c", "d", "e", "f"])
+
+    monkeypatch.setattr(mongo_client, "MongoClient", counting_client)
+    monkeypatch.setattr(mongo_client, "_client", None)
+    monkeypatch.setenv("MONGODB_CONNECTION_STRING", "mongodb://127.0.0.1:1")
+    handles = []
+    threads = [
+        threading.Thread(target=build_handles, args=(handles,)) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert len(handles) == 48
+        assert len(created) == 1
+        assert all(
+            handle.collection.database.client is created[0] for handle in handles
+        )
+        assert mongo_client.get_mongo_client() is created[0]
+    finally:
+        mongo_client.close_mongo_client()
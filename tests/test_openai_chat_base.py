@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from pydantic import BaseModel
+from services.llm_backends import SyntheticTransport
+from services.llm_scheduler import llm_scheduler
+from services.openai_chat_base import OpenAIBase
+from test_llm_scheduler import _client
+
+STREAMS = 500
+
+
+class _Reply(BaseModel):
+    response: str
+    complete: bool
+
+
+def test_concurrent_streams_are_not_bound_by_the_thread_pool(monkeypatch):
+    # Admission is the scheduler's job; take its cap out of the measurement.
+    monkeypatch.setattr(llm_scheduler, "max_concurrency", STREAMS)
+    monkeypatch.setattr(llm_scheduler, "max_streams", STREAMS)
+    transport = SyntheticTransport(seed="streams", ttft_ms=0, tokens_per_second=1e6)
+    client = _client(transport)
+    base = OpenAIBase(async_client=client)
+    stream_tool_arguments = base._stream_tool_arguments
+    opened = []
+
+    async def main():
+        all_open = asyncio.Event()
+
+        async def gated_stream(messages, response_model):
+            # Hold every stream open until all of them are, which can only happen
+            # if none of them waits for a worker thread.
+            opened.append(messages)
+            if len(opened) == STREAMS:
+                all_open.set()
+            await asyncio.wait_for(all_open.wait(), 10)
+            async for arguments in stream_tool_arguments(messages, response_model):
+                yield arguments
+
+        async def stream(index: int) -> _Reply:
+            async for reply in base.achat_json_output_stream(
+                [], "You are a coach.", f"stream {index}", _Reply
+            ):
+                pass
+            return reply
+
+        base._stream_tool_arguments = gated_stream
+        threads = threading.active_count()
+        replies = await asyncio.gather(*[stream(i) for i in range(STREAMS)])
+        await client.close()
+        return replies, threading.active_count() - threads
+
+    replies, new_threads = asyncio.run(main())
+
+    assert len(opened) == STREAMS
+    assert all(isinstance(reply, _Reply) for reply in replies)
+    assert new_threads < 10
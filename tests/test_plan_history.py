@@ -0,0 +1,105 @@
+import asyncio
+import json
+from datetime import date, timedelta
+from routers.helpers import generate_plan_helpers as gph
+from services.tokenizer import count_tokens
+
+USER_ID = "history-user"
+
+
+def _seed_weeks(mongo, year: str, weeks: int) -> None:
+    training_plan = {}
+    for number in range(1, weeks + 1):
+        start_date = (date(int(year), 1, 5) + timedelta(weeks=number - 1)).isoformat()
+        week_id = f"week-{number}"
+        training_plan[f"week{number:02d}"] = {
+            "week_id": week_id,
+            "start_date": start_date,
+            "summary": f"Week {number}: steady volume, one long run. " * 5,
+        }
+        mongo["weekly-training-plans"].insert_one(
+            {
+                "week_id": week_id,
+                "user_id": USER_ID,
+                "start_date": start_date,
+                "workouts": [
+                    {
+                        "date": start_date,
+                        "exercises": [
+                            {"name": f"Exercise {i}", "description": "3 x 10 reps"}
+                            for i in range(8)
+                        ],
+                    }
+                ],
+            }
+        )
+    mongo["training-plans"].insert_one(
+        {"user_id": USER_ID, "training_plan": {year: training_plan}}
+    )
+
+
+def test_first_plan_of_a_new_year_has_no_history(mongo):
+    _seed_weeks(mongo, "2025", 3)
+
+    history, past_weeks = asyncio.run(
+        gph._get_compacted_training_history(USER_ID, "2026")
+    )
+
+    assert past_weeks == 0
+    assert json.loads(history) == {"older_week_summaries": [], "recent_weeks": []}
+
+
+def test_rendered_history_fits_the_token_budget(mongo):
+    _seed_weeks(mongo, "2026", 20)
+
+    for token_budget in range(300, 2400, 25):
+        history, past_weeks = asyncio.run(
+            gph._get_compacted_training_history(
+                USER_ID, "2026", recent_weeks=2, token_budget=token_budget
+            )
+        )
+        assert past_weeks == 20
+        assert count_tokens(history) <= token_budget
+        # The latest week is always kept.
+        assert json.loads(history)["recent_weeks"][-1]["week_id"] == "week-20"
+
+
+def test_old_weeks_are_read_in_one_query_in_start_date_order(mongo, monkeypatch):
+    _seed_weeks(mongo, "2026", 6)
+    # Neither the stored documents nor the training-plans entries are in week order.
+    documents = list(mongo["weekly-training-plans"].find({}, {"_id": 0}))
+    mongo["weekly-training-plans"].delete_many({})
+    mongo["weekly-training-plans"].insert_many(
+        [documents[i] for i in (3, 0, 5, 1, 4, 2)]
+    )
+    weeks = mongo["training-plans"].find_one({"user_id": USER_ID})["training_plan"]
+    mongo["training-plans"].update_one(
+        {"user_id": USER_ID},
+        {"$set": {"training_plan.2026": dict(reversed(weeks["2026"].items()))}},
+    )
+    queries = []
+    read_many = gph.AsyncDbOperations.read_many_from_mongodb
+
+    def recording_read_many(self, query, *args, **kwargs):
+        queries.append(query)
+        return read_many(self, query, *args, **kwargs)
+
+    monkeypatch.setattr(
+        gph.AsyncDbOperations, "read_many_from_mongodb", recording_read_many
+    )
+
+    async def collect(**kwargs):
+        return [
+            plan["week_id"]
+            async for plan in gph._iter_old_weekly_training_plans(
+                USER_ID, "2026", **kwargs
+            )
+        ]
+
+    assert asyncio.run(collect()) == [f"week-{n}" for n in range(1, 7)]
+    assert asyncio.run(collect(max_weeks=2)) == ["week-5", "week-6"]
+    assert asyncio.run(collect(max_weeks=0)) == []
+    assert queries == [
+        {"week_id": {"$in": [f"week-{n}" for n in range(1, 7)]}},
+        {"week_id": {"$in": ["week-5", "week-6"]}},
+    ]
@@ -0,0 +1,105 @@
+import asyncio
+import bson
+import pytest
+from db import async_db_operations
+from routers.helpers import generate_plan_helpers as gph
+from conftest import AsyncCollection
+
+USER_ID = "projection-user"
+WEEK_ID = "week-2026-10"
+DATE = "2026-03-04"
+
+
+class _MeasuredCollection(AsyncCollection):
+    """
+    Records the BSON size of every document find_one returns.
+    """
+
+    def __init__(self, collection, received):
+        super().__init__(collection)
+        self.received = received
+
+    async def find_one(self, *args, **kwargs):
+        document = await super().find_one(*args, **kwargs)
+        if document is not None:
+            self.received.append((self.name, len(bson.encode(document))))
+        return document
+
+
+def _workout(day: int) -> dict:
+    return {
+        "date": f"2026-03-{day:02d}",
+        "summary": "Upper body strength with a short conditioning finisher. " * 3,
+        "exercises": [
+            {
+                "name": f"Exercise {i}",
+                "description": "4 sets of 8 reps at a controlled tempo, 90 s rest.",
+                "status": "pending",
+            }
+            for i in range(8)
+        ],
+    }
+
+
+@pytest.fixture
+def received(mongo, monkeypatch):
+    mongo["user-details"].insert_one(
+        {
+            "user_id": USER_ID,
+            "goal": "Run a half marathon",
+            "injuries": "Old knee injury, avoid deep lunges. " * 10,
+            "schedule": {day: "45 minutes" for day in ["mon", "wed", "fri", "sun"]},
+            "memories": [f"Prefers morning sessions, note {i}" for i in range(20)],
+        }
+    )
+    mongo["weekly-training-plans"].insert_one(
+        {
+            "week_id": WEEK_ID,
+            "user_id": USER_ID,
+            "start_date": "2026-03-02",
+            "summary": "Base building week. " * 20,
+            "workouts": [_workout(day) for day in range(2, 9)],
+        }
+    )
+    received = []
+    monkeypatch.setattr(
+        async_db_operations,
+        "get_async_database",
+        lambda: {
+            name: _MeasuredCollection(mongo[name], received)
+            for name in mongo.list_collection_names()
+        },
+    )
+    return received
+
+
+def _full_size(mongo, collection: str) -> int:
+    return len(bson.encode(mongo[collection].find_one()))
+
+
+@pytest.mark.parametrize(
+    "read, collection, max_share",
+    [
+        # chat and generateWeeklyPlan only use the memories.
+        (lambda: gph._extract_user_memories(USER_ID), "user-details", 0.7),
+        # generateWeeklyPlan only needs to know whether the week exists.
+        (
+            lambda: gph._validate_generate_weekly_plan(USER_ID, "2026-03-02"),
+            "weekly-training-plans",
+            0.02,
+        ),
+        # updateExerciseStatus and getDailyWorkout only use the day's workout.
+        (
+            lambda: gph._get_daily_training_plan(WEEK_ID, DATE),
+            "weekly-training-plans",
+            0.2,
+        ),
+    ],
+)
+def test_reads_fetch_only_the_fields_they_use(
+    mongo, received, read, collection, max_share
+):
+    asyncio.run(read())
+
+    assert [name for name, _ in received] == [collection]
+    assert received[0][1] <= _full_size(mongo, collection) * max_share
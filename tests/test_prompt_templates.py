@@ -0,0 +1,91 @@
+import json
+import pytest
+from services.prompt_templates import (
+    PromptTemplate,
+    get_prompt_template,
+    render_prompt,
+)
+
+NAME = "generate_fitness_plan_user_message"
+
+
+def _values(history_bytes: int) -> dict:
+    week = {
+        "week_id": "week",
+        "start_date": "2026-01-05",
+        "workouts": [
+            {
+                "date": "2026-01-05",
+                "exercises": [{"name": "Squat", "description": "4x8, 2 min rest"}] * 8,
+            }
+        ],
+    }
+    history = []
+    while len(json.dumps(history)) < history_bytes:
+        history.append(week)
+    return {
+        "instructions": json.dumps(["Prefers morning runs"] * 20, indent=2),
+        "user_data": json.dumps({"name": "Sam", "goal": "10k"}, indent=2),
+        "start_of_the_week": json.dumps("2026-03-02"),
+        "current_day": "Monday",
+        "old_training_plans": json.dumps(history, indent=2),
+        "comment": "More core work, please.",
+    }
+
+
+def _replace_chain(path: str, values: dict) -> str:
+    """
+    How prompts were built before the registry: read the file, then one replace per slot.
+    """
+    with open(path, "r") as file:
+        prompt = file.read()
+    for slot, value in values.items():
+        prompt = prompt.replace("{" + slot + "}", value)
+    return prompt
+
+
+def test_render_is_single_pass():
+    # Chat-derived memories can contain text that looks like a slot.
+    values = _values(1024)
+    values["instructions"] = json.dumps(["Log {comment} fields as written."])
+    path = get_prompt_template(NAME).path
+
+    prompt = render_prompt(NAME, **values)
+
+    assert "Log {comment} fields as written." in prompt
+    assert "Log {comment} fields as written." not in _replace_chain(path, values)
+
+
+def test_missing_slot_fails_fast():
+    values = _values(1024)
+    del values["comment"]
+
+    with pytest.raises(ValueError, match="missing: \\['comment'\\]"):
+        render_prompt(NAME, **values)
+
+
+def test_large_histories_render_from_the_parsed_template(monkeypatch):
+    template = get_prompt_template(NAME)
+    values = _values(300 * 1024)
+    loads = []
+    load = PromptTemplate._load
+
+    def counting_load(self):
+        loads.append(self.path)
+        load(self)
+
+    monkeypatch.setattr(PromptTemplate, "_load", counting_load)
+
+    for _ in range(20):
+        assert render_prompt(NAME, **values) == _replace_chain(template.path, values)
+    # The file is read and split once, not on every render.
+    assert loads == []
+
+    # With reloading on, only a changed file is parsed again.
+    monkeypatch.setenv("PROMPT_TEMPLATES_RELOAD", "true")
+    render_prompt(NAME, **values)
+    assert loads == []
+    monkeypatch.setattr(template, "mtime", template.mtime - 1)
+    render_prompt(NAME, **values)
+    render_prompt(NAME, **values)
+    assert loads == [template.path]
@@ -0,0 +1,150 @@
+import json
+import random
+from typing import Optional
+import pytest
+from pydantic import BaseModel, ValidationError
+from services.structured_stream import IncrementalObjectParser, StructuredStream
+
+PAYLOADS = [
+    {"response": "plain text", "complete": True},
+    {"response": 'quote " backslash \\ slash / tab \t newline \n', "complete": False},
+    {"response": "accents é ü and an emoji 😀 then 𝄞", "n": -12.5e-3},
+    {
+        "response": "nested values follow",
+        "question": {
+            "text": 'Pick one {"not": "a key"}',
+            "options": [["a", "b"], [], [{"x": [1, 2, {"y": None}]}]],
+        },
+        "flags": [True, False, None],
+        "empty": {},
+    },
+    {"response": "", "count": 0, "ratio": 1e10},
+]
+
+
+class Question(BaseModel):
+    text: str
+    options: list
+
+
+class Reply(BaseModel):
+    response: str
+    complete: bool = False
+    question: Optional[Question] = None
+
+
+def _encodings(payload: dict) -> list[str]:
+    # Escaped and unescaped non-ASCII, compact and spaced out.
+    return [
+        json.dumps(payload),
+        json.dumps(payload, ensure_ascii=False),
+        json.dumps(payload, indent=2),
+    ]
+
+
+def _chunkings(text: str):
+    """
+    Every split into two chunks, single characters and seeded random chunk sizes.
+    """
+    for i in range(len(text) + 1):
+        yield [text[:i], text[i:]]
+    yield list(text)
+    rng = random.Random(text)
+    for _ in range(20):
+        chunks, i = [], 0
+        while i < len(text):
+            size = rng.randint(1, 7)
+            chunks.append(text[i : i + size])
+            i += size
+        yield chunks
+
+
+def _parse(chunks: list[str]) -> tuple[dict, dict, int]:
+    parser = IncrementalObjectParser()
+    values, texts, ends = {}, {}, 0
+    for chunk in chunks:
+        for kind, key, value in parser.feed(chunk):
+            if kind == "text":
+                texts[key] = texts.get(key, "") + value
+            elif kind == "value":
+                values[key] = value
+            else:
+                ends += 1
+    return values, texts, ends
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_chunked_parse_matches_json_loads(payload):
+    for text in _encodings(payload):
+        expected = json.loads(text)
+        strings = {k: v for k, v in expected.items() if isinstance(v, str) and v}
+        for chunks in _chunkings(text):
+            values, texts, ends = _parse(chunks)
+            assert values == expected, chunks
+            # Streamed text adds up to the decoded string values.
+            assert texts == strings, chunks
+            assert ends == 1
+
+
+def test_surrogate_pair_split_inside_the_escape():
+    text = json.dumps({"response": "😀"})
+    assert "\\ud83d\\ude00" in text
+    start = text.index("\\ud83d")
+    for i in range(start, start + 12):
+        values, texts, _ = _parse([text[:i], text[i:]])
+        assert values == {"response": "😀"}
+        # The pair is decoded together, never as a lone surrogate.
+        assert texts == {"response": "😀"}
+
+
+@pytest.mark.parametrize(
+    "text", ['["not an object"]', '{"a" 1}', '{"a": 1 "b": 2}', '{"a": 1} trailing']
+)
+def test_malformed_json_raises(text):
+    with pytest.raises(ValueError):
+        _parse(list(text))
+
+
+def test_fields_are_validated_as_they_complete():
+    stream = StructuredStream(Reply)
+    payload = json.dumps(
+        {
+            "response": "Hi",
+            "question": {"text": "Which?", "options": ["a"]},
+            "complete": True,
+        }
+    )
+
+    events = [event for chunk in payload for event in stream.feed(chunk)]
+
+    fields = [event for event in events if event.kind == "field"]
+    assert [event.field for event in fields] == ["response", "question", "complete"]
+    assert isinstance(fields[1].value, Question)
+    assert events[-1].kind == "done"
+    assert events[-1].value == Reply.model_validate_json(payload)
+
+
+def test_snapshot_holds_the_streaming_text():
+    stream = StructuredStream(Reply)
+    stream.feed('{"complete": true, "response": "Good mor')
+
+    snapshot = stream.snapshot()
+
+    assert snapshot.response == "Good mor"
+    assert snapshot.complete is True
+    assert snapshot.question is None
+
+
+def test_invalid_field_fails_when_it_completes():
+    stream = StructuredStream(Reply)
+    stream.feed('{"response": "Hi", "complete": ')
+
+    with pytest.raises(ValidationError):
+        stream.feed('"not a bool"}')
+
+
+def test_missing_required_field_fails_at_the_end():
+    stream = StructuredStream(Reply)
+
+    with pytest.raises(ValidationError):
+        stream.feed('{"complete": true}')
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from conftest import USER_ID
+
+
+def test_plan_endpoints_run_on_the_synthetic_backend(client, mongo):
+    today = datetime.now().strftime("%Y-%m-%d")
+    start_of_week = (
+        datetime.now() - timedelta(days=datetime.now().weekday())
+    ).strftime("%Y-%m-%d")
+
+    response = client.post("/generateWeeklyPlan", json={})
+    assert response.status_code == 200, response.text
+    plan = response.json()
+    assert plan["workouts"] and plan["workouts"][0]["exercises"]
+    week = mongo["weekly-training-plans"].find_one({"user_id": USER_ID})
+    assert week["start_date"] == start_of_week
+
+    response = client.post(
+        "/logWorkout",
+        json={"date": today, "chat_id": "chat", "should_replace": True},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["exercises"]
+
+    response = client.put(
+        "/updateWorkoutByDate",
+        params={"week_id": week["week_id"], "date": today, "chat_id": "chat"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["exercises"]
+
+
+def test_json_prompts_are_answered_with_their_response_model():
+    from services.llm_backends import _JSON_RESPONSE_MODELS, SyntheticTransport
+    from services.prompt_templates import get_prompt_template
+
+    for prompt_name, (_, class_name) in _JSON_RESPONSE_MODELS.items():
+        template = get_prompt_template(prompt_name)
+        system_message = template.render(
+            **{slot: f"<{slot}>" for slot in template.slots}
+        )
+        schema = SyntheticTransport._json_response_schema(
+            {"messages": [{"role": "system", "content": system_message}]}
+        )
+        assert schema["title"] == class_name, prompt_name
+
+    assert (
+        SyntheticTransport._json_response_schema(
+            {"messages": [{"role": "system", "content": "Some other prompt."}]}
+        )
+        is None
+    )
@@ -0,0 +1,30 @@
+import asyncio
+import io
+from types import SimpleNamespace
+from fastapi import UploadFile
+from routers.helpers import translator as translator_module
+from routers.helpers.translator import Translator
+from services.llm_scheduler import llm_scheduler
+
+
+class _Transcriptions:
+    def __init__(self):
+        self.in_flight = []
+
+    async def create(self, model, file):
+        # Seen by the scheduler as one admitted request while it runs.
+        self.in_flight.append(llm_scheduler._state(model).in_flight)
+        return SimpleNamespace(text=f"{file[0]}: {len(file[1])} bytes")
+
+
+def test_transcription_is_admitted_by_the_scheduler(monkeypatch):
+    transcriptions = _Transcriptions()
+    client = SimpleNamespace(audio=SimpleNamespace(transcriptions=transcriptions))
+    monkeypatch.setattr(translator_module, "get_async_openai_client", lambda: client)
+    audio = UploadFile(file=io.BytesIO(b"audio" * 10), filename="note.mp3")
+
+    text = asyncio.run(Translator(audio).transcribe())
+
+    assert text == "note.mp3: 50 bytes"
+    assert transcriptions.in_flight == [1]
+    assert llm_scheduler._state("whisper-1").in_flight == 0
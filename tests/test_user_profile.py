@@ -0,0 +1,58 @@
+import pytest
+from routers import user_profile
+from routers.auth import authentication
+from routers.user_profile import _user_id_cache
+from conftest import EMAIL, USER_ID
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    _user_id_cache.clear()
+    yield
+    _user_id_cache.clear()
+
+
+def test_deleting_the_profile_drops_the_cached_user_id(client, mongo):
+    assert client.get("/user/getUserDetails").status_code == 200
+    assert _user_id_cache.get(EMAIL) == USER_ID
+
+    response = client.delete("/user/deleteUserProfile")
+
+    assert response.status_code == 200, response.text
+    assert _user_id_cache.get(EMAIL) is None
+    assert mongo["user-profiles"].count_documents({"email": EMAIL}) == 0
+
+
+def test_registering_drops_a_stale_user_id(client, mongo, monkeypatch):
+    # The installed bcrypt is newer than passlib supports; hashing isn't under test.
+    monkeypatch.setattr(authentication.pwd_context, "hash", lambda password: "hashed")
+    # Cached for an account of this email that another worker deleted.
+    mongo["user-profiles"].delete_one({"email": EMAIL})
+    _user_id_cache.set(EMAIL, USER_ID)
+
+    response = client.post(
+        "/auth/register", json={"email": EMAIL, "password": "correct horse"}
+    )
+
+    assert response.status_code == 200, response.text
+    assert _user_id_cache.get(EMAIL) is None
+    new_user_id = mongo["user-profiles"].find_one({"email": EMAIL})["user_id"]
+    assert new_user_id != USER_ID
+    assert client.get("/user/getUserDetails").status_code == 404
+    assert _user_id_cache.get(EMAIL) == new_user_id
+
+
+def test_user_id_is_read_once_while_cached(client, monkeypatch):
+    reads = []
+    get_user_id = user_profile.get_user_id
+
+    async def counting_get_user_id(username):
+        reads.append(username)
+        return await get_user_id(username)
+
+    monkeypatch.setattr(user_profile, "get_user_id", counting_get_user_id)
+
+    for _ in range(3):
+        assert client.get("/user/getUserDetails").status_code == 200
+
+    assert reads == [EMAIL]
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime
+import pytest
+from routers.helpers import generate_plan_helpers as gph
+
+USER_ID = "weeks-user"
+# Two consecutive weeks, a week without a plan, then one more.
+WEEK_STARTS = {"2024-03-04": "week-1", "2024-03-11": "week-2", "2024-03-25": "week-4"}
+
+
+@pytest.fixture
+def weeks(mongo):
+    for start_date, week_id in WEEK_STARTS.items():
+        mongo["weekly-training-plans"].insert_one(
+            {
+                "week_id": week_id,
+                "user_id": USER_ID,
+                "start_date": start_date,
+                "workouts": [{"date": start_date, "exercises": []}],
+            }
+        )
+    # Another user's week must never be returned.
+    mongo["weekly-training-plans"].insert_one(
+        {"week_id": "other", "user_id": "other-user", "start_date": "2024-03-18"}
+    )
+
+
+def _week_id(day: str, **kwargs):
+    plan = asyncio.run(
+        gph._get_weekly_training_plan_internal(
+            datetime.fromisoformat(day), USER_ID, **kwargs
+        )
+    )
+    return plan and plan["week_id"]
+
+
+@pytest.mark.parametrize(
+    "day, week_id",
+    [
+        ("2024-03-04", "week-1"),
+        ("2024-03-10", "week-1"),
+        ("2024-03-10T23:59:59", "week-1"),
+        ("2024-03-11", "week-2"),
+        ("2024-03-11T00:00:01", "week-2"),
+        ("2024-03-17", "week-2"),
+        ("2024-03-31", "week-4"),
+    ],
+)
+def test_week_covering_the_date_is_returned(weeks, day, week_id):
+    assert _week_id(day) == week_id
+
+
+@pytest.mark.parametrize(
+    "day", ["2024-03-03", "2024-03-18", "2024-03-24", "2024-04-01"]
+)
+def test_no_plan_covers_the_date(weeks, day):
+    assert _week_id(day) is None
+
+
+def test_projection_is_applied(weeks):
+    plan = asyncio.run(
+        gph._get_weekly_training_plan_internal(
+            datetime(2024, 3, 12), USER_ID, projection={"week_id": 1}
+        )
+    )
+
+    assert plan == {"week_id": "week-2"}